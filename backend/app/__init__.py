@@ -1,9 +1,20 @@
 from flask import Flask
+from .audit import init_audit
 from .config import Config
+from .refdata import init_refdata, warm_refdata
+from .profiler import init_profiler
+from .revenue_index import init_revenue_index
+from .slowlog import init_slow_query_log
+from .tenancy import init_tenancy
 from .extensions import cors, db, jwt
+from .utils.cache import init_shared_cache
+from .utils.compression import init_compression
 from .utils.errors import register_error_handlers
+from .utils.json_provider import FastJSONProvider
+from .utils.ratelimit import init_rate_limiter
+from .utils.revocation import init_revocation
 
-def create_app(config_object: type[Config] = Config) -> Flask:
+def create_app(config_object: type[Config] = Config, *, start_background: bool = True) -> Flask:
     app = Flask(__name__)
     try:
         from pathlib import Path
@@ -13,11 +24,26 @@ def create_app(config_object: type[Config] = Config) -> Flask:
         pass
 
     app.config.from_object(config_object)
-    app.json.ensure_ascii = False
+    hops = app.config.get("TRUSTED_PROXY_HOPS", 0)
+    if hops:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+    app.json = FastJSONProvider(app)
+    app.json.use_orjson = app.json.use_orjson and app.config.get("FAST_JSON", True)
 
     db.init_app(app)
+    init_tenancy(app)
     jwt.init_app(app)
     cors.init_app(app, resources={r"/api/*": {"origins": "*"}})
+    init_shared_cache(app)
+    init_rate_limiter(app)
+    init_audit(app)
+    revocations = init_revocation(app)
+    init_refdata(app)
+    init_revenue_index(app)
+    init_profiler(app)
+    init_slow_query_log(app)
 
     from .utils.responses import error
 
@@ -33,9 +59,18 @@ def create_app(config_object: type[Config] = Config) -> Flask:
     def _expired_token(_jwt_header, _jwt_payload):
         return error("Token has expired", code="token_expired", status=401)
 
+    @jwt.token_in_blocklist_loader
+    def _token_revoked(_jwt_header, jwt_payload) -> bool:
+        return revocations.is_revoked(jwt_payload.get("jti"))
+
+    @jwt.revoked_token_loader
+    def _revoked_token(_jwt_header, _jwt_payload):
+        return error("Token has been revoked", code="token_revoked", status=401)
+
     from .api import register_blueprints
     register_blueprints(app)
     register_error_handlers(app)
+    init_compression(app)
 
     @app.get("/api/health")
     def health():
@@ -63,17 +98,36 @@ def create_app(config_object: type[Config] = Config) -> Flask:
                 ensure_seed_data()
         except Exception:
             app.logger.exception("AUTO_SEED failed")
+    warm_refdata(app)
+
+    if start_background:
+        start_background_tasks(app)
     return app
 
+
+def start_background_tasks(app: Flask) -> None:
+    """
+    Threads do not survive fork: a preloading server calls this in each worker instead (see gunicorn.conf.py).
+    Every worker starts a sweeper thread, but only the one holding the sweeper lock runs it.
+    """
+    from .sweeper import start_appointment_sweeper
+
+    start_appointment_sweeper(app)
+
+
 def register_cli(app: Flask) -> None:
     import click
+    from sqlalchemy.engine import make_url
 
     from .seed import ensure_seed_data
 
     @app.cli.command("init-db")
     def init_db():
         """Create tables (for SQLite/dev)."""
+        from .fulltext import ensure_fulltext_index
+
         db.create_all()
+        ensure_fulltext_index()
         click.echo("OK: created tables.")
 
     @app.cli.command("seed")
@@ -81,3 +135,125 @@ def register_cli(app: Flask) -> None:
         """Insert demo seed data (idempotent)."""
         ensure_seed_data()
         click.echo("OK: seeded data.")
+
+    @app.cli.command("expire-appointments")
+    @click.option("--grace-days", default=0, show_default=True, help="Keep appointments from the last N days open.")
+    @click.option("--chunk-size", default=500, show_default=True)
+    def expire_appointments(grace_days: int, chunk_size: int):
+        """Close 待确认/已确认 appointments whose date has passed."""
+        from .sweeper import expire_stale_appointments
+
+        expired = expire_stale_appointments(grace_days=grace_days, chunk_size=chunk_size, max_chunks=None)
+        click.echo(f"OK: expired {expired} appointments.")
+
+    @app.cli.command("compact-schedule-shards")
+    @click.option("--all", "all_schedules", is_flag=True, help="Also compact today's and future schedules.")
+    def compact_schedule_shards_cmd(all_schedules: bool):
+        """Fold schedule counter shards back into schedule.current_patients."""
+        from datetime import date
+
+        from .capacity import compact_schedule_shards
+
+        count = compact_schedule_shards(before=None if all_schedules else date.today())
+        click.echo(f"OK: compacted {count} schedules.")
+
+    @app.cli.command("rebuild-fulltext")
+    def rebuild_fulltext():
+        """Create the medical record full-text index if missing and (SQLite) repopulate it."""
+        from .fulltext import ensure_fulltext_index, rebuild_fulltext_index
+
+        if not ensure_fulltext_index():
+            raise click.ClickException("Full-text index is not available on this database.")
+        count = rebuild_fulltext_index()
+        click.echo(f"OK: indexed {count} medical records.")
+
+    @app.cli.command("import-patients")
+    @click.argument("csv_path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--rejects", "rejects_path", default=None, help="Reject file (default: <csv>.rejects.csv).")
+    @click.option("--chunk-size", default=None, type=int)
+    @click.option("--commit-every", default=None, type=int)
+    def import_patients_cmd(csv_path: str, rejects_path: str | None, chunk_size: int | None, commit_every: int | None):
+        """Bulk-load a patient roster CSV (name, phone, gender, id_card)."""
+        from .importer import ImportAborted, import_patients
+
+        rejects_path = rejects_path or csv_path + ".rejects.csv"
+        with open(csv_path, encoding="utf-8-sig", newline="") as src, open(
+            rejects_path, "w", encoding="utf-8-sig", newline=""
+        ) as rejects:
+            try:
+                result = import_patients(
+                    src,
+                    chunk_size=chunk_size or app.config["PATIENT_IMPORT_CHUNK_SIZE"],
+                    commit_every=commit_every or app.config["PATIENT_IMPORT_COMMIT_EVERY"],
+                    reject_file=rejects,
+                )
+            except ImportAborted as e:
+                done = ", ".join(f"{count} {name}" for name, count in e.committed.items()) or "nothing"
+                raise click.ClickException(f"{e} (line {e.line}); already committed: {done}") from e
+            except ValueError as e:
+                raise click.ClickException(str(e)) from e
+        result.pop("rejects")
+        click.echo("OK: " + ", ".join(f"{count} {name}" for name, count in result.items()) + f". Rejects: {rejects_path}")
+
+    @app.cli.command("find-duplicate-patients")
+    @click.option("--min-score", default=None, type=float, help="Only propose pairs scoring at least this (0-1).")
+    @click.option("--max-block", default=None, type=int, help="Skip blocking keys shared by more patients.")
+    def find_duplicate_patients_cmd(min_score: float | None, max_block: int | None):
+        """Rebuild the duplicate-patient review list (GET /api/admin/patient-duplicates)."""
+        from .dedup import find_duplicate_patients
+
+        stats = find_duplicate_patients(
+            min_score=min_score if min_score is not None else app.config["PATIENT_DEDUP_MIN_SCORE"],
+            max_block=max_block or app.config["PATIENT_DEDUP_MAX_BLOCK"],
+        )
+        click.echo("OK: " + ", ".join(f"{count} {name}" for name, count in stats.items()) + ".")
+
+    @app.cli.command("merge-duplicate-patients")
+    @click.option("--min-score", required=True, type=float, help="Merge every pending pair scoring at least this.")
+    @click.option("--chunk-size", default=500, show_default=True)
+    def merge_duplicate_patients_cmd(min_score: float, chunk_size: int):
+        """Merge pending duplicate-patient pairs above a score without manual review."""
+        from .dedup import merge_duplicate_pairs
+        from .models import PatientDuplicate
+
+        pairs = PatientDuplicate.query.filter(
+            PatientDuplicate.status == "待审核", PatientDuplicate.score >= min_score
+        ).all()
+        result = merge_duplicate_pairs(pairs, chunk_size=chunk_size)
+        click.echo(f"OK: merged {result['merged']} patients, skipped {len(result['skipped_pairs'])} pairs.")
+
+    @app.cli.command("archive-records")
+    @click.option("--months", default=None, type=int, help="Archive visits checked out more than N months ago.")
+    @click.option("--batch-size", default=500, show_default=True)
+    def archive_records(months: int | None, batch_size: int):
+        """Move closed visits, paid bills, income and medical records into the archive tables."""
+        from .archive import archive_closed_records
+
+        moved = archive_closed_records(months=months or app.config["ARCHIVE_AFTER_MONTHS"], batch_size=batch_size)
+        click.echo("OK: archived " + ", ".join(f"{count} {name}" for name, count in moved.items()) + ".")
+
+    @app.cli.command("provision-tenant")
+    @click.argument("code")
+    @click.option("--name", default=None, help="Clinic name shown to operators.")
+    @click.option("--database-url", default=None, help="Defaults to TENANT_DATABASE_URL_TEMPLATE.")
+    @click.option("--seed/--no-seed", default=True, show_default=True, help="Load the demo/base seed data.")
+    def provision_tenant_cmd(code: str, name: str | None, database_url: str | None, seed: bool):
+        """Register a clinic, create its database schema and seed it (safe to re-run)."""
+        from .tenancy import provision_tenant
+
+        try:
+            url = provision_tenant(code, name=name, database_url=database_url, seed=seed)
+        except ValueError as e:
+            raise click.ClickException(str(e)) from e
+        click.echo(f"OK: tenant {code} ready ({make_url(url).render_as_string(hide_password=True)}).")
+
+    @app.cli.command("list-tenants")
+    def list_tenants():
+        """Clinics served by this deployment."""
+        from .tenancy import registry
+
+        tenants = registry(app)
+        click.echo(f"{tenants.default} (default database)")
+        for code in tenants.codes():
+            if code != tenants.default:
+                click.echo(code)
@@ -2,6 +2,7 @@ from flask import Flask
 
 from .admin import bp as admin_bp
 from .auth import bp as auth_bp
+from .batch import bp as batch_bp
 from .patient import bp as patient_bp
 from .receptionist import bp as receptionist_bp
 
@@ -11,4 +12,5 @@ def register_blueprints(app: Flask) -> None:
     app.register_blueprint(patient_bp)
     app.register_blueprint(receptionist_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(batch_bp)
 
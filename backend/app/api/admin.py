@@ -1,16 +1,50 @@
 from __future__ import annotations
 
-from datetime import date, datetime, time
+import io
+import json
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
 
-from flask import Blueprint, request
-from sqlalchemy import func
+from flask import Blueprint, current_app, request
+from sqlalchemy.orm import contains_eager, lazyload, undefer, undefer_group
 
+from .. import archive, capacity, dedup, fulltext, refdata
+from ..profiler import collapsed, profiler
+from ..tenancy import current_tenant
 from ..extensions import db
-from ..models import Bill, Department, Employee, IncomeRecord, MedicalRecord, Patient, Room, Schedule, Visit
+from ..importer import ImportAborted, import_patients
+from ..jobs import submit_normalized, submit_report_job
+from ..models import (
+    AuditLog,
+    Bill,
+    Department,
+    Employee,
+    IncomeRecord,
+    MedicalRecord,
+    Patient,
+    PatientDuplicate,
+    ReportJob,
+    Room,
+    Schedule,
+    ScheduleCounterShard,
+    SlowQuery,
+    Visit,
+)
+from ..reports import (
+    REPORT_KINDS,
+    income_stats,
+    normalize_income_params,
+    normalize_utilization_params,
+    normalize_visit_params,
+    utilization_stats,
+    visit_stats,
+)
 from ..utils.auth import roles_required
+from ..utils.cache import shared_cache
 from ..utils.datetime_utils import parse_date, parse_datetime
+from ..utils import metrics
 from ..utils.errors import APIError
+from ..utils.fields import field_options, parse_fields, prune, subtree
 from ..utils.responses import ok
 
 bp = Blueprint("admin", __name__, url_prefix="/api/admin")
@@ -19,8 +53,9 @@ bp = Blueprint("admin", __name__, url_prefix="/api/admin")
 @bp.get("/rooms")
 @roles_required("admin")
 def list_rooms():
-    rooms = Room.query.order_by(Room.room_id.asc()).all()
-    return ok([r.to_dict() for r in rooms])
+    fields = parse_fields(request.args.get("fields"))
+    rooms = Room.query.options(*field_options(Room, fields)).order_by(Room.room_id.asc()).all()
+    return ok(prune([r.to_dict() for r in rooms], fields))
 
 
 @bp.post("/rooms")
@@ -72,12 +107,97 @@ def update_room(room_id: int):
 @bp.get("/schedules")
 @roles_required("admin")
 def list_schedules():
-    q = Schedule.query.order_by(Schedule.work_date.desc(), Schedule.schedule_id.desc())
+    fields = parse_fields(request.args.get("fields"))
+    q = (
+        Schedule.query.options(*field_options(Schedule, fields))
+        .order_by(Schedule.work_date.desc(), Schedule.schedule_id.desc())
+    )
+    if capacity.shard_count() > 1:
+        q = q.options(undefer(Schedule.sharded_patients))
     work_date = (request.args.get("work_date") or "").strip()
     if work_date:
         q = q.filter(Schedule.work_date == parse_date(work_date))
     schedules = q.limit(200).all()
-    return ok([s.to_dict() for s in schedules])
+    return ok(prune([s.to_dict() for s in schedules], fields))
+
+
+CALENDAR_SLOTS = ("上午", "下午", "全天")
+CALENDAR_MAX_DAYS = 62
+
+
+@bp.get("/schedules/calendar")
+@roles_required("admin")
+def schedule_calendar():
+    """
+    Compact calendar for a date window: rooms and doctors are listed once, each day holds
+    [room_idx, doctor_idx, slot_idx, max_patients, current_patients, schedule_id] rows.
+    """
+    start_date = (request.args.get("start_date") or "").strip()
+    end_date = (request.args.get("end_date") or "").strip()
+    dept_id = (request.args.get("dept_id") or "").strip()
+    start = parse_date(start_date) if start_date else date.today()
+    end = parse_date(end_date) if end_date else start + timedelta(days=6)
+    if end < start:
+        raise APIError("end_date must not be before start_date", code="validation_error", status=400)
+    if (end - start).days + 1 > CALENDAR_MAX_DAYS:
+        raise APIError(
+            "Date range too long", code="validation_error", status=400, details={"max_days": CALENDAR_MAX_DAYS}
+        )
+
+    q = (
+        db.session.query(
+            Schedule.schedule_id,
+            Schedule.work_date,
+            Schedule.time_slot,
+            Schedule.max_patients,
+            Schedule.booked_patients,
+            Schedule.room_id,
+            Schedule.doctor_id,
+        )
+        .filter(Schedule.work_date >= start)
+        .filter(Schedule.work_date <= end)
+    )
+    if dept_id:
+        q = q.filter(Schedule.room_id.in_(refdata.room_ids(_parse_int(dept_id, field="dept_id"))))
+    rows = q.order_by(Schedule.work_date.asc(), Schedule.room_id.asc(), Schedule.time_slot.asc()).all()
+
+    rooms: dict[int, int] = {}
+    doctors: dict[str, int] = {}
+    room_list: list[dict] = []
+    doctor_list: list[dict] = []
+    days: dict[str, list] = {}
+    for sid, work_date, slot, max_p, booked, room_id, doctor_id in rows:
+        room_idx = rooms.get(room_id)
+        if room_idx is None:
+            room_idx = rooms[room_id] = len(room_list)
+            room = refdata.room(room_id) or {}
+            room_list.append(
+                {
+                    "room_id": room_id,
+                    "room_number": room.get("room_number"),
+                    "dept_id": room.get("dept_id"),
+                    "dept_name": room.get("dept_name"),
+                }
+            )
+        doctor_idx = doctors.get(doctor_id)
+        if doctor_idx is None:
+            doctor_idx = doctors[doctor_id] = len(doctor_list)
+            doctor_list.append({"doctor_id": doctor_id, "doctor_name": refdata.employee_name(doctor_id)})
+        days.setdefault(work_date.isoformat(), []).append(
+            [room_idx, doctor_idx, CALENDAR_SLOTS.index(slot), max_p, int(booked), sid]
+        )
+
+    return ok(
+        {
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+            "slots": list(CALENDAR_SLOTS),
+            "columns": ["room_idx", "doctor_idx", "slot_idx", "max_patients", "current_patients", "schedule_id"],
+            "rooms": room_list,
+            "doctors": doctor_list,
+            "days": days,
+        }
+    )
 
 
 @bp.post("/schedules")
@@ -115,6 +235,8 @@ def create_schedule():
 @bp.put("/schedules/<int:schedule_id>")
 @roles_required("admin")
 def update_schedule(schedule_id: int):
+    # Fold counter shards back first so max_patients is checked against (and re-split from) the real total.
+    capacity.compact_schedule_shards(schedule_ids=[schedule_id])
     schedule = Schedule.query.get(schedule_id)
     if schedule is None:
         raise APIError("Schedule not found", code="not_found", status=404)
@@ -139,7 +261,7 @@ def update_schedule(schedule_id: int):
         schedule.time_slot = time_slot
     if "max_patients" in payload:
         schedule.max_patients = int(payload.get("max_patients"))
-        if schedule.current_patients > schedule.max_patients:
+        if schedule.booked_patients > schedule.max_patients:
             raise APIError("current_patients exceeds max_patients", code="validation_error", status=400)
 
     db.session.commit()
@@ -152,6 +274,7 @@ def delete_schedule(schedule_id: int):
     schedule = Schedule.query.get(schedule_id)
     if schedule is None:
         raise APIError("Schedule not found", code="not_found", status=404)
+    ScheduleCounterShard.query.filter_by(schedule_id=schedule_id).delete(synchronize_session=False)
     db.session.delete(schedule)
     db.session.commit()
     return ok({"deleted": True})
@@ -160,8 +283,11 @@ def delete_schedule(schedule_id: int):
 @bp.get("/employees")
 @roles_required("admin")
 def list_employees():
-    employees = Employee.query.order_by(Employee.emp_id.asc()).limit(500).all()
-    return ok([e.to_dict() for e in employees])
+    fields = parse_fields(request.args.get("fields"))
+    employees = (
+        Employee.query.options(*field_options(Employee, fields)).order_by(Employee.emp_id.asc()).limit(500).all()
+    )
+    return ok(prune([e.to_dict() for e in employees], fields))
 
 
 @bp.post("/employees")
@@ -260,7 +386,83 @@ def search_patients():
         q = q.filter(Patient.id_card == id_card)
 
     patients = q.order_by(Patient.patient_id.desc()).limit(100).all()
-    return ok([p.to_dict() for p in patients])
+    return ok(prune([p.to_dict() for p in patients], parse_fields(request.args.get("fields"))))
+
+
+@bp.post("/patients/import")
+@roles_required("admin")
+def import_patients_csv():
+    """multipart `file` (or a raw text/csv body), UTF-8 with or without BOM; rejected rows are returned inline."""
+    upload = request.files.get("file")
+    raw = upload.stream if upload is not None else request.stream
+    try:
+        result = import_patients(
+            io.TextIOWrapper(raw, encoding="utf-8-sig", newline=""),
+            chunk_size=current_app.config.get("PATIENT_IMPORT_CHUNK_SIZE", 1000),
+            commit_every=current_app.config.get("PATIENT_IMPORT_COMMIT_EVERY", 10000),
+        )
+    except ImportAborted as e:
+        db.session.rollback()
+        # Earlier chunks are already committed; report how far the import got so the rest can be re-sent.
+        raise APIError(
+            str(e), code="validation_error", status=400, details={"line": e.line, "committed": e.committed}
+        ) from e
+    except ValueError as e:
+        db.session.rollback()
+        raise APIError(str(e), code="validation_error", status=400) from e
+    return ok(result)
+
+
+@bp.get("/patient-duplicates")
+@roles_required("admin")
+def list_patient_duplicates():
+    status = (request.args.get("status") or "待审核").strip()
+    if status not in ("待审核", "已合并", "已忽略"):
+        raise APIError("Invalid status", code="validation_error", status=400)
+    limit = min(_parse_int(request.args.get("limit") or "100", field="limit"), 200)
+    offset = max(_parse_int(request.args.get("offset") or "0", field="offset"), 0)
+
+    q = PatientDuplicate.query.filter(PatientDuplicate.status == status)
+    min_score = (request.args.get("min_score") or "").strip()
+    if min_score:
+        q = q.filter(PatientDuplicate.score >= _parse_decimal(min_score, field="min_score"))
+
+    total = q.count()
+    pairs = (
+        q.order_by(PatientDuplicate.score.desc(), PatientDuplicate.pair_id.asc()).offset(offset).limit(limit).all()
+    )
+    ids = {pid for p in pairs for pid in (p.patient_id, p.duplicate_id)}
+    patients = {p.patient_id: p.to_dict() for p in Patient.query.filter(Patient.patient_id.in_(ids))} if ids else {}
+    items = [
+        {
+            **p.to_dict(),
+            "patient": patients.get(p.patient_id),
+            "duplicate": patients.get(p.duplicate_id) or (json.loads(p.snapshot) if p.snapshot else None),
+        }
+        for p in pairs
+    ]
+    return ok({"total": total, "limit": limit, "offset": offset, "items": items})
+
+
+def _pair_ids() -> list[int]:
+    payload = request.get_json(silent=True) or {}
+    pair_ids = payload.get("pair_ids")
+    if not isinstance(pair_ids, list) or not pair_ids or not all(isinstance(i, int) for i in pair_ids):
+        raise APIError("pair_ids must be a non-empty list of integers", code="validation_error", status=400)
+    return pair_ids
+
+
+@bp.post("/patient-duplicates/merge")
+@roles_required("admin")
+def merge_patient_duplicates():
+    pairs = PatientDuplicate.query.filter(PatientDuplicate.pair_id.in_(_pair_ids())).all()
+    return ok(dedup.merge_duplicate_pairs(pairs))
+
+
+@bp.post("/patient-duplicates/dismiss")
+@roles_required("admin")
+def dismiss_patient_duplicates():
+    return ok({"dismissed": dedup.dismiss_duplicate_pairs(_pair_ids())})
 
 
 def _parse_int(value: str | None, *, field: str) -> int:
@@ -270,6 +472,10 @@ def _parse_int(value: str | None, *, field: str) -> int:
         raise APIError(f"Invalid {field}", code="validation_error", status=400) from e
 
 
+def _parse_bool(value: str | None) -> bool:
+    return (value or "").strip().lower() in ("1", "true", "yes", "on")
+
+
 def _parse_decimal(value: str | None, *, field: str) -> Decimal:
     try:
         return Decimal(str(value))
@@ -280,10 +486,13 @@ def _parse_decimal(value: str | None, *, field: str) -> Decimal:
 @bp.get("/visits/search")
 @roles_required("admin")
 def search_visits():
+    fields = parse_fields(request.args.get("fields"))
+    V = archive.source(Visit, _parse_bool(request.args.get("include_archive")))
     q = (
-        Visit.query.join(Patient, Visit.patient_id == Patient.patient_id)
-        .join(Room, Visit.room_id == Room.room_id)
-        .order_by(Visit.visit_id.desc())
+        db.session.query(V)
+        .join(Patient, V.patient_id == Patient.patient_id)
+        .order_by(V.visit_id.desc())
+        .options(*field_options(V, fields))
     )
 
     visit_id = (request.args.get("visit_id") or "").strip()
@@ -305,48 +514,53 @@ def search_visits():
     offset = max(_parse_int(request.args.get("offset") or "0", field="offset"), 0)
 
     if visit_id:
-        q = q.filter(Visit.visit_id == _parse_int(visit_id, field="visit_id"))
+        q = q.filter(V.visit_id == _parse_int(visit_id, field="visit_id"))
     if appt_id:
-        q = q.filter(Visit.appt_id == _parse_int(appt_id, field="appt_id"))
+        q = q.filter(V.appt_id == _parse_int(appt_id, field="appt_id"))
     if name:
         q = q.filter(Patient.name.like(f"%{name}%"))
     if phone:
         q = q.filter(Patient.phone == phone)
     if id_card:
         q = q.filter(Patient.id_card == id_card)
-    if room_number:
-        q = q.filter(Room.room_number == room_number)
-    if dept_id:
-        q = q.filter(Room.dept_id == _parse_int(dept_id, field="dept_id"))
+    if room_number or dept_id:
+        dept = _parse_int(dept_id, field="dept_id") if dept_id else None
+        q = q.filter(V.room_id.in_(refdata.room_ids(dept, room_number=room_number or None)))
     if doctor_id:
-        q = q.filter(Visit.doctor_id == doctor_id)
+        q = q.filter(V.doctor_id == doctor_id)
     if status:
-        q = q.filter(Visit.status == status)
+        q = q.filter(V.status == status)
 
     if start_time:
-        q = q.filter(Visit.check_in_time >= parse_datetime(start_time))
+        q = q.filter(V.check_in_time >= parse_datetime(start_time))
     elif start_date:
         start = parse_date(start_date)
-        q = q.filter(Visit.check_in_time >= datetime.combine(start, time.min))
+        q = q.filter(V.check_in_time >= datetime.combine(start, time.min))
 
     if end_time:
-        q = q.filter(Visit.check_in_time <= parse_datetime(end_time))
+        q = q.filter(V.check_in_time <= parse_datetime(end_time))
     elif end_date:
         end = parse_date(end_date)
-        q = q.filter(Visit.check_in_time <= datetime.combine(end, time.max))
+        q = q.filter(V.check_in_time <= datetime.combine(end, time.max))
 
     total = q.count()
     items = q.offset(offset).limit(limit).all()
-    return ok({"total": total, "limit": limit, "offset": offset, "items": [v.to_dict() for v in items]})
+    return ok({"total": total, "limit": limit, "offset": offset, "items": [v.to_dict(fields) for v in items]})
 
 
 @bp.get("/visits/<int:visit_id>/medical-record")
 @roles_required("admin")
 def get_visit_medical_record(visit_id: int):
-    if Visit.query.get(visit_id) is None:
+    if not archive.visit_exists(visit_id):
         raise APIError("Visit not found", code="not_found", status=404)
 
-    record = MedicalRecord.query.filter_by(visit_id=visit_id).first()
+    # 已归档的就诊同样可查看病历（只读）
+    record = (
+        db.session.query(archive.source(MedicalRecord, True))
+        .options(undefer_group("text"))
+        .filter_by(visit_id=visit_id)
+        .first()
+    )
     return ok(record.to_dict() if record else None)
 
 
@@ -357,7 +571,7 @@ def upsert_visit_medical_record(visit_id: int):
         raise APIError("Visit not found", code="not_found", status=404)
 
     payload = request.get_json(silent=True) or {}
-    record = MedicalRecord.query.filter_by(visit_id=visit_id).first()
+    record = MedicalRecord.query.options(undefer_group("text")).filter_by(visit_id=visit_id).first()
     if record is None:
         record = MedicalRecord(visit_id=visit_id)
         db.session.add(record)
@@ -367,14 +581,59 @@ def upsert_visit_medical_record(visit_id: int):
             value = (payload.get(field) or "").strip() or None
             setattr(record, field, value)
 
+    db.session.flush()
+    fulltext.index_medical_record(record)
     db.session.commit()
     return ok(record.to_dict())
 
 
+@bp.get("/medical-records/search")
+@roles_required("admin")
+def search_medical_records():
+    """Ranked full-text search over diagnosis/treatment/prescription/note, joined back to the visit."""
+    keyword = (request.args.get("q") or "").strip()
+    if not keyword:
+        raise APIError("q is required", code="validation_error", status=400)
+    terms = keyword.split()[:8]
+
+    dept_id = (request.args.get("dept_id") or "").strip()
+    doctor_id = (request.args.get("doctor_id") or "").strip()
+    start_date = (request.args.get("start_date") or "").strip()
+    end_date = (request.args.get("end_date") or "").strip()
+
+    limit = min(_parse_int(request.args.get("limit") or "20", field="limit"), 100)
+    offset = max(_parse_int(request.args.get("offset") or "0", field="offset"), 0)
+
+    matches = fulltext.match_records(terms)
+    q = (
+        db.session.query(MedicalRecord, matches.c.score)
+        .join(matches, matches.c.record_id == MedicalRecord.record_id)
+        .join(Visit, Visit.visit_id == MedicalRecord.visit_id)
+        .options(contains_eager(MedicalRecord.visit), undefer_group("text"))
+    )
+    if dept_id:
+        q = q.filter(Visit.room_id.in_(refdata.room_ids(_parse_int(dept_id, field="dept_id"))))
+    if doctor_id:
+        q = q.filter(Visit.doctor_id == doctor_id)
+    if start_date:
+        q = q.filter(Visit.check_in_time >= datetime.combine(parse_date(start_date), time.min))
+    if end_date:
+        q = q.filter(Visit.check_in_time <= datetime.combine(parse_date(end_date), time.max))
+
+    total = q.count()
+    rows = q.order_by(matches.c.score.desc(), MedicalRecord.record_id.desc()).offset(offset).limit(limit).all()
+    items = [
+        {"score": float(score or 0), "record": record.to_dict(), "visit": record.visit.to_dict()}
+        for record, score in rows
+    ]
+    return ok({"total": total, "limit": limit, "offset": offset, "items": items})
+
+
 @bp.get("/income-records")
 @roles_required("admin")
 def list_income_records():
-    q = IncomeRecord.query.order_by(IncomeRecord.record_id.desc())
+    fields = parse_fields(request.args.get("fields"))
+    q = IncomeRecord.query.options(*field_options(IncomeRecord, fields)).order_by(IncomeRecord.record_id.desc())
 
     start_date = (request.args.get("start_date") or "").strip()
     end_date = (request.args.get("end_date") or "").strip()
@@ -401,17 +660,26 @@ def list_income_records():
 
     total = q.count()
     items = q.offset(offset).limit(limit).all()
-    return ok({"total": total, "limit": limit, "offset": offset, "items": [r.to_dict() for r in items]})
+    return ok(
+        {"total": total, "limit": limit, "offset": offset, "items": prune([r.to_dict() for r in items], fields)}
+    )
 
 
 @bp.get("/bills")
 @roles_required("admin")
 def list_bills():
+    include_archive = _parse_bool(request.args.get("include_archive"))
+    fields = parse_fields(request.args.get("fields"))
+    want_visit = fields is None or "visit" in fields
+    visit_fields = subtree(fields, "visit")
+    B = archive.source(Bill, include_archive)
+    V = archive.source(Visit, include_archive)
     q = (
-        Bill.query.join(Visit, Bill.visit_id == Visit.visit_id)
-        .join(Patient, Visit.patient_id == Patient.patient_id)
-        .join(Room, Visit.room_id == Room.room_id)
-        .order_by(Bill.bill_id.desc())
+        db.session.query(B, V)
+        .join(V, B.visit_id == V.visit_id)
+        .join(Patient, V.patient_id == Patient.patient_id)
+        .order_by(B.bill_id.desc())
+        .options(lazyload(B.visit), *field_options(V, visit_fields if want_visit else {}))
     )
 
     visit_id = (request.args.get("visit_id") or "").strip()
@@ -429,29 +697,28 @@ def list_bills():
     offset = max(_parse_int(request.args.get("offset") or "0", field="offset"), 0)
 
     if visit_id:
-        q = q.filter(Bill.visit_id == _parse_int(visit_id, field="visit_id"))
+        q = q.filter(B.visit_id == _parse_int(visit_id, field="visit_id"))
     if pay_status:
         if pay_status not in ("未支付", "已支付"):
             raise APIError("Invalid pay_status", code="validation_error", status=400)
-        q = q.filter(Bill.pay_status == pay_status)
+        q = q.filter(B.pay_status == pay_status)
     if name:
         q = q.filter(Patient.name.like(f"%{name}%"))
     if phone:
         q = q.filter(Patient.phone == phone)
     if id_card:
         q = q.filter(Patient.id_card == id_card)
-    if room_number:
-        q = q.filter(Room.room_number == room_number)
-    if dept_id:
-        q = q.filter(Room.dept_id == _parse_int(dept_id, field="dept_id"))
+    if room_number or dept_id:
+        dept = _parse_int(dept_id, field="dept_id") if dept_id else None
+        q = q.filter(V.room_id.in_(refdata.room_ids(dept, room_number=room_number or None)))
     if doctor_id:
-        q = q.filter(Visit.doctor_id == doctor_id)
+        q = q.filter(V.doctor_id == doctor_id)
     if start_date:
         start = parse_date(start_date)
-        q = q.filter(Bill.created_at >= datetime.combine(start, time.min))
+        q = q.filter(B.created_at >= datetime.combine(start, time.min))
     if end_date:
         end = parse_date(end_date)
-        q = q.filter(Bill.created_at <= datetime.combine(end, time.max))
+        q = q.filter(B.created_at <= datetime.combine(end, time.max))
 
     total = q.count()
     items = q.offset(offset).limit(limit).all()
@@ -460,155 +727,243 @@ def list_bills():
             "total": total,
             "limit": limit,
             "offset": offset,
-            "items": [{"bill": b.to_dict(), "visit": b.visit.to_dict() if b.visit else None} for b in items],
+            "items": [
+                prune({"bill": b.to_dict(), "visit": v.to_dict(visit_fields) if want_visit else None}, fields)
+                for b, v in items
+            ],
         }
     )
 
 
+def _stats_response(kind: str, params: dict, compute):
+    """
+    Ranges wider than REPORT_INLINE_MAX_DAYS are computed by the report job executor instead of the request
+    thread: the response is the cached result when one exists, otherwise 202 with the job to poll.
+    """
+    from flask_jwt_extended import current_user
+
+    days = (date.fromisoformat(params["end_date"]) - date.fromisoformat(params["start_date"])).days + 1
+    limit = current_app.config.get("REPORT_INLINE_MAX_DAYS", 92)
+    if not limit or days <= limit:
+        return ok(compute(params))
+    job, reused = submit_normalized(kind, params, user_id=current_user.user_id)
+    if job.status == "done":
+        return ok(json.loads(job.result))
+    return ok({"job": job.to_dict(), "reused": reused}, status=202)
+
+
 @bp.get("/statistics/income")
 @roles_required("admin")
 def stats_income():
-    start_date = request.args.get("start_date")
-    end_date = request.args.get("end_date")
-    group_by = (request.args.get("group_by") or "dept").strip()
+    params = normalize_income_params(request.args)
+    if current_app.config.get("REVENUE_INDEX_ENABLED", True):
+        return ok(income_stats(params))  # prefix-sum lookups: cheap for any range
+    return _stats_response("income", params, income_stats)
 
-    start = parse_date(start_date) if start_date else date.today()
-    end = parse_date(end_date) if end_date else date.today()
 
-    q = IncomeRecord.query.filter(IncomeRecord.record_date >= start).filter(IncomeRecord.record_date <= end)
+@bp.get("/statistics/visits")
+@roles_required("admin")
+def stats_visits():
+    return _stats_response("visits", normalize_visit_params(request.args), visit_stats)
 
-    if group_by in ("day", "date"):
-        rows = (
-            q.with_entities(IncomeRecord.record_date, func.sum(IncomeRecord.amount), func.count(IncomeRecord.record_id))
-            .group_by(IncomeRecord.record_date)
-            .order_by(IncomeRecord.record_date.asc())
-            .all()
-        )
-        data = [{"date": d.isoformat(), "amount": float(total), "records": int(cnt)} for d, total, cnt in rows]
-        return ok(
-            {"group_by": "day", "start_date": start.isoformat(), "end_date": end.isoformat(), "data": data}
-        )
 
-    if group_by == "doctor":
-        rows = (
-            q.join(Employee, IncomeRecord.doctor_id == Employee.emp_id, isouter=True)
-            .with_entities(IncomeRecord.doctor_id, Employee.name, func.sum(IncomeRecord.amount), func.count(IncomeRecord.record_id))
-            .group_by(IncomeRecord.doctor_id, Employee.name)
-            .all()
-        )
-        data = [
-            {"doctor_id": did, "doctor_name": name, "amount": float(total), "records": int(cnt)}
-            for did, name, total, cnt in rows
-        ]
-        return ok({"group_by": "doctor", "start_date": start.isoformat(), "end_date": end.isoformat(), "data": data})
-
-    if group_by != "dept":
-        raise APIError("Invalid group_by", code="validation_error", status=400)
-
-    rows = (
-        q.join(Department, IncomeRecord.dept_id == Department.dept_id)
-        .with_entities(IncomeRecord.dept_id, Department.dept_name, func.sum(IncomeRecord.amount), func.count(IncomeRecord.record_id))
-        .group_by(IncomeRecord.dept_id, Department.dept_name)
-        .all()
+@bp.get("/statistics/utilization")
+@roles_required("admin")
+def stats_utilization():
+    params = normalize_utilization_params(request.args)
+    key = "|".join(
+        str(v)
+        for v in (current_tenant(), params["start_date"], params["end_date"], params["dept_id"], params["include_archive"])
     )
-    data = [
-        {"dept_id": dept_id, "dept_name": dept_name, "amount": float(total), "records": int(cnt)}
-        for dept_id, dept_name, total, cnt in rows
-    ]
-    return ok({"group_by": "dept", "start_date": start.isoformat(), "end_date": end.isoformat(), "data": data})
+    ttl = current_app.config.get("UTILIZATION_CACHE_SECONDS", 30)
+    return ok(shared_cache().get_or_set("utilization", key, lambda: utilization_stats(params), ttl=ttl))
 
 
-@bp.get("/statistics/visits")
+@bp.post("/reports/<string:kind>")
 @roles_required("admin")
-def stats_visits():
-    start_date = request.args.get("start_date")
-    end_date = request.args.get("end_date")
-    group_by = (request.args.get("group_by") or "dept").strip()
+def submit_report(kind: str):
+    from flask_jwt_extended import current_user
 
-    start = parse_date(start_date) if start_date else date.today()
-    end = parse_date(end_date) if end_date else date.today()
+    if kind not in REPORT_KINDS:
+        raise APIError("Invalid report kind", code="not_found", status=404)
+    payload = request.get_json(silent=True) or {}
+    job, reused = submit_report_job(kind, payload, user_id=current_user.user_id)
+    return ok({"job": job.to_dict(), "reused": reused}, status=200 if job.status == "done" else 202)
 
-    start_dt = datetime.combine(start, time.min)
-    end_dt = datetime.combine(end, time.max)
 
-    q = Visit.query.filter(Visit.check_in_time >= start_dt).filter(Visit.check_in_time <= end_dt)
-    status = (request.args.get("status") or "").strip()
-    if status:
-        q = q.filter(Visit.status == status)
-
-    if group_by in ("day", "date"):
-        rows = (
-            q.with_entities(
-                func.date(Visit.check_in_time),
-                func.count(Visit.visit_id),
-                func.count(func.distinct(Visit.patient_id)),
-            )
-            .group_by(func.date(Visit.check_in_time))
-            .order_by(func.date(Visit.check_in_time).asc())
-            .all()
-        )
-        data = [{"date": str(day), "visits": int(cnt), "patients": int(pcnt)} for day, cnt, pcnt in rows]
-        return ok(
-            {
-                "group_by": "day",
-                "start_date": start.isoformat(),
-                "end_date": end.isoformat(),
-                "status": status or None,
-                "data": data,
-            }
-        )
+@bp.get("/reports/jobs/<string:job_id>")
+@roles_required("admin")
+def get_report_job(job_id: str):
+    job = ReportJob.query.get(job_id)
+    if job is None:
+        raise APIError("Job not found", code="not_found", status=404)
+    return ok(job.to_dict())
 
-    if group_by == "doctor":
-        rows = (
-            q.join(Employee, Visit.doctor_id == Employee.emp_id, isouter=True)
-            .with_entities(
-                Visit.doctor_id,
-                Employee.name,
-                func.count(Visit.visit_id),
-                func.count(func.distinct(Visit.patient_id)),
-            )
-            .group_by(Visit.doctor_id, Employee.name)
-            .all()
-        )
-        data = [
-            {"doctor_id": did, "doctor_name": name, "visits": int(cnt), "patients": int(pcnt)}
-            for did, name, cnt, pcnt in rows
-        ]
-        return ok(
-            {
-                "group_by": "doctor",
-                "start_date": start.isoformat(),
-                "end_date": end.isoformat(),
-                "status": status or None,
-                "data": data,
-            }
-        )
 
-    if group_by != "dept":
-        raise APIError("Invalid group_by", code="validation_error", status=400)
-
-    rows = (
-        q.join(Room, Visit.room_id == Room.room_id)
-        .join(Department, Room.dept_id == Department.dept_id)
-        .with_entities(
-            Room.dept_id,
-            Department.dept_name,
-            func.count(Visit.visit_id),
-            func.count(func.distinct(Visit.patient_id)),
-        )
-        .group_by(Room.dept_id, Department.dept_name)
-        .all()
-    )
-    data = [
-        {"dept_id": dept_id, "dept_name": dept_name, "visits": int(cnt), "patients": int(pcnt)}
-        for dept_id, dept_name, cnt, pcnt in rows
+@bp.get("/reports/jobs/<string:job_id>/result")
+@roles_required("admin")
+def get_report_result(job_id: str):
+    job = ReportJob.query.get(job_id)
+    if job is None:
+        raise APIError("Job not found", code="not_found", status=404)
+    if job.status == "failed":
+        raise APIError("Job failed", code="job_failed", status=409, details={"error": job.error})
+    if job.status != "done":
+        raise APIError("Job not finished", code="invalid_state", status=409, details={"status": job.status})
+    return ok({"job": job.to_dict(), "result": json.loads(job.result)})
+
+
+@bp.get("/metrics")
+@roles_required("admin")
+def get_metrics():
+    return ok(metrics.snapshot())
+
+
+def _stacks_response(data: dict, field: str):
+    if (request.args.get("format") or "json").strip() == "collapsed":
+        return current_app.response_class(collapsed(data.get(field) or {}), mimetype="text/plain")
+    return ok(data)
+
+
+@bp.get("/profiler")
+@roles_required("admin")
+def get_profiler():
+    prof = profiler()
+    summaries = [
+        {k: v for k, v in p.items() if k not in ("stacks", "memory_stacks")} for p in reversed(prof.profiles())
     ]
-    return ok(
-        {
-            "group_by": "dept",
-            "start_date": start.isoformat(),
-            "end_date": end.isoformat(),
-            "status": status or None,
-            "data": data,
-        }
-    )
+    endpoint = (request.args.get("endpoint") or "").strip()
+    if endpoint:
+        summaries = [p for p in summaries if p["endpoint"] == endpoint]
+    return ok({"settings": prof.settings(), "profiles": summaries})
+
+
+@bp.put("/profiler")
+@roles_required("admin")
+def update_profiler():
+    """Adjusts this process only; the PROFILER_* settings apply again after a restart."""
+    payload = request.get_json(silent=True) or {}
+    values = {}
+    if "enabled" in payload:
+        values["enabled"] = bool(payload["enabled"])
+    if "sample_rate" in payload:
+        try:
+            rate = float(payload["sample_rate"])
+        except (TypeError, ValueError) as e:
+            raise APIError("Invalid sample_rate", code="validation_error", status=400) from e
+        if not 0 <= rate <= 1:
+            raise APIError("sample_rate must be between 0 and 1", code="validation_error", status=400)
+        values["sample_rate"] = rate
+    if "memory_endpoints" in payload:
+        endpoints = payload["memory_endpoints"]
+        if not isinstance(endpoints, list) or not all(isinstance(e, str) for e in endpoints):
+            raise APIError("memory_endpoints must be a list of endpoint names", code="validation_error", status=400)
+        unknown = sorted(set(endpoints) - set(current_app.view_functions))
+        if unknown:
+            raise APIError("Unknown endpoint", code="validation_error", status=400, details={"endpoints": unknown})
+        values["memory_endpoints"] = endpoints
+    profiler().configure(**values)
+    return ok(profiler().settings())
+
+
+@bp.get("/profiler/profiles/<profile_id>")
+@roles_required("admin")
+def get_profile(profile_id: str):
+    profile = profiler().profile(profile_id)
+    if profile is None:
+        raise APIError("Profile not found", code="not_found", status=404)
+    kind = (request.args.get("kind") or "cpu").strip()
+    return _stacks_response(profile, "memory_stacks" if kind == "memory" else "stacks")
+
+
+@bp.get("/profiler/stacks")
+@roles_required("admin")
+def get_profiler_stacks():
+    kind = (request.args.get("kind") or "cpu").strip()
+    if kind not in ("cpu", "memory"):
+        raise APIError("Invalid kind", code="validation_error", status=400)
+    endpoint = (request.args.get("endpoint") or "").strip() or None
+    return _stacks_response(profiler().aggregate(endpoint=endpoint, kind=kind), "stacks")
+
+
+@bp.delete("/profiler/profiles")
+@roles_required("admin")
+def clear_profiles():
+    profiler().clear()
+    return ok({"cleared": True})
+
+
+_SLOW_QUERY_ORDER = {
+    "total": SlowQuery.total_ms.desc(),
+    "max": SlowQuery.max_ms.desc(),
+    "calls": SlowQuery.calls.desc(),
+    "last": SlowQuery.last_seen.desc(),
+}
+
+
+@bp.get("/slow-queries")
+@roles_required("admin")
+def list_slow_queries():
+    q = SlowQuery.query
+    endpoint = (request.args.get("endpoint") or "").strip()
+    min_ms = (request.args.get("min_ms") or "").strip()
+    order = (request.args.get("order") or "total").strip()
+    if order not in _SLOW_QUERY_ORDER:
+        raise APIError("Invalid order", code="validation_error", status=400)
+
+    limit = min(_parse_int(request.args.get("limit") or "50", field="limit"), 200)
+    offset = max(_parse_int(request.args.get("offset") or "0", field="offset"), 0)
+
+    if endpoint:
+        q = q.filter(SlowQuery.endpoint == endpoint)
+    if min_ms:
+        q = q.filter(SlowQuery.max_ms >= float(_parse_decimal(min_ms, field="min_ms")))
+
+    total = q.count()
+    items = q.order_by(_SLOW_QUERY_ORDER[order], SlowQuery.query_id.asc()).offset(offset).limit(limit).all()
+    return ok({"total": total, "limit": limit, "offset": offset, "items": [row.to_dict() for row in items]})
+
+
+@bp.delete("/slow-queries")
+@roles_required("admin")
+def clear_slow_queries():
+    deleted = SlowQuery.query.delete()
+    db.session.commit()
+    return ok({"deleted": deleted})
+
+
+@bp.get("/audit-logs")
+@roles_required("admin")
+def list_audit_logs():
+    q = AuditLog.query.order_by(AuditLog.occurred_at.desc(), AuditLog.log_id.desc())
+
+    entity = (request.args.get("entity") or "").strip()
+    entity_id = (request.args.get("entity_id") or "").strip()
+    user_id = (request.args.get("user_id") or "").strip()
+    action = (request.args.get("action") or "").strip()
+    start_time = (request.args.get("start_time") or "").strip()
+    end_time = (request.args.get("end_time") or "").strip()
+
+    limit = min(_parse_int(request.args.get("limit") or "100", field="limit"), 200)
+    offset = max(_parse_int(request.args.get("offset") or "0", field="offset"), 0)
+
+    if entity:
+        q = q.filter(AuditLog.entity == entity)
+        if entity_id:
+            q = q.filter(AuditLog.entity_id == entity_id)
+    elif entity_id:
+        raise APIError("entity_id requires entity", code="validation_error", status=400)
+    if user_id:
+        q = q.filter(AuditLog.user_id == _parse_int(user_id, field="user_id"))
+    if action:
+        if action not in ("create", "update", "delete"):
+            raise APIError("Invalid action", code="validation_error", status=400)
+        q = q.filter(AuditLog.action == action)
+    if start_time:
+        q = q.filter(AuditLog.occurred_at >= parse_datetime(start_time))
+    if end_time:
+        q = q.filter(AuditLog.occurred_at <= parse_datetime(end_time))
+
+    total = q.count()
+    items = q.offset(offset).limit(limit).all()
+    return ok({"total": total, "limit": limit, "offset": offset, "items": [log.to_dict() for log in items]})
@@ -3,11 +3,14 @@ from __future__ import annotations
 from datetime import datetime
 
 from flask import Blueprint, request
-from flask_jwt_extended import create_access_token, current_user, jwt_required
+from flask_jwt_extended import create_access_token, current_user, get_jwt, jwt_required
 
 from ..extensions import db
+from ..tenancy import token_claims
 from ..models import Patient, PatientUser, SysUser
 from ..utils.errors import APIError
+from ..utils.ratelimit import check_auth_rate_limit, record_auth_failure
+from ..utils.revocation import revocation_store
 from ..utils.responses import ok
 
 bp = Blueprint("auth", __name__, url_prefix="/api/auth")
@@ -21,15 +24,17 @@ def login():
 
     if not username or not password:
         raise APIError("username and password are required", code="validation_error", status=400)
+    check_auth_rate_limit(username)
 
     user = SysUser.query.filter_by(username=username).first()
     if user is None or user.status != "active" or not user.check_password(password):
+        record_auth_failure(username)
         raise APIError("Invalid credentials", code="invalid_credentials", status=401)
 
     user.last_login = datetime.utcnow()
     db.session.commit()
 
-    token = create_access_token(identity=str(user.user_id), additional_claims={"role": user.role})
+    token = create_access_token(identity=str(user.user_id), additional_claims={"role": user.role, **token_claims()})
     return ok({"access_token": token, "user": user.to_safe_dict()})
 
 
@@ -54,6 +59,7 @@ def register_patient():
         raise APIError("name and phone are required", code="validation_error", status=400)
     if gender is not None and gender not in ("男", "女"):
         raise APIError("Invalid gender", code="validation_error", status=400)
+    check_auth_rate_limit()
 
     if SysUser.query.filter_by(username=username).first() is not None:
         raise APIError("username already exists", code="conflict", status=409)
@@ -90,7 +96,7 @@ def register_patient():
     user.last_login = datetime.utcnow()
     db.session.commit()
 
-    token = create_access_token(identity=str(user.user_id), additional_claims={"role": user.role})
+    token = create_access_token(identity=str(user.user_id), additional_claims={"role": user.role, **token_claims()})
     return ok({"access_token": token, "user": user.to_safe_dict()}, status=201)
 
 
@@ -105,5 +111,10 @@ def profile():
 @bp.post("/logout")
 @jwt_required()
 def logout():
-    # 简化：不做 token blocklist；前端删除 token 即视为登出
+    claims = get_jwt()
+    revocation_store().revoke(
+        jti=claims["jti"],
+        user_id=current_user.user_id if current_user else None,
+        expires_at=datetime.utcfromtimestamp(claims["exp"]),
+    )
     return ok({"message": "logged out"})
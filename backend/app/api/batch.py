@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from flask import Blueprint, Flask, current_app, request
+from flask_jwt_extended import current_user, get_jwt, get_jwt_header, jwt_required
+
+from ..utils.auth import PRINCIPAL_ENVIRON_KEY, Principal
+from ..utils.errors import APIError
+from ..utils.responses import ok
+
+bp = Blueprint("batch", __name__, url_prefix="/api")
+
+_METHODS = ("GET", "POST", "PUT", "DELETE")
+# 登录/注册有独立限流，不允许经批量接口绕过
+_EXCLUDED_PATHS = ("/api/batch", "/api/auth/login", "/api/auth/register")
+
+
+def _parse_sub_request(index: int, item) -> dict:
+    if not isinstance(item, dict):
+        raise APIError("Invalid sub-request", code="validation_error", status=400, details={"index": index})
+    method = (item.get("method") or "GET").strip().upper()
+    path = (item.get("path") or "").strip()
+    if method not in _METHODS:
+        raise APIError("Invalid method", code="validation_error", status=400, details={"index": index})
+    parts = urlsplit(path)
+    if not parts.path.startswith("/api/") or parts.path.rstrip("/") in _EXCLUDED_PATHS or parts.netloc:
+        raise APIError("Invalid path", code="validation_error", status=400, details={"index": index})
+    query = item.get("query")
+    if query is not None and not isinstance(query, dict):
+        raise APIError("query must be an object", code="validation_error", status=400, details={"index": index})
+    return {
+        "method": method,
+        "path": parts.path,
+        "query_string": query if query is not None else parts.query,
+        "body": item.get("body"),
+    }
+
+
+def _dispatch(app: Flask, sub: dict, principal: Principal, authorization: str) -> dict:
+    # 每个子请求独立的 app context => 独立的 g 与数据库会话（串行/并发皆然）；身份沿用外层请求已校验的结果。
+    with app.app_context(), app.test_request_context(
+        sub["path"],
+        method=sub["method"],
+        query_string=sub["query_string"],
+        json=sub["body"] if sub["method"] != "GET" else None,
+        headers={"Authorization": authorization},
+        environ_overrides={PRINCIPAL_ENVIRON_KEY: principal},
+    ):
+        response = app.full_dispatch_request()
+    body = response.get_json(silent=True)
+    return {"status": response.status_code, "body": body if body is not None else response.get_data(as_text=True)}
+
+
+@bp.post("/batch")
+@jwt_required()
+def batch():
+    if current_user is None or current_user.status != "active":
+        raise APIError("Unauthorized", code="unauthorized", status=401)
+
+    payload = request.get_json(silent=True) or {}
+    items = payload.get("requests")
+    if not isinstance(items, list) or not items:
+        raise APIError("requests must be a non-empty list", code="validation_error", status=400)
+    max_requests = current_app.config.get("BATCH_MAX_REQUESTS", 20)
+    if len(items) > max_requests:
+        raise APIError(f"At most {max_requests} sub-requests", code="validation_error", status=400)
+    subs = [_parse_sub_request(i, item) for i, item in enumerate(items)]
+    parallel = bool(payload.get("parallel"))
+
+    app = current_app._get_current_object()
+    principal = Principal(jwt_data=get_jwt(), jwt_header=get_jwt_header(), user=current_user._get_current_object())
+    authorization = request.headers.get("Authorization", "")
+
+    results: list[dict | None] = [None] * len(subs)
+    i = 0
+    while i < len(subs):
+        # 连续的 GET 视为相互独立的读请求，可并发执行；写请求按原顺序串行执行。
+        j = i
+        while parallel and j < len(subs) and subs[j]["method"] == "GET":
+            j += 1
+        if j - i > 1:
+            workers = min(j - i, current_app.config.get("BATCH_MAX_WORKERS", 4))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_dispatch, app, subs[k], principal, authorization) for k in range(i, j)]
+                for k, future in zip(range(i, j), futures):
+                    results[k] = future.result()
+            i = j
+        else:
+            results[i] = _dispatch(app, subs[i], principal, authorization)
+            i += 1
+
+    return ok({"responses": results})
@@ -9,6 +9,7 @@ from ..models import Appointment, Department, Patient
 from ..utils.auth import roles_required
 from ..utils.datetime_utils import parse_datetime
 from ..utils.errors import APIError
+from ..utils.fields import field_options, parse_fields, prune
 from ..utils.responses import ok
 
 bp = Blueprint("patient", __name__, url_prefix="/api/patient")
@@ -77,13 +78,18 @@ def query_appointments():
     if patient is None:
         raise APIError("Unauthorized", code="unauthorized", status=401)
 
-    q = Appointment.query.filter_by(patient_id=patient.patient_id).order_by(Appointment.appt_id.desc())
+    fields = parse_fields(request.args.get("fields"))
+    q = (
+        Appointment.query.options(*field_options(Appointment, fields))
+        .filter_by(patient_id=patient.patient_id)
+        .order_by(Appointment.appt_id.desc())
+    )
     status = (request.args.get("status") or "").strip()
     if status:
         q = q.filter(Appointment.status == status)
 
     appts = q.limit(50).all()
-    return ok([a.to_dict() for a in appts])
+    return ok(prune([a.to_dict() for a in appts], fields))
 
 
 @bp.delete("/appointments/<int:appt_id>")
@@ -4,12 +4,15 @@ from datetime import date, datetime, time
 from decimal import Decimal, ROUND_HALF_UP
 
 from flask import Blueprint, request
+from sqlalchemy.orm import lazyload
 
+from .. import archive, capacity, refdata
 from ..extensions import db
-from ..models import Appointment, Bill, IncomeRecord, Patient, Room, Schedule, Visit
+from ..models import Appointment, Bill, IncomeRecord, Patient, Schedule, Visit
 from ..utils.auth import roles_required
 from ..utils.datetime_utils import detect_time_slot, parse_date, parse_datetime
 from ..utils.errors import APIError
+from ..utils.fields import field_options, parse_fields, prune, subtree
 from ..utils.responses import ok
 
 bp = Blueprint("receptionist", __name__, url_prefix="/api/receptionist")
@@ -34,27 +37,28 @@ def _parse_int(value: str | None, *, field: str) -> int:
         raise APIError(f"Invalid {field}", code="validation_error", status=400) from e
 
 
+def _parse_bool(value: str | None) -> bool:
+    return (value or "").strip().lower() in ("1", "true", "yes", "on")
+
+
 def _reserve_schedule(*, dept_id: int, target_dt: datetime) -> Schedule:
     slot = detect_time_slot(target_dt)
     work_date = target_dt.date()
 
+    # 启用 rooms of the department come from the reference-data cache, so this query touches schedule only.
+    room_ids = refdata.room_ids(dept_id, status="启用")
+    if not room_ids:
+        raise APIError("No available schedule for this department/time", code="no_schedule", status=409)
     q = (
-        Schedule.query.join(Room, Schedule.room_id == Room.room_id)
-        .filter(Room.dept_id == dept_id)
-        .filter(Room.status == "启用")
+        Schedule.query.filter(Schedule.room_id.in_(room_ids))
         .filter(Schedule.work_date == work_date)
         .filter(Schedule.time_slot.in_([slot, "全天"]))
-        .filter(Schedule.current_patients < Schedule.max_patients)
-        .order_by(Schedule.current_patients.asc(), Schedule.schedule_id.asc())
+        .filter(Schedule.booked_patients < Schedule.max_patients)
+        .order_by(Schedule.booked_patients.asc(), Schedule.schedule_id.asc())
     )
     schedule_ids = [sid for (sid,) in q.with_entities(Schedule.schedule_id).limit(20).all()]
     for schedule_id in schedule_ids:
-        updated = (
-            Schedule.query.filter(Schedule.schedule_id == schedule_id)
-            .filter(Schedule.current_patients < Schedule.max_patients)
-            .update({Schedule.current_patients: Schedule.current_patients + 1}, synchronize_session=False)
-        )
-        if updated:
+        if capacity.reserve(schedule_id):
             schedule = Schedule.query.get(schedule_id)
             if schedule is None:
                 raise APIError("Schedule not found", code="invalid_state", status=409)
@@ -87,12 +91,13 @@ def _get_or_create_patient(*, name: str, phone: str, gender: str | None, id_card
 @bp.get("/appointments")
 @roles_required("receptionist")
 def list_appointments():
-    q = Appointment.query.order_by(Appointment.appt_id.desc())
+    fields = parse_fields(request.args.get("fields"))
+    q = Appointment.query.options(*field_options(Appointment, fields)).order_by(Appointment.appt_id.desc())
     status = (request.args.get("status") or "").strip()
     if status:
         q = q.filter(Appointment.status == status)
     appts = q.limit(100).all()
-    return ok([a.to_dict() for a in appts])
+    return ok(prune([a.to_dict() for a in appts], fields))
 
 
 _APPOINTMENT_TRANSITIONS: dict[str, set[str]] = {
@@ -241,12 +246,13 @@ def onsite_register():
 @bp.get("/visits")
 @roles_required("receptionist")
 def list_visits():
-    q = Visit.query.order_by(Visit.visit_id.desc())
+    fields = parse_fields(request.args.get("fields"))
+    q = Visit.query.options(*field_options(Visit, fields)).order_by(Visit.visit_id.desc())
     status = (request.args.get("status") or "").strip()
     if status:
         q = q.filter(Visit.status == status)
     visits = q.limit(100).all()
-    return ok([v.to_dict() for v in visits])
+    return ok([v.to_dict(fields) for v in visits])
 
 
 @bp.get("/patients")
@@ -266,7 +272,7 @@ def list_patients():
         q = q.filter(Patient.id_card == id_card)
 
     patients = q.limit(200).all()
-    return ok([p.to_dict() for p in patients])
+    return ok(prune([p.to_dict() for p in patients], parse_fields(request.args.get("fields"))))
 
 
 _VISIT_TRANSITIONS: dict[str, set[str]] = {
@@ -355,7 +361,8 @@ def pay(visit_id: int):
 
         db.session.flush()  # 需要 bill_id 用于收入记录
 
-        dept_id = visit.room.dept_id if visit.room else None
+        room = refdata.room(visit.room_id)
+        dept_id = room["dept_id"] if room else None
         if dept_id is None:
             raise APIError("Visit room is missing", code="invalid_state", status=409)
 
@@ -384,11 +391,18 @@ def pay(visit_id: int):
 @bp.get("/bills")
 @roles_required("receptionist")
 def list_bills():
+    include_archive = _parse_bool(request.args.get("include_archive"))
+    fields = parse_fields(request.args.get("fields"))
+    want_visit = fields is None or "visit" in fields
+    visit_fields = subtree(fields, "visit")
+    B = archive.source(Bill, include_archive)
+    V = archive.source(Visit, include_archive)
     q = (
-        Bill.query.join(Visit, Bill.visit_id == Visit.visit_id)
-        .join(Patient, Visit.patient_id == Patient.patient_id)
-        .join(Room, Visit.room_id == Room.room_id)
-        .order_by(Bill.bill_id.desc())
+        db.session.query(B, V)
+        .join(V, B.visit_id == V.visit_id)
+        .join(Patient, V.patient_id == Patient.patient_id)
+        .order_by(B.bill_id.desc())
+        .options(lazyload(B.visit), *field_options(V, visit_fields if want_visit else {}))
     )
 
     pay_status = (request.args.get("pay_status") or "").strip()
@@ -409,22 +423,21 @@ def list_bills():
     if pay_status:
         if pay_status not in ("未支付", "已支付"):
             raise APIError("Invalid pay_status", code="validation_error", status=400)
-        q = q.filter(Bill.pay_status == pay_status)
+        q = q.filter(B.pay_status == pay_status)
     if name:
         q = q.filter(Patient.name.like(f"%{name}%"))
     if phone:
         q = q.filter(Patient.phone == phone)
     if id_card:
         q = q.filter(Patient.id_card == id_card)
-    if room_number:
-        q = q.filter(Room.room_number == room_number)
-    if dept_id:
-        q = q.filter(Room.dept_id == _parse_int(dept_id, field="dept_id"))
+    if room_number or dept_id:
+        dept = _parse_int(dept_id, field="dept_id") if dept_id else None
+        q = q.filter(V.room_id.in_(refdata.room_ids(dept, room_number=room_number or None)))
     if doctor_id:
-        q = q.filter(Visit.doctor_id == doctor_id)
+        q = q.filter(V.doctor_id == doctor_id)
 
     # Prefer pay_time for paid bills; fall back to created_at filters for compatibility.
-    time_field = Bill.pay_time if pay_status == "已支付" else Bill.created_at
+    time_field = B.pay_time if pay_status == "已支付" else B.created_at
 
     if start_time:
         q = q.filter(time_field >= parse_datetime(start_time))
@@ -445,7 +458,10 @@ def list_bills():
             "total": total,
             "limit": limit,
             "offset": offset,
-            "items": [{"bill": b.to_dict(), "visit": b.visit.to_dict() if b.visit else None} for b in items],
+            "items": [
+                prune({"bill": b.to_dict(), "visit": v.to_dict(visit_fields) if want_visit else None}, fields)
+                for b, v in items
+            ],
         }
     )
 
@@ -453,7 +469,8 @@ def list_bills():
 @bp.get("/income-records")
 @roles_required("receptionist")
 def list_income_records():
-    q = IncomeRecord.query.order_by(IncomeRecord.record_id.desc())
+    fields = parse_fields(request.args.get("fields"))
+    q = IncomeRecord.query.options(*field_options(IncomeRecord, fields)).order_by(IncomeRecord.record_id.desc())
 
     start_date = (request.args.get("start_date") or "").strip()
     end_date = (request.args.get("end_date") or "").strip()
@@ -474,4 +491,6 @@ def list_income_records():
 
     total = q.count()
     items = q.offset(offset).limit(limit).all()
-    return ok({"total": total, "limit": limit, "offset": offset, "items": [r.to_dict() for r in items]})
+    return ok(
+        {"total": total, "limit": limit, "offset": offset, "items": prune([r.to_dict() for r in items], fields)}
+    )
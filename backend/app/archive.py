@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import calendar
+from datetime import date, datetime
+
+from sqlalchemy import delete, insert, select, union_all
+from sqlalchemy.orm import aliased
+
+from .extensions import db
+from .models import (
+    Bill,
+    BillArchive,
+    IncomeRecord,
+    IncomeRecordArchive,
+    MedicalRecord,
+    MedicalRecordArchive,
+    Visit,
+    VisitArchive,
+)
+from .utils import metrics
+
+# hot model -> archive model
+_ARCHIVE_PAIRS = {
+    Visit: VisitArchive,
+    Bill: BillArchive,
+    IncomeRecord: IncomeRecordArchive,
+    MedicalRecord: MedicalRecordArchive,
+}
+
+
+def months_ago(d: date, months: int) -> date:
+    y, m = divmod(d.year * 12 + (d.month - 1) - months, 12)
+    m += 1
+    return date(y, m, min(d.day, calendar.monthrange(y, m)[1]))
+
+
+def archive_cutoff(months: int, *, today: date | None = None) -> date:
+    return months_ago(today or date.today(), months)
+
+
+def _copy_columns(model) -> list[str]:
+    return [c.name for c in model.__table__.columns]
+
+
+def _union_subquery(model, name: str):
+    hot = model.__table__
+    cold = _ARCHIVE_PAIRS[model].__table__
+    cols = _copy_columns(model)
+    return union_all(select(*[hot.c[c] for c in cols]), select(*[cold.c[c] for c in cols])).subquery(name)
+
+
+def source(model, include_archive: bool):
+    """
+    Return `model` itself, or an aliased entity over `hot UNION ALL archive` with the same
+    attributes/relationships, so query code can stay identical for both cases.
+    """
+    if not include_archive:
+        return model
+    return aliased(model, _union_subquery(model, f"{model.__tablename__}_all"))
+
+
+def archive_closed_records(*, months: int, batch_size: int = 500, max_batches: int | None = None) -> dict:
+    """
+    Move 已离院 visits checked out before the cutoff (with their bill, income records and medical record)
+    into the *_archive tables. Visits whose bill is still 未支付 stay in the hot tables.
+    Each batch is one transaction: INSERT ... SELECT into the archive, then DELETE from the hot tables.
+    """
+    cutoff = datetime.combine(archive_cutoff(months), datetime.min.time())
+    unpaid = select(Bill.visit_id).where(Bill.pay_status != "已支付")
+
+    moved = {"visits": 0, "bills": 0, "income_records": 0, "medical_records": 0}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        batches += 1
+        visit_ids = [
+            vid
+            for (vid,) in db.session.query(Visit.visit_id)
+            .filter(Visit.status == "已离院")
+            .filter(Visit.checkout_time < cutoff)
+            .filter(Visit.visit_id.not_in(unpaid))
+            .order_by(Visit.visit_id.asc())
+            .limit(batch_size)
+            .all()
+        ]
+        if not visit_ids:
+            break
+
+        bill_ids = select(Bill.bill_id).where(Bill.visit_id.in_(visit_ids))
+        steps = [
+            (IncomeRecord, IncomeRecord.bill_id.in_(bill_ids), "income_records"),
+            (MedicalRecord, MedicalRecord.visit_id.in_(visit_ids), "medical_records"),
+            (Bill, Bill.visit_id.in_(visit_ids), "bills"),
+            (Visit, Visit.visit_id.in_(visit_ids), "visits"),
+        ]
+        try:
+            # Archive tables have no FKs, so copy order is free; deletes must go children-first.
+            for model, cond, _key in steps:
+                cols = _copy_columns(model)
+                archive_table = _ARCHIVE_PAIRS[model].__table__
+                db.session.execute(
+                    insert(archive_table).from_select(cols, select(*[model.__table__.c[c] for c in cols]).where(cond))
+                )
+            for model, cond, key in steps:
+                result = db.session.execute(delete(model.__table__).where(cond))
+                moved[key] += result.rowcount or 0
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if len(visit_ids) < batch_size:
+            break
+
+    for key, count in moved.items():
+        metrics.incr(f"archive.{key}", count)
+    return moved
+
+
+def visit_exists(visit_id: int) -> bool:
+    if db.session.get(Visit, visit_id) is not None:
+        return True
+    return db.session.get(VisitArchive, visit_id) is not None
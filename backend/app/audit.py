@@ -0,0 +1,433 @@
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+from flask import Flask, current_app, g, has_request_context, request
+from sqlalchemy import Column, event, insert
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import (
+    Appointment,
+    AuditLog,
+    Bill,
+    Department,
+    Employee,
+    IncomeRecord,
+    MedicalRecord,
+    Room,
+    Schedule,
+    Visit,
+)
+from .tenancy import current_tenant, use_tenant
+from .utils import metrics
+
+# ORM changes to these tables are recorded. Bulk UPDATEs (capacity counters, appointment sweeper, archiving)
+# bypass the session's flush and are intentionally not audited.
+AUDITED_MODELS = (Appointment, Bill, Department, Employee, IncomeRecord, MedicalRecord, Room, Schedule, Visit)
+
+_PENDING_KEY = "audit_pending"
+
+
+def _jsonable(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _changes(obj, action: str) -> dict:
+    """create/delete: {column: value}; update: {column: [old, new]} for changed columns only. Never loads from the DB."""
+    state = sa_inspect(obj)
+    out = {}
+    for prop in state.mapper.column_attrs:
+        if not isinstance(prop.columns[0], Column):
+            continue  # column_property expressions (e.g. Schedule.sharded_patients)
+        key = prop.key
+        if action != "update":
+            if key in state.dict:
+                out[key] = _jsonable(state.dict[key])
+            continue
+        hist = state.attrs[key].history
+        if not hist.added:
+            continue
+        old = hist.deleted[0] if hist.deleted else None
+        new = hist.added[0]
+        if old != new:
+            out[key] = [_jsonable(old), _jsonable(new)]
+    return out
+
+
+def _actor() -> tuple[int | None, str | None, str]:
+    # Set by flask_jwt_extended (or Principal.install for batch sub-requests) once the token is verified.
+    jwt_data = g.get("_jwt_extended_jwt") or {}
+    try:
+        user_id = int(jwt_data["sub"]) if jwt_data.get("sub") is not None else None
+    except (TypeError, ValueError):
+        user_id = None
+    return user_id, jwt_data.get("role"), request.path[:255]
+
+
+def _before_flush(session: Session, _flush_context, _instances) -> None:
+    if not has_request_context() or not current_app.config.get("AUDIT_ENABLED", True):
+        return
+    now = datetime.utcnow()
+    pending = session.info.setdefault(_PENDING_KEY, [])
+    for action, objs in (("create", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objs:
+            if not isinstance(obj, AUDITED_MODELS):
+                continue
+            changes = _changes(obj, action)
+            if action == "update" and not changes:
+                continue
+            pending.append((now, action, obj, changes))
+
+
+def _after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending or not has_request_context():
+        return
+    user_id, role, path = _actor()
+    tenant = current_tenant()
+    events = []
+    for occurred_at, action, obj, changes in pending:
+        # The identity key survives commit/expiry, so this does not emit SQL.
+        identity = sa_inspect(obj).identity
+        events.append(
+            {
+                "occurred_at": occurred_at,
+                "user_id": user_id,
+                "role": role,
+                "action": action,
+                "entity": obj.__tablename__,
+                "entity_id": ",".join(str(v) for v in identity) if identity else None,
+                "changes": json.dumps(changes, ensure_ascii=False),
+                "request_path": path,
+                "tenant": tenant,
+            }
+        )
+    writer = current_app.extensions.get("audit")
+    if writer is not None:
+        writer.enqueue(events)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+class AuditWriter:
+    """
+    Write-behind sink: request threads enqueue events, one background thread inserts them in batches.
+    Every committed event is first appended (and fsynced) to a per-process journal, so a worker killed with
+    events still queued loses nothing: the journal of a dead process is replayed by the next one that looks.
+    The writer drops journal segments once all of their events are in the database. Events that cannot be
+    written (queue full, insert failed) go to a separate spool file that this process replays itself.
+    Delivery is at-least-once: after a crash, events inserted since the last retired segment are written again.
+    """
+
+    def __init__(self, app: Flask, *, queue_size: int, batch_size: int, flush_interval: float, spool_dir: str) -> None:
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_dir = Path(spool_dir)
+        self._queue_size = queue_size
+        self._lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        # Also called after fork: threads, queued events and journal segments belong to the parent.
+        self._pid = os.getpid()
+        self._queue: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        self._thread: threading.Thread | None = None
+        self._replay_after = 0.0
+        # Journal bookkeeping, guarded by _spool_lock. Events are counted in queue order: _journaled when
+        # appended, _handled once inserted or spooled; a segment is retired when _handled reaches its end.
+        self._journal = None
+        self._journal_seq = 0
+        self._journal_count = 0
+        self._journaled = 0
+        self._handled = 0
+        self._segments: list[tuple[Path, int]] = []
+
+    @property
+    def spool_path(self) -> Path:
+        return self.spool_dir / f"audit-{self._pid}.spool"
+
+    def _journal_path(self, seq: int) -> Path:
+        return self.spool_dir / f"audit-{self._pid}.journal.{seq}"
+
+    def enqueue(self, events: list[dict]) -> None:
+        """Called after commit; returns once the events are on disk (journal or spool)."""
+        self._ensure_thread()
+        queued, overflow = [], []
+        with self._spool_lock:
+            for ev in events:
+                try:
+                    self._queue.put_nowait(ev)
+                    queued.append(ev)
+                except queue.Full:
+                    overflow.append(ev)
+            # Still under the lock: the writer cannot count these events as handled before they are journaled.
+            if queued:
+                self._append_journal(queued)
+            if overflow:
+                self._append(self.spool_path, overflow)
+        if overflow:
+            metrics.incr("audit.overflow", len(overflow))
+            metrics.incr("audit.spooled", len(overflow))
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            elif time.monotonic() >= self._replay_after:
+                self.replay_spool()
+
+    def _next_batch(self) -> list[dict]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, rows: list[dict]) -> list[dict]:
+        """Insert events into their clinics' databases, one transaction per clinic; returns the rows that failed."""
+        by_tenant: dict[str | None, list[dict]] = {}
+        for row in rows:
+            row = dict(row)
+            by_tenant.setdefault(row.pop("tenant", None), []).append(row)
+        failed = []
+        for tenant, tenant_rows in by_tenant.items():
+            try:
+                with use_tenant(tenant), self.app.app_context():
+                    try:
+                        db.session.execute(insert(AuditLog.__table__), tenant_rows)
+                        db.session.commit()
+                    except Exception:
+                        db.session.rollback()
+                        raise
+                    finally:
+                        db.session.remove()
+            except Exception:
+                self.app.logger.exception("Audit insert failed for tenant %s; spooling %d events", tenant, len(tenant_rows))
+                failed.extend({**row, "tenant": tenant} for row in tenant_rows)
+        return failed
+
+    def _write(self, batch: list[dict]) -> None:
+        failed = self._insert(batch)
+        if failed:
+            # Only the clinics whose transaction failed: the others are committed and must not be replayed.
+            metrics.incr("audit.write_errors")
+            self._spool(failed)
+        metrics.incr("audit.written", len(batch) - len(failed))
+        self._mark_handled(len(batch))
+
+    def flush(self) -> int:
+        """Synchronously write everything queued so far (CLI, tests, shutdown); returns the number of events."""
+        batch: list[dict] = []
+        written = 0
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+            written += len(batch)
+        return written
+
+    def _append(self, path: Path, events: list[dict]) -> None:
+        # Caller holds _spool_lock.
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(_spool_lines(events))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _append_journal(self, events: list[dict]) -> None:
+        # Caller holds _spool_lock. One write and one fsync per committed transaction.
+        if self._journal is None:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            self._journal_seq += 1
+            self._journal = open(self._journal_path(self._journal_seq), "a", encoding="utf-8")
+            self._journal_count = 0
+        self._journal.write(_spool_lines(events))
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._journaled += len(events)
+        self._journal_count += len(events)
+        if self._journal_count >= self.batch_size:
+            # Roll over so a busy writer, whose queue never quite drains, can still retire older segments.
+            self._close_segment()
+
+    def _close_segment(self) -> None:
+        self._journal.close()
+        self._journal = None
+        self._segments.append((self._journal_path(self._journal_seq), self._journaled))
+
+    def _mark_handled(self, count: int) -> None:
+        with self._spool_lock:
+            self._handled += count
+            if self._journal is not None and self._handled >= self._journaled:
+                self._close_segment()
+            while self._segments and self._segments[0][1] <= self._handled:
+                path, _ = self._segments.pop(0)
+                path.unlink(missing_ok=True)
+
+    def _spool(self, events: list[dict]) -> None:
+        with self._spool_lock:
+            self._append(self.spool_path, events)
+        metrics.incr("audit.spooled", len(events))
+
+    def _claim_spool_files(self) -> list[Path]:
+        """
+        Files this process may replay: its own spool, and the spools and journals of processes that are gone.
+        Each is renamed to <name>.replay-<own pid> first; the rename is atomic, so when several workers look
+        at the same orphan only one of them gets it. The own journal is live and never claimed.
+        """
+        if not self.spool_dir.is_dir():
+            return []
+        own = os.getpid()
+        claimed = []
+        for path in sorted(self.spool_dir.glob("audit-*")):
+            base, _, holder = path.name.partition(".replay-")
+            owner_part = base[len("audit-") :].split(".", 1)[0]
+            if holder.isdigit():
+                owner = int(holder)
+            elif owner_part.isdigit():
+                owner = int(owner_part)
+            else:
+                continue
+            if owner == own and not holder and ".journal" in base:
+                continue
+            if owner != own and _pid_alive(owner):
+                continue
+            target = path.with_name(f"{base}.replay-{own}")
+            if target != path:
+                try:
+                    with self._spool_lock:
+                        os.replace(path, target)
+                except FileNotFoundError:
+                    continue
+            claimed.append(target)
+        return claimed
+
+    def replay_spool(self) -> int:
+        replayed = 0
+        for path in self._claim_spool_files():
+            rows = []
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        ev = json.loads(line)
+                        ev["occurred_at"] = datetime.fromisoformat(ev["occurred_at"])
+                    except (ValueError, KeyError, TypeError):
+                        continue  # torn last line after a crash
+                    rows.append(ev)
+            failed = self._insert(rows) if rows else []
+            replayed += len(rows) - len(failed)
+            if failed:
+                # Keep only the clinics that failed, so a retry does not duplicate the ones just committed.
+                tmp = path.with_name(f".{path.name}.tmp")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(_spool_lines(failed))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, path)
+                self.app.logger.error("Audit spool replay incomplete: %s (%d events left)", path, len(failed))
+                self._replay_after = time.monotonic() + 30
+                break
+            path.unlink()
+        if replayed:
+            metrics.incr("audit.replayed", replayed)
+        return replayed
+
+    def close(self) -> None:
+        """Process exit: queued events are already journaled; the next process replays what is left."""
+        if self._pid != os.getpid():
+            return
+        with self._spool_lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+
+def _spool_lines(events: list[dict]) -> str:
+    return "".join(json.dumps({**ev, "occurred_at": _jsonable(ev["occurred_at"])}, ensure_ascii=False) + "\n" for ev in events)
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        return False  # os.kill would terminate the process on Windows; dev server is single-process there
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_listeners_installed = False
+
+
+def init_audit(app: Flask) -> AuditWriter | None:
+    global _listeners_installed
+    if not app.config.get("AUDIT_ENABLED", True):
+        return None
+    writer = AuditWriter(
+        app,
+        queue_size=app.config.get("AUDIT_QUEUE_SIZE", 10000),
+        batch_size=app.config.get("AUDIT_BATCH_SIZE", 200),
+        flush_interval=app.config.get("AUDIT_FLUSH_INTERVAL", 1.0),
+        spool_dir=app.config.get("AUDIT_SPOOL_DIR") or os.path.join(app.instance_path, "audit-spool"),
+    )
+    app.extensions["audit"] = writer
+    atexit.register(writer.close)
+    if not _listeners_installed:
+        event.listen(Session, "before_flush", _before_flush)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
+        _listeners_installed = True
+    return writer
+
+
+def audit_writer() -> AuditWriter | None:
+    return current_app.extensions.get("audit")
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import random
+from datetime import date
+
+from flask import current_app
+from sqlalchemy import insert, select
+
+from .extensions import db
+from .models import Schedule, ScheduleCounterShard as Shard
+from .utils import metrics
+
+
+def shard_count() -> int:
+    return int(current_app.config.get("SCHEDULE_COUNTER_SHARDS", 0) or 0)
+
+
+def _dialect() -> str:
+    return db.session.get_bind().dialect.name
+
+
+def _reserve_direct(schedule_id: int) -> bool:
+    # Single conditional UPDATE on the schedule row (row lock held until commit).
+    updated = (
+        Schedule.query.filter(Schedule.schedule_id == schedule_id)
+        .filter(Schedule.booked_patients < Schedule.max_patients)
+        .update({Schedule.current_patients: Schedule.current_patients + 1}, synchronize_session=False)
+    )
+    return bool(updated)
+
+
+def _lock_schedule(schedule_id: int):
+    # Shard creation and compaction both take the schedule row first: current_patients is only read under it.
+    return db.session.execute(
+        select(Schedule.max_patients, Schedule.current_patients)
+        .where(Schedule.schedule_id == schedule_id)
+        .with_for_update()
+    ).first()
+
+
+def _create_shards(schedule_id: int, shards: int) -> bool:
+    """
+    Split the schedule's remaining capacity across `shards` rows; False when nothing is left to split.
+    True as well when another transaction created them first (the caller retries on those).
+    """
+    row = _lock_schedule(schedule_id)
+    if row is None:
+        return False
+    if db.session.execute(select(Shard.shard_no).where(Shard.schedule_id == schedule_id).limit(1)).first():
+        return True
+    remaining = row.max_patients - row.current_patients
+    if remaining <= 0:
+        return False
+    shards = min(shards, remaining)
+    base, extra = divmod(remaining, shards)
+    rows = [
+        {"schedule_id": schedule_id, "shard_no": i, "capacity": base + (1 if i < extra else 0), "used": 0}
+        for i in range(shards)
+    ]
+    # Two requests may shard the same schedule at once; both compute the same split, the loser's rows are ignored.
+    dialect = _dialect()
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        stmt = dialect_insert(Shard.__table__).on_conflict_do_nothing()
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+        stmt = dialect_insert(Shard.__table__).on_conflict_do_nothing()
+    else:
+        stmt = insert(Shard.__table__).prefix_with("IGNORE")
+    db.session.execute(stmt, rows)
+    metrics.incr("capacity.shards_created")
+    return True
+
+
+def _increment_shard(schedule_id: int, shard_no: int) -> bool:
+    updated = (
+        Shard.query.filter(Shard.schedule_id == schedule_id, Shard.shard_no == shard_no)
+        .filter(Shard.used < Shard.capacity)
+        .update({Shard.used: Shard.used + 1}, synchronize_session=False)
+    )
+    return bool(updated)
+
+
+def _reserve_sharded(schedule_id: int, shards: int) -> bool:
+    open_shards = select(Shard.shard_no).where(Shard.schedule_id == schedule_id, Shard.used < Shard.capacity)
+    for _attempt in range(2):
+        if _dialect() in ("mysql", "mariadb", "postgresql"):
+            # Take any shard no other transaction holds; only if all are busy, wait on one of them.
+            shard_no = db.session.execute(open_shards.limit(1).with_for_update(skip_locked=True)).scalar()
+            if shard_no is None:
+                shard_no = db.session.execute(open_shards.limit(1).with_for_update()).scalar()
+            candidates = [] if shard_no is None else [shard_no]
+        else:
+            # SQLite locks the whole database anyway; random order just spreads the counts.
+            candidates = list(db.session.execute(open_shards).scalars())
+            random.shuffle(candidates)
+        for shard_no in candidates:
+            if _increment_shard(schedule_id, shard_no):
+                return True
+
+        has_shards = db.session.execute(select(Shard.shard_no).where(Shard.schedule_id == schedule_id).limit(1)).first()
+        if has_shards is not None or not _create_shards(schedule_id, shards):
+            return False
+    return False
+
+
+def reserve(schedule_id: int) -> bool:
+    """Take one place on the schedule inside the caller's transaction; False when it is full."""
+    shards = shard_count()
+    if shards > 1:
+        return _reserve_sharded(schedule_id, shards)
+    return _reserve_direct(schedule_id)
+
+
+def compact_schedule_shards(*, schedule_ids: list[int] | None = None, before: date | None = None) -> int:
+    """
+    Fold shard counts back into schedule.current_patients and drop the shards (one transaction per schedule).
+    Limit to `schedule_ids`, or to schedules with work_date before `before`. Returns the number compacted.
+    """
+    q = db.session.query(Shard.schedule_id).distinct()
+    if schedule_ids is not None:
+        q = q.filter(Shard.schedule_id.in_(schedule_ids))
+    if before is not None:
+        q = q.join(Schedule, Schedule.schedule_id == Shard.schedule_id).filter(Schedule.work_date < before)
+    ids = [sid for (sid,) in q.all()]
+
+    for schedule_id in ids:
+        try:
+            _lock_schedule(schedule_id)
+            rows = Shard.query.filter(Shard.schedule_id == schedule_id).with_for_update().all()
+            used = sum(r.used for r in rows)
+            Schedule.query.filter(Schedule.schedule_id == schedule_id).update(
+                {Schedule.current_patients: Schedule.current_patients + used}, synchronize_session=False
+            )
+            Shard.query.filter(Shard.schedule_id == schedule_id).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    metrics.incr("capacity.shards_compacted", len(ids))
+    return len(ids)
@@ -14,3 +14,124 @@ class Config:
 
     # Auto create tables + seed minimal demo data at startup (recommended for course demo).
     AUTO_SEED = os.getenv("AUTO_SEED", "1").lower() not in ("0", "false", "no", "off")
+
+    # Encode responses with orjson when installed (falls back to stdlib json).
+    FAST_JSON = os.getenv("FAST_JSON", "1").lower() not in ("0", "false", "no", "off")
+
+    # gzip/brotli response compression for JSON/text bodies above COMPRESS_MIN_SIZE bytes.
+    COMPRESS_ENABLED = os.getenv("COMPRESS_ENABLED", "1").lower() not in ("0", "false", "no", "off")
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+    COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+    COMPRESS_BR_LEVEL = int(os.getenv("COMPRESS_BR_LEVEL", "5"))
+
+    # POST /api/batch: max sub-requests per call / threads for parallel GETs.
+    BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+    BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "4"))
+
+    # Login/register throttling (token bucket per IP and per username + failed-login window).
+    AUTH_RATE_LIMIT_ENABLED = os.getenv("AUTH_RATE_LIMIT_ENABLED", "1").lower() not in ("0", "false", "no", "off")
+    AUTH_RATE_PER_MINUTE = float(os.getenv("AUTH_RATE_PER_MINUTE", "30"))
+    AUTH_RATE_BURST = int(os.getenv("AUTH_RATE_BURST", "20"))
+    AUTH_FAILURE_LIMIT = int(os.getenv("AUTH_FAILURE_LIMIT", "10"))
+    AUTH_IP_FAILURE_LIMIT = int(os.getenv("AUTH_IP_FAILURE_LIMIT", "50"))
+    AUTH_FAILURE_WINDOW = int(os.getenv("AUTH_FAILURE_WINDOW", "300"))
+    AUTH_RATE_SLOTS = int(os.getenv("AUTH_RATE_SLOTS", "8192"))
+    # Reverse proxies in front of the app (nginx = 1). The per-IP limits key on the client address, which behind a
+    # proxy is only known from X-Forwarded-For; with 0 that header is ignored (it is client-controlled when the app
+    # is reached directly) and every client behind a proxy shares the proxy's address.
+    TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
+    # Logout revocation: in-memory Bloom filter + exact set over revoked_token, synced every N seconds.
+    TOKEN_REVOCATION_CAPACITY = int(os.getenv("TOKEN_REVOCATION_CAPACITY", "100000"))
+    TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", "5"))
+    # Incremental syncs re-read this much before their watermark (late commits, clock skew between hosts); the
+    # whole table is re-read every FULL_SYNC seconds.
+    TOKEN_REVOCATION_SYNC_OVERLAP_SECONDS = float(os.getenv("TOKEN_REVOCATION_SYNC_OVERLAP_SECONDS", "120"))
+    TOKEN_REVOCATION_FULL_SYNC_SECONDS = float(os.getenv("TOKEN_REVOCATION_FULL_SYNC_SECONDS", "300"))
+
+    # Department/room/employee cache: other processes' changes become visible within N seconds.
+    REFDATA_SYNC_SECONDS = float(os.getenv("REFDATA_SYNC_SECONDS", "5"))
+
+    # Write-behind audit log: change events are journaled to AUDIT_SPOOL_DIR (default: instance/audit-spool)
+    # and queued, then inserted in batches by a background thread; journals of dead workers and events that
+    # could not be written are replayed from there.
+    AUDIT_ENABLED = os.getenv("AUDIT_ENABLED", "1").lower() not in ("0", "false", "no", "off")
+    AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+    AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+    AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1"))
+    AUDIT_SPOOL_DIR = os.getenv("AUDIT_SPOOL_DIR") or None
+
+    # Transparent compression of long medical record text: none | zlib | zstd (needs `zstandard`, else zlib).
+    MEDICAL_RECORD_COMPRESSION = os.getenv("MEDICAL_RECORD_COMPRESSION", "none")
+
+    # Background report jobs (statistics over wide date ranges).
+    REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+    REPORT_CACHE_SECONDS = int(os.getenv("REPORT_CACHE_SECONDS", "300"))
+    REPORT_JOB_TIMEOUT = int(os.getenv("REPORT_JOB_TIMEOUT", "600"))
+    # GET /api/admin/statistics/{visits,income} over more days than this are handed to a report job (202 + job to
+    # poll) instead of being computed in the request; 0 = always inline.
+    REPORT_INLINE_MAX_DAYS = int(os.getenv("REPORT_INLINE_MAX_DAYS", "92"))
+
+    # GET /api/admin/statistics/utilization results are cached in the shared cache for N seconds (0 = no cache).
+    UTILIZATION_CACHE_SECONDS = int(os.getenv("UTILIZATION_CACHE_SECONDS", "30"))
+
+    # Cache shared by the workers: memory (per process) | redis (CACHE_URL, needs `redis`, else memory) | mmap (a
+    # memory-mapped file for the workers of one host). Keys are versioned per namespace and invalidations are
+    # broadcast, so reference data and revoked tokens are dropped in every worker at once.
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+    CACHE_MMAP_PATH = os.getenv("CACHE_MMAP_PATH", "")
+    CACHE_MMAP_SIZE_MB = int(os.getenv("CACHE_MMAP_SIZE_MB", "64"))
+    CACHE_PREFIX = os.getenv("CACHE_PREFIX", "hospital")
+
+    # Multi-clinic mode: requests are routed to the clinic named by the token's `tenant` claim (or, before login,
+    # the TENANT_HEADER header). Clinic databases: TENANT_DATABASES ("code=url;code=url" or a JSON object) plus
+    # `flask provision-tenant` entries; TENANT_DATABASE_URL_TEMPLATE (with {tenant}) supplies URLs not given
+    # explicitly. TENANT_DEFAULT names the main database (SQLALCHEMY_DATABASE_URI).
+    TENANCY_ENABLED = os.getenv("TENANCY_ENABLED", "0").lower() not in ("0", "false", "no", "off")
+    TENANT_DEFAULT = os.getenv("TENANT_DEFAULT", "default")
+    TENANT_HEADER = os.getenv("TENANT_HEADER", "X-Tenant")
+    TENANT_DATABASES = os.getenv("TENANT_DATABASES", "")
+    TENANT_DATABASE_URL_TEMPLATE = os.getenv("TENANT_DATABASE_URL_TEMPLATE", "")
+
+    # Slow query log: statements slower than N ms (0 = off) are recorded per shape and endpoint in slow_query,
+    # keeping at most SLOW_QUERY_MAX_ROWS shapes; SELECT shapes get one EXPLAIN when first seen.
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+    SLOW_QUERY_MAX_ROWS = int(os.getenv("SLOW_QUERY_MAX_ROWS", "1000"))
+    SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1").lower() not in ("0", "false", "no", "off")
+
+    # Sampling request profiler (runtime-adjustable through /api/admin/profiler, per process): fraction of requests
+    # profiled, stack sampling interval, endpoints (e.g. receptionist.search_visits) also traced with tracemalloc,
+    # stacks kept per profile, profiles kept, and at most N requests profiled at once.
+    PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0").lower() not in ("0", "false", "no", "off")
+    PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0.01"))
+    PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+    PROFILER_MEMORY_ENDPOINTS = os.getenv("PROFILER_MEMORY_ENDPOINTS", "")
+    PROFILER_TOP_N = int(os.getenv("PROFILER_TOP_N", "50"))
+    PROFILER_RING_SIZE = int(os.getenv("PROFILER_RING_SIZE", "200"))
+    PROFILER_MAX_CONCURRENT = int(os.getenv("PROFILER_MAX_CONCURRENT", "4"))
+
+    # Income statistics are answered from an in-memory per-day prefix-sum index (per department / doctor), built
+    # once per process from income_record and extended as payments land; 0 = aggregate with SQL on every request.
+    REVENUE_INDEX_ENABLED = os.getenv("REVENUE_INDEX_ENABLED", "1").lower() not in ("0", "false", "no", "off")
+
+    # Patient roster import (`flask import-patients`, POST /api/admin/patients/import): rows per lookup/insert batch
+    # and rows per transaction.
+    PATIENT_IMPORT_CHUNK_SIZE = int(os.getenv("PATIENT_IMPORT_CHUNK_SIZE", "1000"))
+    PATIENT_IMPORT_COMMIT_EVERY = int(os.getenv("PATIENT_IMPORT_COMMIT_EVERY", "10000"))
+
+    # Duplicate-patient detection (`flask find-duplicate-patients`): proposal threshold and largest block compared.
+    PATIENT_DEDUP_MIN_SCORE = float(os.getenv("PATIENT_DEDUP_MIN_SCORE", "0.8"))
+    PATIENT_DEDUP_MAX_BLOCK = int(os.getenv("PATIENT_DEDUP_MAX_BLOCK", "50"))
+
+    # Split each schedule's remaining capacity into N counter shards (0/1 = single conditional UPDATE on schedule).
+    # Before turning it off again, fold the shards back with `flask compact-schedule-shards --all`.
+    SCHEDULE_COUNTER_SHARDS = int(os.getenv("SCHEDULE_COUNTER_SHARDS", "0"))
+
+    # Expire 待确认/已确认 appointments from past days (0 = in-process timer disabled; use `flask expire-appointments`).
+    APPOINTMENT_SWEEP_INTERVAL = int(os.getenv("APPOINTMENT_SWEEP_INTERVAL", "0"))
+    APPOINTMENT_SWEEP_CHUNK = int(os.getenv("APPOINTMENT_SWEEP_CHUNK", "500"))
+    APPOINTMENT_EXPIRE_GRACE_DAYS = int(os.getenv("APPOINTMENT_EXPIRE_GRACE_DAYS", "0"))
+
+    # Hot/cold archiving: 已离院 visits (and their bills/income/medical records) older than N months.
+    ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", "12"))
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import json
+import unicodedata
+from datetime import datetime
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from sqlalchemy import case, delete, insert, or_, update
+
+from .extensions import db
+from .models import Appointment, Patient, PatientDuplicate, PatientUser, Visit, VisitArchive
+from .utils import metrics
+
+# Duplicate patients are only compared inside blocks sharing one of these keys, never all-against-all:
+#   phone (digits only), normalized name, first 14 ID-card characters (region + date of birth).
+# Blocks larger than `max_block` (very common names, shared clinic phone numbers) carry no signal and are skipped.
+_ID_PREFIX = 14
+# Tables whose patient_id is repointed to the surviving patient on merge.
+_REFERENCING = (Visit, Appointment, VisitArchive, PatientUser)
+
+
+def normalize_name(name: str | None) -> str:
+    # NFKC folds full-width letters/digits; spaces and the middle dots of transliterated names are dropped.
+    name = unicodedata.normalize("NFKC", name or "").lower()
+    return "".join(ch for ch in name if not ch.isspace() and ch not in "·•.-_")
+
+
+def normalize_phone(phone: str | None) -> str:
+    digits = "".join(ch for ch in (phone or "") if ch.isdigit())
+    if len(digits) == 13 and digits.startswith("86"):
+        digits = digits[2:]
+    return digits
+
+
+def _near(a: str, b: str) -> bool:
+    """Same length and at most one differing character (a typo)."""
+    return len(a) == len(b) and sum(x != y for x, y in zip(a, b)) <= 1
+
+
+def score_pair(a: tuple, b: tuple, min_score: float = 0.0) -> tuple[float, list[str]]:
+    """
+    a/b = (name, phone, id_card, gender), already normalized. Returns (score in [0, 1], matched reasons).
+    Different ID cards or genders mean different people (score 0). Pairs that cannot reach `min_score` even with
+    identical names return 0 without the (comparatively slow) name comparison.
+    """
+    name_a, phone_a, id_a, gender_a = a
+    name_b, phone_b, id_b, gender_b = b
+    if gender_a and gender_b and gender_a != gender_b:
+        return 0.0, []
+    reasons = []
+
+    phone_sim = 0.0
+    if phone_a and phone_a == phone_b:
+        phone_sim = 1.0
+        reasons.append("phone")
+    elif phone_a and phone_b and _near(phone_a, phone_b):
+        phone_sim = 0.8
+        reasons.append("phone~")
+
+    if id_a and id_b:
+        if id_a == id_b:
+            id_sim = 1.0
+            reasons.append("id_card")
+        elif _near(id_a, id_b):
+            id_sim = 0.9
+            reasons.append("id_card~")
+        else:
+            return 0.0, []
+        name_weight, rest = 0.4, 0.3 * phone_sim + 0.3 * id_sim
+    else:
+        name_weight, rest = 0.55, 0.45 * phone_sim
+    if name_weight + rest < min_score:
+        return 0.0, []
+
+    name_sim = SequenceMatcher(None, name_a, name_b).ratio() if name_a and name_b else 0.0
+    if name_sim == 1.0:
+        reasons.insert(0, "name")
+    elif name_sim >= 0.5:
+        reasons.insert(0, "name~")
+    return round(name_weight * name_sim + rest, 3), reasons
+
+
+def _blocking_keys(row: tuple) -> list[tuple]:
+    name, phone, id_card, _gender = row
+    keys = []
+    if len(phone) >= 7:
+        keys.append(("p", phone))
+    if name:
+        keys.append(("n", name))
+    if len(id_card) >= _ID_PREFIX:
+        keys.append(("i", id_card[:_ID_PREFIX]))
+    return keys
+
+
+def _load_patients(batch_size: int) -> dict[int, tuple]:
+    """Stream patients in primary-key batches into {patient_id: (name, phone, id_card, gender)}, normalized."""
+    rows: dict[int, tuple] = {}
+    last_id = 0
+    cols = (Patient.patient_id, Patient.name, Patient.phone, Patient.id_card, Patient.gender)
+    while True:
+        batch = (
+            db.session.query(*cols)
+            .filter(Patient.patient_id > last_id)
+            .order_by(Patient.patient_id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return rows
+        for pid, name, phone, id_card, gender in batch:
+            rows[pid] = (normalize_name(name), normalize_phone(phone), (id_card or "").strip().upper(), gender)
+        last_id = batch[-1][0]
+
+
+def find_duplicate_patients(*, min_score: float = 0.8, max_block: int = 50, batch_size: int = 10000) -> dict:
+    """
+    Rebuild the 待审核 review list in patient_duplicate. Pairs already merged or dismissed are not proposed again.
+    Returns counters for the run.
+    """
+    patients = _load_patients(batch_size)
+
+    blocks: dict[tuple, list[int]] = {}
+    for pid, row in patients.items():
+        for key in _blocking_keys(row):
+            blocks.setdefault(key, []).append(pid)
+
+    candidates: set[tuple[int, int]] = set()
+    oversized = 0
+    for ids in blocks.values():
+        if len(ids) > max_block:
+            oversized += 1
+            continue
+        candidates.update(combinations(sorted(ids), 2))
+
+    reviewed = {
+        (a, b)
+        for a, b in db.session.query(PatientDuplicate.patient_id, PatientDuplicate.duplicate_id).filter(
+            PatientDuplicate.status != "待审核"
+        )
+    }
+    now = datetime.now()
+    found = []
+    for a, b in candidates:
+        if (a, b) in reviewed:
+            continue
+        score, reasons = score_pair(patients[a], patients[b], min_score)
+        if score >= min_score:
+            found.append(
+                {
+                    "patient_id": a,
+                    "duplicate_id": b,
+                    "score": score,
+                    "reasons": ",".join(reasons),
+                    "status": "待审核",
+                    "created_at": now,
+                }
+            )
+
+    db.session.execute(delete(PatientDuplicate).where(PatientDuplicate.status == "待审核"))
+    for i in range(0, len(found), 1000):
+        db.session.execute(insert(PatientDuplicate.__table__), found[i : i + 1000])
+    db.session.commit()
+    metrics.incr("dedup.pairs_found", len(found))
+    return {
+        "patients": len(patients),
+        "blocks": len(blocks),
+        "oversized_blocks": oversized,
+        "compared": len(candidates),
+        "pairs": len(found),
+    }
+
+
+def _components(pairs: list[tuple[int, int, int]]) -> dict[int, list[tuple[int, int, int]]]:
+    """Union-find over (pair_id, patient_id, duplicate_id); each group survives as its lowest (oldest) patient_id."""
+    parent: dict[int, int] = {}
+
+    def find(x: int) -> int:
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for _pair_id, a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    groups: dict[int, list[tuple[int, int, int]]] = {}
+    for pair in pairs:
+        groups.setdefault(find(pair[1]), []).append(pair)
+    return groups
+
+
+def merge_duplicate_pairs(pairs: list[PatientDuplicate], *, chunk_size: int = 500) -> dict:
+    """
+    Merge 待审核 pairs: visits, appointments, archived visits and the patient account link of each duplicate are
+    repointed to the surviving patient with bulk UPDATEs, missing gender/ID card are copied over, and the duplicate
+    rows are deleted. Groups where more than one patient has a login account are left for manual handling.
+    Commits every `chunk_size` merged patients.
+    """
+    groups = _components([(p.pair_id, p.patient_id, p.duplicate_id) for p in pairs if p.status == "待审核"])
+    linked = {pid for (pid,) in db.session.query(PatientUser.patient_id)}
+
+    merged = 0
+    skipped: list[int] = []
+    pending: list[tuple[int, list[tuple[int, int, int]]]] = []
+    pending_drops = 0
+    for root, group in groups.items():
+        ids = {pid for _pair_id, a, b in group for pid in (a, b)}
+        if len(ids & linked) > 1:
+            skipped.extend(pair_id for pair_id, _a, _b in group)
+            continue
+        pending.append((root, group))
+        pending_drops += len(ids) - 1
+        if pending_drops >= chunk_size:
+            merged += _merge_chunk(pending)
+            pending, pending_drops = [], 0
+    if pending:
+        merged += _merge_chunk(pending)
+    metrics.incr("dedup.merged", merged)
+    return {"merged": merged, "skipped_pairs": skipped}
+
+
+def _merge_chunk(groups: list[tuple[int, list[tuple[int, int, int]]]]) -> int:
+    mapping = {pid: root for root, group in groups for _pair_id, a, b in group for pid in (a, b) if pid != root}
+    drops = list(mapping)
+
+    cols = (Patient.patient_id, Patient.name, Patient.gender, Patient.id_card, Patient.phone)
+    patients = {
+        row[0]: dict(zip(("patient_id", "name", "gender", "id_card", "phone"), row))
+        for row in db.session.query(*cols).filter(Patient.patient_id.in_(drops + list(set(mapping.values()))))
+    }
+    fill: dict[int, dict] = {}
+    for pid in sorted(drops):
+        dup, root = patients.get(pid), patients.get(mapping[pid])
+        if dup is None or root is None:
+            continue
+        values = fill.setdefault(root["patient_id"], {})
+        for key in ("id_card", "gender"):
+            if dup[key] and not root[key] and key not in values:
+                values[key] = dup[key]
+
+    for model in _REFERENCING:
+        db.session.execute(
+            update(model)
+            .where(model.patient_id.in_(drops))
+            .values(patient_id=case(mapping, value=model.patient_id))
+            .execution_options(synchronize_session=False)
+        )
+    db.session.execute(delete(Patient).where(Patient.patient_id.in_(drops)).execution_options(synchronize_session=False))
+    for root_id, values in fill.items():
+        if values:
+            db.session.execute(update(Patient).where(Patient.patient_id == root_id).values(**values))
+
+    now = datetime.now()
+    db.session.execute(
+        update(PatientDuplicate),
+        [
+            {
+                "pair_id": pair_id,
+                "status": "已合并",
+                "reviewed_at": now,
+                "snapshot": json.dumps(patients[b], ensure_ascii=False) if b in patients else None,
+            }
+            for _root, group in groups
+            for pair_id, _a, b in group
+        ],
+    )
+    # Other proposals that involve a merged-away patient are stale; the next detection run recomputes them.
+    db.session.execute(
+        delete(PatientDuplicate)
+        .where(
+            PatientDuplicate.status == "待审核",
+            or_(PatientDuplicate.patient_id.in_(drops), PatientDuplicate.duplicate_id.in_(drops)),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return len(drops)
+
+
+def dismiss_duplicate_pairs(pair_ids: list[int]) -> int:
+    """Mark 待审核 pairs as 已忽略 (not the same person); later detection runs will not propose them again."""
+    result = db.session.execute(
+        update(PatientDuplicate)
+        .where(PatientDuplicate.pair_id.in_(pair_ids), PatientDuplicate.status == "待审核")
+        .values(status="已忽略", reviewed_at=datetime.now())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
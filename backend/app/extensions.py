@@ -2,7 +2,9 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from .tenancy import TenantSession
+
+db = SQLAlchemy(session_options={"class_": TenantSession})
 jwt = JWTManager()
 cors = CORS()
 
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+from flask import current_app
+from sqlalchemy import Float, Integer, and_, column, func, literal, or_, select, table, text
+from sqlalchemy.exc import OperationalError
+
+from .extensions import db
+from .models import MedicalRecord
+from .tenancy import PerTenant
+
+# Full-text index over medical_record's free-text columns:
+#   SQLite: FTS5 virtual table with the trigram tokenizer (substring matching works for Chinese), rowid = record_id,
+#           maintained by index_medical_record().
+#   MySQL:  FULLTEXT index WITH PARSER ngram on medical_record itself, maintained by InnoDB.
+# Only the SQLite FTS table holds a plain-text copy; everywhere else search reads the stored columns, so
+# MEDICAL_RECORD_COMPRESSION is not applied there (see searches_plain_copy()).
+TEXT_FIELDS = ("diagnosis", "treatment", "prescription", "note")
+FTS_TABLE = "medical_record_fts"
+MYSQL_INDEX = "ft_medical_record"
+
+# trigram cannot MATCH terms shorter than 3 characters; MySQL's ngram (ngram_token_size=2) needs 2.
+_MIN_TERM = {"sqlite": 3, "mysql": 2}
+
+
+def _dialect() -> str:
+    name = db.session.get_bind().dialect.name
+    return "mysql" if name == "mariadb" else name
+
+
+def _index_exists() -> bool:
+    dialect = _dialect()
+    if dialect == "sqlite":
+        sql = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+        name = FTS_TABLE
+    elif dialect == "mysql":
+        sql = (
+            "SELECT 1 FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = 'medical_record' AND index_name = :name"
+        )
+        name = MYSQL_INDEX
+    else:
+        return False
+    return db.session.execute(text(sql), {"name": name}).first() is not None
+
+
+class _FtsState:
+    """Per clinic database: whether the index exists (None until checked) and whether compression was refused."""
+
+    def __init__(self) -> None:
+        self.ready: bool | None = None
+        self.compression_refused = False
+
+
+def _state() -> _FtsState:
+    states = current_app.extensions.get("medical_record_fts")
+    if states is None:
+        states = current_app.extensions.setdefault("medical_record_fts", PerTenant(_FtsState))
+    return states.get()
+
+
+def _fts_ready() -> bool:
+    # Detected once per process and clinic; the index itself is created by ensure_fulltext_index()
+    # (init-db / seed / provision-tenant / CLI).
+    state = _state()
+    if state.ready is None:
+        state.ready = _index_exists()
+    return state.ready
+
+
+def searches_plain_copy() -> bool:
+    """Whether record search matches a separate plain-text index (so medical_record's columns may be compressed)."""
+    return _dialect() == "sqlite" and _fts_ready()
+
+
+def refuse_compression_once() -> bool:
+    """True the first time compression is refused for the current clinic, so the warning is logged once each."""
+    state = _state()
+    first, state.compression_refused = not state.compression_refused, True
+    return first
+
+
+def ensure_fulltext_index() -> bool:
+    """Create the full-text index if missing (tables must exist). Returns whether FTS is usable."""
+    dialect = _dialect()
+    ready = False
+    try:
+        if _index_exists():
+            ready = True
+        elif dialect == "sqlite":
+            db.session.execute(
+                text(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({', '.join(TEXT_FIELDS)}, tokenize='trigram')")
+            )
+            db.session.commit()
+            _state().ready = ready = True
+            rebuild_fulltext_index()
+        elif dialect == "mysql":
+            db.session.execute(
+                text(
+                    f"ALTER TABLE medical_record ADD FULLTEXT INDEX {MYSQL_INDEX} "
+                    f"({', '.join(TEXT_FIELDS)}) WITH PARSER ngram"
+                )
+            )
+            db.session.commit()
+            ready = True
+    except OperationalError:
+        # e.g. SQLite built without FTS5/trigram (< 3.34): search falls back to LIKE scans.
+        db.session.rollback()
+        current_app.logger.warning("Full-text index unavailable; medical record search will use LIKE", exc_info=True)
+    _state().ready = ready
+    return ready
+
+
+_FTS_INSERT = text(f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(TEXT_FIELDS)}) VALUES (:rid, :d, :t, :p, :n)")
+
+
+def _fts_row(rid: int, d, t, p, n) -> dict:
+    return {"rid": rid, "d": d, "t": t, "p": p, "n": n}
+
+
+def rebuild_fulltext_index(batch_size: int = 500) -> int:
+    """
+    SQLite: repopulate the FTS table from medical_record (after bulk loads/archiving). Returns rows indexed.
+    Goes through the ORM so compressed columns are indexed as plain text.
+    """
+    if _dialect() != "sqlite" or not _fts_ready():
+        return 0
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    cols = [MedicalRecord.record_id] + [getattr(MedicalRecord, f) for f in TEXT_FIELDS]
+    indexed = 0
+    last_id = 0
+    while True:
+        rows = (
+            db.session.query(*cols)
+            .filter(MedicalRecord.record_id > last_id)
+            .order_by(MedicalRecord.record_id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        db.session.execute(_FTS_INSERT, [_fts_row(*row) for row in rows])
+        indexed += len(rows)
+        last_id = rows[-1][0]
+    db.session.commit()
+    return indexed
+
+
+def index_medical_record(record: MedicalRecord) -> None:
+    """Sync one record into the SQLite FTS table inside the caller's transaction (record must be flushed)."""
+    if _dialect() != "sqlite" or not _fts_ready():
+        return
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rid"), {"rid": record.record_id})
+    db.session.execute(
+        _FTS_INSERT,
+        _fts_row(record.record_id, record.diagnosis, record.treatment, record.prescription, record.note),
+    )
+
+
+def _like_any(columns, term: str):
+    pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    return or_(*[c.like(pattern, escape="\\") for c in columns])
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def match_records(terms: list[str]):
+    """
+    Subquery (record_id, score) of medical records containing every term; higher score = more relevant.
+    Terms too short for the index are still matched with LIKE (within the indexed candidates when there are any).
+    """
+    dialect = _dialect()
+    min_len = _MIN_TERM.get(dialect, 3)
+    long_terms = [t for t in terms if len(t) >= min_len]
+    short_terms = [t for t in terms if len(t) < min_len]
+
+    if dialect == "sqlite" and _fts_ready():
+        fts = table(FTS_TABLE, column("rowid", Integer), *[column(f) for f in TEXT_FIELDS])
+        conds = [_like_any([fts.c[f] for f in TEXT_FIELDS], t) for t in short_terms]
+        if long_terms:
+            conds.append(text(f"{FTS_TABLE} MATCH :fts_query").bindparams(fts_query=" AND ".join(map(_quote, long_terms))))
+            # bm25() is lower-is-better; negate so every backend sorts by score DESC.
+            score = (-func.bm25(text(FTS_TABLE))).label("score")
+        else:
+            score = literal(0.0, Float).label("score")
+        return select(fts.c.rowid.label("record_id"), score).where(and_(*conds)).subquery("fts")
+
+    cols = [getattr(MedicalRecord, f) for f in TEXT_FIELDS]
+    if dialect == "mysql" and _fts_ready() and long_terms:
+        from sqlalchemy.dialects.mysql import match
+
+        against = " ".join('+"' + t.replace('"', " ") + '"' for t in long_terms)
+        score = match(*cols, against=against).in_boolean_mode()
+        conds = [score > 0] + [_like_any(cols, t) for t in short_terms]
+        return select(MedicalRecord.record_id, score.label("score")).where(and_(*conds)).subquery("fts")
+
+    conds = [_like_any(cols, t) for t in terms]
+    return select(MedicalRecord.record_id, literal(0.0, Float).label("score")).where(and_(*conds)).subquery("fts")
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import csv
+from itertools import islice
+from typing import IO, Iterable
+
+from sqlalchemy import insert, or_, update
+
+from .extensions import db
+from .models import Patient
+from .utils import metrics
+
+# Accepted CSV headers (English column names or the ones clinics usually export).
+HEADER_ALIASES = {
+    "name": "name",
+    "姓名": "name",
+    "phone": "phone",
+    "手机号": "phone",
+    "电话": "phone",
+    "gender": "gender",
+    "性别": "gender",
+    "id_card": "id_card",
+    "身份证号": "id_card",
+}
+REJECT_FIELDS = ("line", "error", "name", "phone", "gender", "id_card")
+
+
+class ImportAborted(ValueError):
+    """The file became unreadable at `line`; `committed` holds the stats of the chunks committed before that."""
+
+    def __init__(self, message: str, *, line: int, committed: dict) -> None:
+        super().__init__(message)
+        self.line = line
+        self.committed = committed
+
+
+def _read_error(exc: Exception, reader: csv.DictReader, committed: dict) -> ImportAborted:
+    # line_num counts the lines the reader got through; decoding runs ahead of it, so the bad bytes are at or after.
+    message = "CSV must be UTF-8 encoded" if isinstance(exc, UnicodeDecodeError) else f"Malformed CSV: {exc}"
+    return ImportAborted(message, line=reader.line_num + 1, committed=committed)
+
+
+def _clean(raw: dict) -> tuple[dict | None, str | None]:
+    name = (raw.get("name") or "").strip()
+    phone = (raw.get("phone") or "").strip()
+    gender = (raw.get("gender") or "").strip() or None
+    id_card = (raw.get("id_card") or "").strip().upper() or None
+    if not name or not phone:
+        return None, "name and phone are required"
+    if len(name) > 50:
+        return None, "name too long"
+    if len(phone) > 20:
+        return None, "phone too long"
+    if gender not in (None, "男", "女"):
+        return None, "invalid gender"
+    if id_card and (len(id_card) not in (15, 18) or not id_card[:-1].isdigit()):
+        return None, "invalid id_card"
+    return {"name": name, "phone": phone, "gender": gender, "id_card": id_card}, None
+
+
+def _existing(rows: list[dict]) -> tuple[dict[str, tuple], dict[tuple[str, str], tuple]]:
+    """One query per chunk: existing patients matching any id_card or phone in `rows`."""
+    id_cards = {r["id_card"] for r in rows if r["id_card"]}
+    phones = {r["phone"] for r in rows}
+    conds = [Patient.phone.in_(phones)]
+    if id_cards:
+        conds.append(Patient.id_card.in_(id_cards))
+    by_id_card: dict[str, tuple] = {}
+    by_phone_name: dict[tuple[str, str], tuple] = {}
+    found = (
+        db.session.query(Patient.patient_id, Patient.name, Patient.phone, Patient.id_card, Patient.gender)
+        .filter(or_(*conds))
+        .order_by(Patient.patient_id.asc())
+        .all()
+    )
+    for row in found:
+        pid, name, phone, id_card, gender = row
+        if id_card:
+            by_id_card[id_card] = (pid, id_card, gender)
+        # Highest patient_id wins, as in _get_or_create_patient().
+        by_phone_name[(phone, name)] = (pid, id_card, gender)
+    return by_id_card, by_phone_name
+
+
+def import_patients(
+    stream: Iterable[str] | IO[str],
+    *,
+    chunk_size: int = 1000,
+    commit_every: int = 10000,
+    reject_file: IO[str] | None = None,
+    max_rejects_kept: int = 100,
+) -> dict:
+    """
+    Stream a patient CSV (header: name, phone, gender, id_card) into `patient`.
+    Rows are validated and resolved chunk by chunk, the same way registration does it: a row matching an existing
+    patient by id_card, else by (phone, name), is not inserted (missing gender/id_card are filled in instead).
+    New rows are inserted with executemany and committed every `commit_every` rows. Invalid rows go to
+    `reject_file` (CSV) when given; the first `max_rejects_kept` are also returned.
+    A file that cannot be decoded or parsed raises ImportAborted after rolling back the current chunk; the chunks
+    committed before it stay, and their stats travel with the exception.
+    """
+    stats = {"rows": 0, "inserted": 0, "existing": 0, "updated": 0, "rejected": 0}
+    committed = dict(stats)
+    reader = csv.DictReader(stream)
+    try:
+        fieldnames = reader.fieldnames
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise _read_error(e, reader, committed) from e
+    if fieldnames is None:
+        return {**stats, "rejects": []}
+    reader.fieldnames = [HEADER_ALIASES.get(f.strip().lstrip("\ufeff"), f.strip()) for f in fieldnames]
+    if not {"name", "phone"} <= set(reader.fieldnames):
+        raise ValueError("CSV header must contain name and phone")
+
+    writer = None
+    if reject_file is not None:
+        writer = csv.DictWriter(reject_file, fieldnames=REJECT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+
+    rejects: list[dict] = []
+    # Keys already taken by earlier rows of this file (duplicates inside the CSV resolve to the first one).
+    seen_id_cards: set[str] = set()
+    seen_phone_names: set[tuple[str, str]] = set()
+    uncommitted = 0
+    line = 1  # header
+    rows_iter = iter(reader)
+    while True:
+        try:
+            chunk = list(islice(rows_iter, chunk_size))
+        except (UnicodeDecodeError, csv.Error) as e:
+            db.session.rollback()
+            raise _read_error(e, reader, committed) from e
+        if not chunk:
+            break
+        valid = []
+        for raw in chunk:
+            line += 1
+            row, error = _clean(raw)
+            if error:
+                stats["rejected"] += 1
+                reject = {"line": line, "error": error, **{k: raw.get(k) for k in REJECT_FIELDS[2:]}}
+                if writer is not None:
+                    writer.writerow(reject)
+                if len(rejects) < max_rejects_kept:
+                    rejects.append(reject)
+                continue
+            valid.append(row)
+        stats["rows"] += len(chunk)
+        if not valid:
+            continue
+
+        by_id_card, by_phone_name = _existing(valid)
+        new_rows = []
+        fills: dict[int, dict] = {}
+        for row in valid:
+            key = (row["phone"], row["name"])
+            match = by_id_card.get(row["id_card"]) if row["id_card"] else None
+            if match is None:
+                match = by_phone_name.get(key)
+            if match is not None:
+                stats["existing"] += 1
+                pid, id_card, gender = match
+                fill = fills.setdefault(pid, {})
+                if row["id_card"] and not id_card and row["id_card"] not in seen_id_cards:
+                    fill.setdefault("id_card", row["id_card"])
+                    seen_id_cards.add(row["id_card"])
+                if row["gender"] and not gender:
+                    fill.setdefault("gender", row["gender"])
+                continue
+            if (row["id_card"] and row["id_card"] in seen_id_cards) or key in seen_phone_names:
+                stats["existing"] += 1
+                continue
+            if row["id_card"]:
+                seen_id_cards.add(row["id_card"])
+            seen_phone_names.add(key)
+            new_rows.append(row)
+
+        if new_rows:
+            db.session.execute(insert(Patient.__table__), new_rows)
+            stats["inserted"] += len(new_rows)
+        updates = [{"patient_id": pid, **values} for pid, values in fills.items() if values]
+        if updates:
+            db.session.execute(update(Patient), updates)
+            stats["updated"] += len(updates)
+        uncommitted += len(new_rows) + len(updates)
+        if uncommitted >= commit_every:
+            db.session.commit()
+            committed = dict(stats)
+            uncommitted = 0
+    db.session.commit()
+    metrics.incr("patient_import.inserted", stats["inserted"])
+    metrics.incr("patient_import.rejected", stats["rejected"])
+    return {**stats, "rejects": rejects}
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import Flask, current_app
+
+from .extensions import db
+from .models import ReportJob
+from .reports import REPORT_KINDS
+from .tenancy import current_tenant, use_tenant
+from .utils.errors import APIError
+
+
+def _executor(app: Flask) -> ThreadPoolExecutor:
+    # Created lazily so that a forking server never inherits a pool with live threads.
+    executor = app.extensions.get("report_jobs")
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=app.config.get("REPORT_JOB_WORKERS", 2),
+            thread_name_prefix="report-job",
+        )
+        app.extensions["report_jobs"] = executor
+    return executor
+
+
+def params_key(kind: str, params: dict) -> str:
+    raw = json.dumps({"kind": kind, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _find_reusable(kind: str, key: str) -> ReportJob | None:
+    now = datetime.utcnow()
+    cache_cutoff = now - timedelta(seconds=current_app.config.get("REPORT_CACHE_SECONDS", 300))
+    stale_cutoff = now - timedelta(seconds=current_app.config.get("REPORT_JOB_TIMEOUT", 600))
+
+    candidates = (
+        ReportJob.query.filter_by(kind=kind, params_key=key)
+        .filter(ReportJob.status != "failed")
+        .order_by(ReportJob.created_at.desc())
+        .limit(5)
+        .all()
+    )
+    for job in candidates:
+        if job.status == "done" and job.finished_at and job.finished_at >= cache_cutoff:
+            return job
+        # Same report already queued/running: share it instead of computing twice.
+        if job.status in ("queued", "running") and job.created_at >= stale_cutoff:
+            return job
+    return None
+
+
+def submit_report_job(kind: str, raw_params, *, user_id: int | None = None) -> tuple[ReportJob, bool]:
+    """
+    Queue a report for background computation.
+    Returns (job, reused); reused=True when a cached or in-flight job with the same normalized params exists.
+    """
+    entry = REPORT_KINDS.get(kind)
+    if entry is None:
+        raise APIError("Invalid report kind", code="validation_error", status=400)
+    normalize, _compute = entry
+    return submit_normalized(kind, normalize(raw_params), user_id=user_id)
+
+
+def submit_normalized(kind: str, params: dict, *, user_id: int | None = None) -> tuple[ReportJob, bool]:
+    """submit_report_job() for params already passed through the kind's normalizer."""
+    key = params_key(kind, params)
+
+    job = _find_reusable(kind, key)
+    if job is not None:
+        return job, True
+
+    job = ReportJob(
+        job_id=uuid.uuid4().hex,
+        kind=kind,
+        params=json.dumps(params, ensure_ascii=False),
+        params_key=key,
+        status="queued",
+        created_by=user_id,
+        # Set here rather than by the server default: expiry compares it with utcnow(), so both use one clock.
+        created_at=datetime.utcnow(),
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    _executor(app).submit(_run_job, app, job.job_id, current_tenant())
+    return job, False
+
+
+def _run_job(app: Flask, job_id: str, tenant: str | None = None) -> None:
+    with use_tenant(tenant), app.app_context():
+        job = ReportJob.query.get(job_id)
+        if job is None:
+            return
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+
+        _normalize, compute = REPORT_KINDS[job.kind]
+        try:
+            result = compute(json.loads(job.params))
+        except Exception as e:
+            db.session.rollback()
+            app.logger.exception("Report job %s failed", job_id)
+            job = ReportJob.query.get(job_id)
+            job.status = "failed"
+            job.error = str(e)[:255]
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            return
+
+        job.result = json.dumps(result, ensure_ascii=False)
+        job.status = "done"
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
@@ -1,27 +1,48 @@
 from .appointment import Appointment
+from .archive import BillArchive, IncomeRecordArchive, MedicalRecordArchive, VisitArchive
+from .audit_log import AuditLog
 from .bill import Bill
 from .department import Department
 from .employee import Employee
 from .income_record import IncomeRecord
 from .medical_record import MedicalRecord
 from .patient import Patient
+from .patient_duplicate import PatientDuplicate
 from .patient_user import PatientUser
+from .refdata_version import RefdataVersion
+from .report_job import ReportJob
+from .revoked_token import RevokedToken
 from .room import Room
 from .schedule import Schedule
+from .schedule_counter_shard import ScheduleCounterShard
+from .slow_query import SlowQuery
 from .sys_user import SysUser
+from .tenant import Tenant
 from .visit import Visit
 
 __all__ = [
     "Appointment",
+    "AuditLog",
     "Bill",
+    "BillArchive",
     "Department",
     "Employee",
     "IncomeRecord",
+    "IncomeRecordArchive",
     "MedicalRecord",
+    "MedicalRecordArchive",
     "Patient",
+    "PatientDuplicate",
     "PatientUser",
+    "RefdataVersion",
+    "ReportJob",
+    "RevokedToken",
     "Room",
     "Schedule",
+    "ScheduleCounterShard",
+    "SlowQuery",
     "SysUser",
+    "Tenant",
     "Visit",
+    "VisitArchive",
 ]
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+from .. import refdata
 from ..extensions import db
 
 
 class Appointment(db.Model):
     __tablename__ = "appointment"
+    # 过期清理按 (status, expected_time) 扫描，只触达仍处于打开状态的预约。
+    __table_args__ = (db.Index("idx_appt_status_expected_time", "status", "expected_time"),)
 
     appt_id = db.Column(db.Integer, primary_key=True)
     patient_name = db.Column(db.String(50), nullable=False)
@@ -19,7 +22,7 @@ class Appointment(db.Model):
     patient_id = db.Column(db.Integer, db.ForeignKey("patient.patient_id"))
     created_at = db.Column(db.DateTime, server_default=db.func.current_timestamp(), nullable=False)
 
-    department = db.relationship("Department", lazy="joined")
+    department = db.relationship("Department", lazy="select")
     patient = db.relationship("Patient", lazy="joined")
 
     def to_dict(self):
@@ -28,7 +31,7 @@ class Appointment(db.Model):
             "patient_name": self.patient_name,
             "phone": self.phone,
             "dept_id": self.dept_id,
-            "dept_name": self.department.dept_name if self.department else None,
+            "dept_name": refdata.dept_name(self.dept_id),
             "expected_time": self.expected_time.isoformat(sep=" ", timespec="seconds"),
             "status": self.status,
             "patient_id": self.patient_id,
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from ..extensions import db
+from .types import CompressedText
+
+# 冷数据归档表：列与对应热表保持一致（外加 archived_at），便于 INSERT ... SELECT 与 UNION ALL 查询。
+# 不建外键：归档行只读，且热表的行在归档后已被删除。
+
+
+class VisitArchive(db.Model):
+    __tablename__ = "visit_archive"
+
+    visit_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    patient_id = db.Column(db.Integer, nullable=False, index=True)
+    room_id = db.Column(db.Integer, nullable=False)
+    doctor_id = db.Column(db.String(20))
+    appt_id = db.Column(db.Integer)
+    status = db.Column(
+        db.Enum("候诊中", "就诊中", "待缴费", "已离院", validate_strings=True),
+        nullable=False,
+    )
+    check_in_time = db.Column(db.DateTime, nullable=False, index=True)
+    checkout_time = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, server_default=db.func.current_timestamp(), nullable=False)
+
+
+class BillArchive(db.Model):
+    __tablename__ = "bill_archive"
+
+    bill_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    visit_id = db.Column(db.Integer, nullable=False, unique=True)
+    total_amount = db.Column(db.Numeric(10, 2), nullable=False)
+    insurance_amount = db.Column(db.Numeric(10, 2), nullable=False)
+    self_pay_amount = db.Column(db.Numeric(10, 2), nullable=False)
+    pay_status = db.Column(db.Enum("未支付", "已支付", validate_strings=True), nullable=False)
+    pay_time = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+    archived_at = db.Column(db.DateTime, server_default=db.func.current_timestamp(), nullable=False)
+
+
+class IncomeRecordArchive(db.Model):
+    __tablename__ = "income_record_archive"
+
+    record_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    bill_id = db.Column(db.Integer, nullable=False)
+    dept_id = db.Column(db.Integer, nullable=False)
+    doctor_id = db.Column(db.String(20))
+    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    record_date = db.Column(db.Date, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, server_default=db.func.current_timestamp(), nullable=False)
+
+
+class MedicalRecordArchive(db.Model):
+    __tablename__ = "medical_record_archive"
+
+    record_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    visit_id = db.Column(db.Integer, nullable=False, unique=True)
+    diagnosis = db.Column(db.Text)
+    treatment = db.Column(CompressedText)
+    prescription = db.Column(CompressedText)
+    note = db.Column(CompressedText)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, server_default=db.func.current_timestamp(), nullable=False)
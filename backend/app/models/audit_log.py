@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import json
+
+from ..extensions import db
+
+
+class AuditLog(db.Model):
+    __tablename__ = "audit_log"
+    __table_args__ = (
+        db.Index("idx_audit_entity", "entity", "entity_id", "occurred_at"),
+        db.Index("idx_audit_user_time", "user_id", "occurred_at"),
+        db.Index("idx_audit_action_time", "action", "occurred_at"),
+    )
+
+    log_id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    occurred_at = db.Column(db.DateTime, nullable=False, index=True)
+    # 不建外键：审计记录需在账号删除后保留
+    user_id = db.Column(db.Integer)
+    role = db.Column(db.String(20))
+    action = db.Column(db.Enum("create", "update", "delete", validate_strings=True), nullable=False)
+    entity = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.String(64))
+    changes = db.Column(db.Text)
+    request_path = db.Column(db.String(255))
+
+    def to_dict(self):
+        return {
+            "log_id": self.log_id,
+            "occurred_at": self.occurred_at.isoformat(sep=" ", timespec="seconds"),
+            "user_id": self.user_id,
+            "role": self.role,
+            "action": self.action,
+            "entity": self.entity,
+            "entity_id": self.entity_id,
+            "changes": json.loads(self.changes) if self.changes else None,
+            "request_path": self.request_path,
+        }
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from .. import refdata
 from ..extensions import db
 
 
@@ -20,7 +21,7 @@ class Employee(db.Model):
     )
     created_at = db.Column(db.DateTime, server_default=db.func.current_timestamp(), nullable=False)
 
-    department = db.relationship("Department", lazy="joined")
+    department = db.relationship("Department", lazy="select")
 
     def to_dict(self):
         return {
@@ -31,6 +32,6 @@ class Employee(db.Model):
             "position": self.position,
             "title": self.title,
             "dept_id": self.dept_id,
-            "dept_name": self.department.dept_name if self.department else None,
+            "dept_name": refdata.dept_name(self.dept_id),
             "status": self.status,
         }
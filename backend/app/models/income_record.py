@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from .. import refdata
 from ..extensions import db
 
 
@@ -14,17 +15,17 @@ class IncomeRecord(db.Model):
     record_date = db.Column(db.Date, nullable=False)
     created_at = db.Column(db.DateTime, server_default=db.func.current_timestamp(), nullable=False)
 
-    department = db.relationship("Department", lazy="joined")
-    doctor = db.relationship("Employee", lazy="joined")
+    department = db.relationship("Department", lazy="select")
+    doctor = db.relationship("Employee", lazy="select")
 
     def to_dict(self):
         return {
             "record_id": self.record_id,
             "bill_id": self.bill_id,
             "dept_id": self.dept_id,
-            "dept_name": self.department.dept_name if self.department else None,
+            "dept_name": refdata.dept_name(self.dept_id),
             "doctor_id": self.doctor_id,
-            "doctor_name": self.doctor.name if self.doctor else None,
+            "doctor_name": refdata.employee_name(self.doctor_id),
             "amount": float(self.amount),
             "record_date": self.record_date.isoformat(),
         }
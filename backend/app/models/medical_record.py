@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+from sqlalchemy.orm import deferred
+
 from ..extensions import db
+from .types import CompressedText
 
 
 class MedicalRecord(db.Model):
@@ -9,10 +12,13 @@ class MedicalRecord(db.Model):
     record_id = db.Column(db.Integer, primary_key=True)
     visit_id = db.Column(db.Integer, db.ForeignKey("visit.visit_id"), nullable=False, unique=True)
 
-    diagnosis = db.Column(db.Text)
-    treatment = db.Column(db.Text)
-    prescription = db.Column(db.Text)
-    note = db.Column(db.Text)
+    # Clinical text is deferred: joins and existence checks only load ids/timestamps. Queries that need the
+    # text use undefer_group("text"); active_history keeps the old value available for the audit log.
+    # diagnosis stays uncompressed: it is the column most searched and shown in lists.
+    diagnosis = deferred(db.Column(db.Text), group="text", active_history=True)
+    treatment = deferred(db.Column(CompressedText), group="text", active_history=True)
+    prescription = deferred(db.Column(CompressedText), group="text", active_history=True)
+    note = deferred(db.Column(CompressedText), group="text", active_history=True)
 
     created_at = db.Column(db.DateTime, server_default=db.func.current_timestamp(), nullable=False)
     updated_at = db.Column(
@@ -22,7 +28,7 @@ class MedicalRecord(db.Model):
         onupdate=db.func.current_timestamp(),
     )
 
-    visit = db.relationship("Visit", lazy="joined")
+    visit = db.relationship("Visit", lazy="select")
 
     def to_dict(self):
         return {
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import json
+
+from ..extensions import db
+
+
+class PatientDuplicate(db.Model):
+    """Candidate duplicate pair found by `flask find-duplicate-patients`; `duplicate_id` merges into `patient_id`."""
+
+    __tablename__ = "patient_duplicate"
+    __table_args__ = (
+        db.UniqueConstraint("patient_id", "duplicate_id", name="uniq_patient_duplicate_pair"),
+        db.Index("idx_patient_duplicate_status_score", "status", "score"),
+    )
+
+    pair_id = db.Column(db.Integer, primary_key=True)
+    # 不建外键：合并后被删除的患者仍保留在已合并记录中
+    patient_id = db.Column(db.Integer, nullable=False)
+    duplicate_id = db.Column(db.Integer, nullable=False, index=True)
+    score = db.Column(db.Numeric(4, 3), nullable=False)
+    reasons = db.Column(db.String(100), nullable=False)
+    status = db.Column(
+        db.Enum("待审核", "已合并", "已忽略", validate_strings=True),
+        nullable=False,
+        server_default="待审核",
+    )
+    # 合并时保存被删除患者的资料
+    snapshot = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, server_default=db.func.current_timestamp(), nullable=False)
+    reviewed_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            "pair_id": self.pair_id,
+            "patient_id": self.patient_id,
+            "duplicate_id": self.duplicate_id,
+            "score": float(self.score),
+            "reasons": self.reasons.split(",") if self.reasons else [],
+            "status": self.status,
+            "snapshot": json.loads(self.snapshot) if self.snapshot else None,
+            "created_at": self.created_at.isoformat(sep=" ", timespec="seconds") if self.created_at else None,
+            "reviewed_at": self.reviewed_at.isoformat(sep=" ", timespec="seconds") if self.reviewed_at else None,
+        }
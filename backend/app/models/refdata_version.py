@@ -0,0 +1,12 @@
+from __future__ import annotations
+
+from ..extensions import db
+
+
+class RefdataVersion(db.Model):
+    """Change counter for cached reference data (departments, rooms, employees); see app/refdata.py."""
+
+    __tablename__ = "refdata_version"
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, server_default="0")
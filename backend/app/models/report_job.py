@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import json
+
+from ..extensions import db
+
+
+class ReportJob(db.Model):
+    __tablename__ = "report_job"
+    __table_args__ = (db.Index("idx_report_job_kind_key", "kind", "params_key"),)
+
+    job_id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)
+    params = db.Column(db.Text, nullable=False)
+    params_key = db.Column(db.String(64), nullable=False)
+    status = db.Column(
+        db.Enum("queued", "running", "done", "failed", validate_strings=True),
+        nullable=False,
+        server_default="queued",
+    )
+    result = db.Column(db.Text)
+    error = db.Column(db.String(255))
+    created_by = db.Column(db.Integer, db.ForeignKey("sys_user.user_id"))
+    created_at = db.Column(db.DateTime, server_default=db.func.current_timestamp(), nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "params": json.loads(self.params),
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(sep=" ", timespec="seconds") if self.created_at else None,
+            "started_at": self.started_at.isoformat(sep=" ", timespec="seconds") if self.started_at else None,
+            "finished_at": self.finished_at.isoformat(sep=" ", timespec="seconds") if self.finished_at else None,
+        }
@@ -0,0 +1,12 @@
+from __future__ import annotations
+
+from ..extensions import db
+
+
+class RevokedToken(db.Model):
+    __tablename__ = "revoked_token"
+
+    jti = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("sys_user.user_id", ondelete="CASCADE"))
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, nullable=False, index=True)
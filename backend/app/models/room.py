@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from .. import refdata
 from ..extensions import db
 
 
@@ -11,13 +12,13 @@ class Room(db.Model):
     dept_id = db.Column(db.Integer, db.ForeignKey("department.dept_id"), nullable=False)
     status = db.Column(db.Enum("启用", "停用", validate_strings=True), nullable=False, server_default="启用")
 
-    department = db.relationship("Department", lazy="joined")
+    department = db.relationship("Department", lazy="select")
 
     def to_dict(self):
         return {
             "room_id": self.room_id,
             "room_number": self.room_number,
             "dept_id": self.dept_id,
-            "dept_name": self.department.dept_name if self.department else None,
+            "dept_name": refdata.dept_name(self.dept_id),
             "status": self.status,
         }
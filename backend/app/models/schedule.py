@@ -1,6 +1,17 @@
 from __future__ import annotations
 
+from flask import current_app, has_app_context
+from sqlalchemy import func, select
+from sqlalchemy.ext.hybrid import hybrid_property
+
+from .. import refdata
 from ..extensions import db
+from .schedule_counter_shard import ScheduleCounterShard
+
+
+def sharding_enabled() -> bool:
+    # Outside an app context (scripts, shell) shards are assumed to be in use.
+    return not has_app_context() or int(current_app.config.get("SCHEDULE_COUNTER_SHARDS", 0) or 0) > 1
 
 
 class Schedule(db.Model):
@@ -14,21 +25,43 @@ class Schedule(db.Model):
     time_slot = db.Column(db.Enum("上午", "下午", "全天", validate_strings=True), nullable=False)
     max_patients = db.Column(db.Integer, nullable=False, server_default="30")
     current_patients = db.Column(db.Integer, nullable=False, server_default="0")
+    # Reservations still held in counter shards (0 unless SCHEDULE_COUNTER_SHARDS is enabled). Deferred: the
+    # correlated SUM is only worth running when sharding is on (booked_patients, undefer()).
+    sharded_patients = db.column_property(
+        select(func.coalesce(func.sum(ScheduleCounterShard.used), 0))
+        .where(ScheduleCounterShard.schedule_id == schedule_id)
+        .correlate_except(ScheduleCounterShard)
+        .scalar_subquery(),
+        deferred=True,
+    )
+
+    room = db.relationship("Room", lazy="select")
+    doctor = db.relationship("Employee", lazy="select")
+
+    @hybrid_property
+    def booked_patients(self):
+        if "sharded_patients" not in self.__dict__ and not sharding_enabled():
+            return self.current_patients
+        return self.current_patients + (self.sharded_patients or 0)
 
-    room = db.relationship("Room", lazy="joined")
-    doctor = db.relationship("Employee", lazy="joined")
+    @booked_patients.expression
+    def booked_patients(cls):
+        if not sharding_enabled():
+            return cls.current_patients
+        return cls.current_patients + cls.sharded_patients
 
     def to_dict(self):
+        room = refdata.room(self.room_id)
         return {
             "schedule_id": self.schedule_id,
             "room_id": self.room_id,
-            "room_number": self.room.room_number if self.room else None,
-            "dept_id": self.room.dept_id if self.room else None,
-            "dept_name": self.room.department.dept_name if self.room and self.room.department else None,
+            "room_number": room["room_number"] if room else None,
+            "dept_id": room["dept_id"] if room else None,
+            "dept_name": room["dept_name"] if room else None,
             "doctor_id": self.doctor_id,
-            "doctor_name": self.doctor.name if self.doctor else None,
+            "doctor_name": refdata.employee_name(self.doctor_id),
             "work_date": self.work_date.isoformat(),
             "time_slot": self.time_slot,
             "max_patients": self.max_patients,
-            "current_patients": self.current_patients,
+            "current_patients": self.booked_patients,
         }
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from ..extensions import db
+
+
+class ScheduleCounterShard(db.Model):
+    """
+    Optional sub-counters for a hot schedule (SCHEDULE_COUNTER_SHARDS > 0).
+    The schedule's remaining capacity is split across the shards; a reservation increments any shard that
+    still has room, so concurrent check-ins lock different rows instead of all queuing on schedule.
+    Booked total = schedule.current_patients + sum(used); `flask compact-schedule-shards` folds them back.
+    """
+
+    __tablename__ = "schedule_counter_shard"
+
+    schedule_id = db.Column(
+        db.Integer,
+        db.ForeignKey("schedule.schedule_id", ondelete="CASCADE"),
+        primary_key=True,
+        autoincrement=False,
+    )
+    shard_no = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    capacity = db.Column(db.Integer, nullable=False)
+    used = db.Column(db.Integer, nullable=False, server_default="0")
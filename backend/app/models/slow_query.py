@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from ..extensions import db
+
+
+class SlowQuery(db.Model):
+    """A statement shape (per endpoint) that took longer than SLOW_QUERY_MS; see app/slowlog.py."""
+
+    __tablename__ = "slow_query"
+    __table_args__ = (
+        db.UniqueConstraint("fingerprint", "endpoint", name="uniq_slow_query_shape"),
+        db.Index("idx_slow_query_last_seen", "last_seen"),
+    )
+
+    query_id = db.Column(db.Integer, primary_key=True)
+    # sha1 of the normalized statement
+    fingerprint = db.Column(db.String(40), nullable=False)
+    endpoint = db.Column(db.String(100), nullable=False)
+    statement = db.Column(db.Text, nullable=False)
+    param_shape = db.Column(db.String(255))
+    calls = db.Column(db.Integer, nullable=False, server_default="0")
+    total_ms = db.Column(db.Float, nullable=False, server_default="0")
+    max_ms = db.Column(db.Float, nullable=False, server_default="0")
+    last_ms = db.Column(db.Float, nullable=False, server_default="0")
+    # EXPLAIN output, captured once per fingerprint
+    plan = db.Column(db.Text)
+    first_seen = db.Column(db.DateTime, nullable=False)
+    last_seen = db.Column(db.DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            "query_id": self.query_id,
+            "fingerprint": self.fingerprint,
+            "endpoint": self.endpoint,
+            "statement": self.statement,
+            "param_shape": self.param_shape,
+            "calls": self.calls,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else None,
+            "max_ms": round(self.max_ms, 3),
+            "last_ms": round(self.last_ms, 3),
+            "plan": self.plan.split("\n") if self.plan else None,
+            "first_seen": self.first_seen.isoformat(sep=" ", timespec="seconds") if self.first_seen else None,
+            "last_seen": self.last_seen.isoformat(sep=" ", timespec="seconds") if self.last_seen else None,
+        }
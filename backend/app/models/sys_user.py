@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from werkzeug.security import check_password_hash, generate_password_hash
 
+from .. import refdata
 from ..extensions import db
 
 
@@ -17,7 +18,7 @@ class SysUser(db.Model):
     last_login = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, server_default=db.func.current_timestamp(), nullable=False)
 
-    employee = db.relationship("Employee", lazy="joined")
+    employee = db.relationship("Employee", lazy="select")
     patient_link = db.relationship("PatientUser", back_populates="user", uselist=False, lazy="joined")
 
     def set_password(self, password: str) -> None:
@@ -33,7 +34,7 @@ class SysUser(db.Model):
             "role": self.role,
             "status": self.status,
             "emp_id": self.emp_id,
-            "employee": self.employee.to_dict() if self.employee else None,
+            "employee": refdata.employee(self.emp_id),
             "patient_id": self.patient_link.patient_id if self.patient_link else None,
             "patient": self.patient_link.patient.to_dict() if self.patient_link and self.patient_link.patient else None,
         }
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from ..extensions import db
+
+
+class Tenant(db.Model):
+    """A clinic served by this deployment; kept in the default database (see app/tenancy.py)."""
+
+    __tablename__ = "tenant"
+
+    code = db.Column(db.String(32), primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    # NULL: TENANT_DATABASE_URL_TEMPLATE with {tenant} replaced by the code
+    database_url = db.Column(db.String(255))
+    status = db.Column(db.Enum("active", "disabled", validate_strings=True), nullable=False, server_default="active")
+    created_at = db.Column(db.DateTime, server_default=db.func.current_timestamp(), nullable=False)
+
+    def to_dict(self):
+        return {
+            "code": self.code,
+            "name": self.name,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(sep=" ", timespec="seconds") if self.created_at else None,
+        }
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import base64
+import zlib
+
+from flask import current_app, has_app_context
+from sqlalchemy.types import Text, TypeDecorator
+
+try:  # optional: better ratio and faster than zlib
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# Compressed values are stored as "<marker>" + base64 so the column stays TEXT (no migration, readable dumps).
+# Values without a marker are plain text, so compression can be switched on or off at any time.
+_ZLIB_MARKER = "\x01z:"
+_ZSTD_MARKER = "\x01s:"
+
+
+def _codec() -> str:
+    if not has_app_context():
+        return "none"
+    codec = (current_app.config.get("MEDICAL_RECORD_COMPRESSION") or "none").lower()
+    if codec == "none":
+        return codec
+    from ..fulltext import refuse_compression_once, searches_plain_copy
+
+    # Record search matches the stored column itself (MySQL FULLTEXT, LIKE fallback) unless a separate plain-text
+    # index exists; compressed values would silently drop out of it, so they are only written when one does.
+    if not searches_plain_copy():
+        if refuse_compression_once():
+            current_app.logger.warning(
+                "MEDICAL_RECORD_COMPRESSION=%s ignored: record search reads medical_record directly", codec
+            )
+        return "none"
+    if codec == "zstd" and zstandard is None:
+        return "zlib"
+    return codec
+
+
+class CompressedText(TypeDecorator):
+    """
+    TEXT column that transparently compresses long values (MEDICAL_RECORD_COMPRESSION = none | zlib | zstd).
+    Only values of at least `min_length` characters that actually shrink are compressed.
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def __init__(self, *args, min_length: int = 256, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.min_length = min_length
+
+    def process_bind_param(self, value, dialect):
+        if value is None or len(value) < self.min_length:
+            return value
+        codec = _codec()
+        if codec == "none":
+            return value
+        raw = value.encode("utf-8")
+        if codec == "zstd":
+            marker, packed = _ZSTD_MARKER, zstandard.ZstdCompressor(level=6).compress(raw)
+        else:
+            marker, packed = _ZLIB_MARKER, zlib.compress(raw, 6)
+        encoded = marker + base64.b64encode(packed).decode("ascii")
+        return encoded if len(encoded.encode("utf-8")) < len(raw) else value
+
+    def process_result_value(self, value, dialect):
+        if value is None or not value.startswith("\x01"):
+            return value
+        if value.startswith(_ZLIB_MARKER):
+            return zlib.decompress(base64.b64decode(value[len(_ZLIB_MARKER):])).decode("utf-8")
+        if value.startswith(_ZSTD_MARKER):
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read zstd-compressed medical records")
+            packed = base64.b64decode(value[len(_ZSTD_MARKER):])
+            return zstandard.ZstdDecompressor().decompress(packed).decode("utf-8")
+        return value
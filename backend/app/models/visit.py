@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+from .. import refdata
 from ..extensions import db
+from ..utils.fields import FieldTree, select_fields
 
 
 class Visit(db.Model):
     __tablename__ = "visit"
+    # to_dict(fields) only touches requested columns, so list queries may narrow them with load_only.
+    __sparse_columns__ = True
+    # room/doctor are serialized from the reference-data cache by these columns (no JOIN).
+    __refdata_fields__ = {"room": "room_id", "doctor": "doctor_id"}
 
     visit_id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey("patient.patient_id"), nullable=False)
@@ -20,22 +26,25 @@ class Visit(db.Model):
     checkout_time = db.Column(db.DateTime)
 
     patient = db.relationship("Patient", lazy="joined")
-    room = db.relationship("Room", lazy="joined")
-    doctor = db.relationship("Employee", lazy="joined")
+    room = db.relationship("Room", lazy="select")
+    doctor = db.relationship("Employee", lazy="select")
     appointment = db.relationship("Appointment", lazy="joined")
 
-    def to_dict(self):
-        return {
-            "visit_id": self.visit_id,
-            "patient": self.patient.to_dict() if self.patient else None,
-            "room": self.room.to_dict() if self.room else None,
-            "doctor": self.doctor.to_dict() if self.doctor else None,
-            "appt_id": self.appt_id,
-            "status": self.status,
-            "check_in_time": self.check_in_time.isoformat(sep=" ", timespec="seconds")
-            if self.check_in_time
-            else None,
-            "checkout_time": self.checkout_time.isoformat(sep=" ", timespec="seconds")
-            if self.checkout_time
-            else None,
-        }
+    def to_dict(self, fields: FieldTree | None = None):
+        return select_fields(
+            fields,
+            {
+                "visit_id": lambda: self.visit_id,
+                "patient": lambda: self.patient.to_dict() if self.patient else None,
+                "room": lambda: refdata.room(self.room_id),
+                "doctor": lambda: refdata.employee(self.doctor_id),
+                "appt_id": lambda: self.appt_id,
+                "status": lambda: self.status,
+                "check_in_time": lambda: self.check_in_time.isoformat(sep=" ", timespec="seconds")
+                if self.check_in_time
+                else None,
+                "checkout_time": lambda: self.checkout_time.isoformat(sep=" ", timespec="seconds")
+                if self.checkout_time
+                else None,
+            },
+        )
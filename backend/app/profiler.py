@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+
+from flask import Flask, current_app, g, request
+
+from .utils import metrics
+
+# Statistical request profiler. A sampled request registers its thread; one shared sampler thread reads the stacks
+# of the registered threads (sys._current_frames) every `interval` seconds and counts them, so an unsampled request
+# costs one random() call and a sampled one is never slowed down by tracing hooks.
+# Endpoints listed in memory_endpoints additionally run under tracemalloc while sampled (noticeably slower, and it
+# traces every thread for that time); the allocations still alive at the end of the request are kept as stacks.
+# Finished profiles keep only their top-N stacks and live in a bounded ring buffer.
+_MAX_DEPTH = 64
+_MEMORY_FRAMES = 25
+
+
+def _frame_name(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+def _fold(frame) -> str:
+    """Root-first `module:function` frames joined with ';' (collapsed-stack format)."""
+    names = []
+    while frame is not None and len(names) < _MAX_DEPTH:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _fold_traceback(traceback: tracemalloc.Traceback) -> str:
+    # tracemalloc only keeps file names and line numbers; frames are already oldest first.
+    return ";".join(f"{f.filename.rsplit('/', 1)[-1]}:{f.lineno}" for f in traceback)
+
+
+def collapsed(stacks: dict[str, int]) -> str:
+    """Input for flamegraph.pl / speedscope / inferno: one `frame;frame;frame weight` line per stack."""
+    return "".join(f"{stack} {weight}\n" for stack, weight in sorted(stacks.items(), key=lambda kv: -kv[1]))
+
+
+class _Active:
+    __slots__ = ("thread_id", "stacks", "samples")
+
+    def __init__(self, thread_id: int) -> None:
+        self.thread_id = thread_id
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+
+
+class Profiler:
+    def __init__(
+        self,
+        *,
+        enabled: bool = False,
+        sample_rate: float = 0.01,
+        interval: float = 0.005,
+        memory_endpoints: set[str] | None = None,
+        top_n: int = 50,
+        ring_size: int = 200,
+        max_concurrent: int = 4,
+    ) -> None:
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.memory_endpoints = set(memory_endpoints or ())
+        self.top_n = top_n
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self._active: dict[int, _Active] = {}
+        self._profiles: deque[dict] = deque(maxlen=ring_size)
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._memory_users = 0
+
+    # -- settings ----------------------------------------------------------------------------------------------
+
+    def settings(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "interval_ms": round(self.interval * 1000, 3),
+            "memory_endpoints": sorted(self.memory_endpoints),
+            "top_n": self.top_n,
+            "ring_size": self._profiles.maxlen,
+            "max_concurrent": self.max_concurrent,
+        }
+
+    def configure(self, **values) -> None:
+        for key, value in values.items():
+            if key == "memory_endpoints":
+                value = set(value)
+            setattr(self, key, value)
+
+    # -- sampling ----------------------------------------------------------------------------------------------
+
+    def _ensure_sampler(self) -> None:
+        # Started on first use rather than at startup: threads do not survive a preforking server's fork.
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            if not self._active:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, active in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        active.stacks[_fold(frame)] += 1
+                        active.samples += 1
+            del frames
+            time.sleep(self.interval)
+
+    def should_sample(self) -> bool:
+        return self.enabled and self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, endpoint: str | None) -> dict | None:
+        thread_id = threading.get_ident()
+        with self._lock:
+            if len(self._active) >= self.max_concurrent or thread_id in self._active:
+                metrics.incr("profiler.skipped")
+                return None
+            self._active[thread_id] = _Active(thread_id)
+        memory = endpoint in self.memory_endpoints
+        if memory:
+            with self._lock:
+                self._memory_users += 1
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(_MEMORY_FRAMES)
+            tracemalloc.reset_peak()
+        self._ensure_sampler()
+        self._wake.set()
+        return {
+            "thread_id": thread_id,
+            "memory": memory,
+            "started_at": datetime.now(),
+            "wall": time.perf_counter(),
+            "cpu": time.thread_time(),
+        }
+
+    def finish(self, token: dict, *, endpoint: str | None, method: str, path: str, status: int | None) -> dict:
+        duration = time.perf_counter() - token["wall"]
+        cpu = time.thread_time() - token["cpu"]
+        with self._lock:
+            active = self._active.pop(token["thread_id"])
+        profile = {
+            "profile_id": uuid.uuid4().hex[:12],
+            "endpoint": endpoint,
+            "method": method,
+            "path": path,
+            "status": status,
+            "started_at": token["started_at"].isoformat(timespec="seconds"),
+            "duration_ms": round(duration * 1000, 3),
+            "cpu_ms": round(cpu * 1000, 3),
+            "samples": active.samples,
+            "interval_ms": round(self.interval * 1000, 3),
+            "stacks": dict(active.stacks.most_common(self.top_n)),
+        }
+        if token["memory"]:
+            profile.update(self._memory_snapshot())
+        self._profiles.append(profile)
+        metrics.incr("profiler.profiles")
+        return profile
+
+    def _memory_snapshot(self) -> dict:
+        _current, peak = tracemalloc.get_traced_memory()
+        # The sampler thread's own allocations are not the request's.
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        with self._lock:
+            self._memory_users -= 1
+            if self._memory_users == 0:
+                tracemalloc.stop()
+        stats = snapshot.statistics("traceback")
+        return {
+            "memory_peak_bytes": peak,
+            "memory_retained_bytes": sum(s.size for s in stats),
+            "memory_stacks": {_fold_traceback(s.traceback): s.size for s in stats[: self.top_n]},
+        }
+
+    # -- results -----------------------------------------------------------------------------------------------
+
+    def profiles(self) -> list[dict]:
+        return list(self._profiles)
+
+    def profile(self, profile_id: str) -> dict | None:
+        return next((p for p in self._profiles if p["profile_id"] == profile_id), None)
+
+    def aggregate(self, *, endpoint: str | None = None, kind: str = "cpu") -> dict:
+        """Stacks summed over the profiles in the ring buffer (optionally one endpoint), top-N kept."""
+        field = "memory_stacks" if kind == "memory" else "stacks"
+        total: Counter[str] = Counter()
+        count = 0
+        for profile in self.profiles():
+            if (endpoint is None or profile["endpoint"] == endpoint) and field in profile:
+                total.update(profile[field])
+                count += 1
+        return {"endpoint": endpoint, "kind": kind, "profiles": count, "stacks": dict(total.most_common(self.top_n))}
+
+    def clear(self) -> None:
+        self._profiles.clear()
+
+
+def profiler() -> Profiler:
+    return current_app.extensions["profiler"]
+
+
+def init_profiler(app: Flask) -> Profiler:
+    endpoints = app.config.get("PROFILER_MEMORY_ENDPOINTS") or ""
+    prof = Profiler(
+        enabled=app.config.get("PROFILER_ENABLED", False),
+        sample_rate=app.config.get("PROFILER_SAMPLE_RATE", 0.01),
+        interval=app.config.get("PROFILER_INTERVAL_MS", 5) / 1000,
+        memory_endpoints={e.strip() for e in endpoints.split(",") if e.strip()},
+        top_n=app.config.get("PROFILER_TOP_N", 50),
+        ring_size=app.config.get("PROFILER_RING_SIZE", 200),
+        max_concurrent=app.config.get("PROFILER_MAX_CONCURRENT", 4),
+    )
+    app.extensions["profiler"] = prof
+
+    @app.before_request
+    def _profile_start():
+        if prof.should_sample():
+            g._profile_token = prof.start(request.endpoint)
+
+    @app.teardown_request
+    def _profile_finish(_exc):
+        token = g.pop("_profile_token", None)
+        if token is not None:
+            status = getattr(g, "_profile_status", None)
+            prof.finish(token, endpoint=request.endpoint, method=request.method, path=request.path, status=status)
+
+    @app.after_request
+    def _profile_status(response):
+        if "_profile_token" in g:
+            g._profile_status = response.status_code
+        return response
+
+    return prof
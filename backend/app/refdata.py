@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .tenancy import PerTenant, current_tenant, engine_for, use_tenant
+from .utils import metrics
+from .utils.cache import shared_cache
+
+# Process-wide snapshot (one per tenant) of the small, rarely changing dimension tables (department, room,
+# employee), so serializers and hot paths resolve names by id instead of joining them on every query.
+#   - ORM writes to those tables bump refdata_version in the same transaction; the committing process drops its
+#     snapshot right away and broadcasts the change on the shared cache's invalidation channel, so other processes
+#     drop theirs too. The version check every REFDATA_SYNC_SECONDS remains the fallback (e.g. memory backend).
+#   - Snapshots are read on a separate connection, so they only ever contain committed rows.
+# Models are imported lazily: app.models imports this module for its serializers.
+_VERSION_NAME = "refdata"
+_CHANGED_KEY = "refdata_changed"
+_NAMESPACE = "refdata:"  # + tenant code ("" = default database)
+
+
+class RefData:
+    """One immutable snapshot; lookups return copies so callers may modify them."""
+
+    def __init__(self, version: int, departments: dict, rooms: dict, employees: dict) -> None:
+        self.version = version
+        self.departments = departments
+        self.rooms = rooms
+        self.employees = employees
+        self.loaded_at = time.monotonic()
+
+
+class RefDataCache:
+    def __init__(self, app: Flask, *, sync_interval: float) -> None:
+        self.app = app
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._snapshot: RefData | None = None
+        self._next_check = 0.0
+
+    def _read_version(self, conn) -> int:
+        from .models import RefdataVersion
+
+        version = conn.execute(select(RefdataVersion.version).where(RefdataVersion.name == _VERSION_NAME)).scalar()
+        return int(version or 0)
+
+    def _load(self) -> RefData:
+        from .models import Department, Employee, Room
+
+        with engine_for().connect() as conn:
+            version = self._read_version(conn)
+            departments = {
+                dept_id: {"dept_id": dept_id, "dept_name": name, "description": description}
+                for dept_id, name, description in conn.execute(
+                    select(Department.dept_id, Department.dept_name, Department.description)
+                )
+            }
+            rooms = {}
+            for room_id, room_number, dept_id, status in conn.execute(
+                select(Room.room_id, Room.room_number, Room.dept_id, Room.status)
+            ):
+                dept = departments.get(dept_id)
+                rooms[room_id] = {
+                    "room_id": room_id,
+                    "room_number": room_number,
+                    "dept_id": dept_id,
+                    "dept_name": dept["dept_name"] if dept else None,
+                    "status": status,
+                }
+            employees = {}
+            cols = (
+                Employee.emp_id,
+                Employee.name,
+                Employee.gender,
+                Employee.phone,
+                Employee.position,
+                Employee.title,
+                Employee.dept_id,
+                Employee.status,
+            )
+            for emp_id, name, gender, phone, position, title, dept_id, status in conn.execute(select(*cols)):
+                dept = departments.get(dept_id)
+                employees[emp_id] = {
+                    "emp_id": emp_id,
+                    "name": name,
+                    "gender": gender,
+                    "phone": phone,
+                    "position": position,
+                    "title": title,
+                    "dept_id": dept_id,
+                    "dept_name": dept["dept_name"] if dept else None,
+                    "status": status,
+                }
+        metrics.incr("refdata.loads")
+        return RefData(version, departments, rooms, employees)
+
+    def reload(self) -> RefData:
+        with self._lock:
+            self._snapshot = self._load()
+            self._next_check = time.monotonic() + self.sync_interval
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        self._snapshot = None
+
+    def get(self) -> RefData:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.reload()
+        if time.monotonic() >= self._next_check:
+            self._next_check = time.monotonic() + self.sync_interval
+            with engine_for().connect() as conn:
+                if self._read_version(conn) != snapshot.version:
+                    return self.reload()
+        return snapshot
+
+    def lookup(self, kind: str, key) -> dict | None:
+        if key is None:
+            return None
+        snapshot = self.get()
+        row = getattr(snapshot, kind).get(key)
+        if row is None and snapshot.loaded_at < time.monotonic() - 1:
+            # Committed by another process since the last sync; reload rather than serving a hole.
+            row = getattr(self.reload(), kind).get(key)
+        return dict(row) if row is not None else None
+
+
+def _cache() -> RefDataCache:
+    return current_app.extensions["refdata"].get()
+
+
+def department(dept_id: int | None) -> dict | None:
+    return _cache().lookup("departments", dept_id)
+
+
+def room(room_id: int | None) -> dict | None:
+    return _cache().lookup("rooms", room_id)
+
+
+def employee(emp_id: str | None) -> dict | None:
+    return _cache().lookup("employees", emp_id)
+
+
+def dept_name(dept_id: int | None) -> str | None:
+    dept = department(dept_id)
+    return dept["dept_name"] if dept else None
+
+
+def employee_name(emp_id: str | None) -> str | None:
+    emp = employee(emp_id)
+    return emp["name"] if emp else None
+
+
+def room_ids(dept_id: int | None = None, *, room_number: str | None = None, status: str | None = None) -> list[int]:
+    """Ids of the rooms matching every given filter, from the snapshot (replaces JOIN room for filtering)."""
+    return sorted(
+        r["room_id"]
+        for r in _cache().get().rooms.values()
+        if (dept_id is None or r["dept_id"] == dept_id)
+        and (room_number is None or r["room_number"] == room_number)
+        and (status is None or r["status"] == status)
+    )
+
+
+def _after_flush(session: Session, _flush_context) -> None:
+    from .models import Department, Employee, RefdataVersion, Room
+
+    models = (Department, Employee, Room)
+    changed = any(isinstance(obj, models) for objs in (session.new, session.dirty, session.deleted) for obj in objs)
+    if not changed or session.info.get(_CHANGED_KEY):
+        return
+    conn = session.connection()
+    result = conn.execute(
+        update(RefdataVersion).where(RefdataVersion.name == _VERSION_NAME).values(version=RefdataVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        conn.execute(insert(RefdataVersion).values(name=_VERSION_NAME, version=1))
+    session.info[_CHANGED_KEY] = True
+
+
+def _after_commit(session: Session) -> None:
+    if session.info.pop(_CHANGED_KEY, None) and has_app_context():
+        caches = current_app.extensions.get("refdata")
+        cache = caches.peek() if caches is not None else None
+        if cache is not None:
+            cache.invalidate()
+        shared_cache().bump(_NAMESPACE + (current_tenant() or ""))
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_CHANGED_KEY, None)
+
+
+def _on_invalidate(caches: PerTenant[RefDataCache], namespace: str) -> None:
+    if namespace == "*":
+        for cache in caches.values():
+            cache.invalidate()
+    elif namespace.startswith(_NAMESPACE):
+        with use_tenant(namespace[len(_NAMESPACE) :] or None):
+            cache = caches.peek()
+        if cache is not None:
+            cache.invalidate()
+
+
+_listeners_installed = False
+
+
+def init_refdata(app: Flask) -> PerTenant[RefDataCache]:
+    global _listeners_installed
+    sync_interval = app.config.get("REFDATA_SYNC_SECONDS", 5)
+    cache = PerTenant(lambda: RefDataCache(app, sync_interval=sync_interval))
+    app.extensions["refdata"] = cache
+    app.extensions["shared_cache"].subscribe(lambda namespace: _on_invalidate(cache, namespace))
+    if not _listeners_installed:
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
+        _listeners_installed = True
+    return cache
+
+
+def warm_refdata(app: Flask) -> None:
+    """Populate the snapshot at startup; a database without tables yet is loaded lazily on first use."""
+    with app.app_context():
+        try:
+            _cache().reload()
+        except SQLAlchemyError:
+            app.logger.warning("Reference data cache not populated at startup", exc_info=True)
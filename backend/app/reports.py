@@ -0,0 +1,459 @@
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, case, exists, extract, func, or_, select
+from sqlalchemy.orm import aliased
+
+from . import archive, refdata
+from .extensions import db
+from .models import Department, Employee, IncomeRecord, Room, Schedule, ScheduleCounterShard, Visit
+from .revenue_index import GRANULARITIES, buckets, revenue_index
+from .utils.datetime_utils import parse_date
+from .utils.errors import APIError
+
+
+def _text(params: dict, name: str) -> str | None:
+    # Query strings only ever hold strings; JSON bodies (POST /api/admin/reports/<kind>) may hold anything.
+    value = params.get(name)
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise APIError(f"Invalid {name}", code="validation_error", status=400)
+    return value.strip() or None
+
+
+def _date_range(params: dict) -> tuple[date, date]:
+    start_date = _text(params, "start_date")
+    end_date = _text(params, "end_date")
+    start = parse_date(start_date) if start_date else date.today()
+    end = parse_date(end_date) if end_date else date.today()
+    return start, end
+
+
+def _wants_archive(params: dict, start: date) -> bool:
+    # 起始日期早于归档线时自动并入归档表，保证历史区间的统计口径不变。
+    flag = str(params.get("include_archive") or "").strip().lower() in ("1", "true", "yes", "on")
+    return flag or start < archive.archive_cutoff(current_app.config.get("ARCHIVE_AFTER_MONTHS", 12))
+
+
+def normalize_income_params(params: dict) -> dict:
+    start, end = _date_range(params)
+    group_by = _text(params, "group_by") or "dept"
+    if group_by == "date":
+        group_by = "day"
+    if group_by not in ("day", "doctor", "dept"):
+        raise APIError("Invalid group_by", code="validation_error", status=400)
+    granularity = _text(params, "granularity")
+    if granularity is not None and granularity not in GRANULARITIES:
+        raise APIError("Invalid granularity", code="validation_error", status=400)
+    return {
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "group_by": group_by,
+        "granularity": granularity,
+        "include_archive": _wants_archive(params, start),
+    }
+
+
+def normalize_visit_params(params: dict) -> dict:
+    start, end = _date_range(params)
+    group_by = _text(params, "group_by") or "dept"
+    if group_by == "date":
+        group_by = "day"
+    if group_by not in ("day", "doctor", "dept"):
+        raise APIError("Invalid group_by", code="validation_error", status=400)
+    status = _text(params, "status")
+    return {
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "group_by": group_by,
+        "status": status,
+        "include_archive": _wants_archive(params, start),
+    }
+
+
+def _period_rows(totals, periods: list[tuple[date, date]]) -> list[dict]:
+    rows = []
+    for period_start, period_end in periods:
+        cents, count = totals(period_start, period_end)
+        rows.append(
+            {
+                "start_date": period_start.isoformat(),
+                "end_date": period_end.isoformat(),
+                "amount": cents / 100,
+                "records": count,
+            }
+        )
+    return rows
+
+
+def _income_stats_indexed(params: dict) -> list[dict]:
+    """income_stats() answered from the in-memory prefix-sum index: every total is two array lookups."""
+    start = date.fromisoformat(params["start_date"])
+    end = date.fromisoformat(params["end_date"])
+    group_by = params["group_by"]
+    granularity = params.get("granularity")
+    index = revenue_index()
+
+    if group_by == "day":
+        periods = buckets(start, end, granularity or "day")
+        rows = _period_rows(lambda s, e: index.total(("all", None), s, e), periods)
+        if granularity is None:
+            return [
+                {"date": r["start_date"], "amount": r["amount"], "records": r["records"]} for r in rows if r["records"]
+            ]
+        return [r for r in rows if r["records"]]
+
+    data = []
+    for key_id in index.keys(group_by):
+        key = (group_by, key_id)
+        cents, count = index.total(key, start, end)
+        if not count:
+            continue
+        if group_by == "doctor":
+            row = {"doctor_id": key_id, "doctor_name": refdata.employee_name(key_id)}
+        else:
+            row = {"dept_id": key_id, "dept_name": refdata.dept_name(key_id)}
+        row.update(amount=cents / 100, records=count)
+        if granularity is not None:
+            row["periods"] = _period_rows(lambda s, e: index.total(key, s, e), buckets(start, end, granularity))
+        data.append(row)
+    return data
+
+
+def _bucketed(daily: dict[date, tuple[float, int]], periods: list[tuple[date, date]]) -> list[dict]:
+    # SQL fallback for `granularity`: per-day totals from the query, summed into calendar periods.
+    def totals(s: date, e: date) -> tuple[int, int]:
+        picked = [v for d, v in daily.items() if s <= d <= e]
+        return round(sum(a for a, _c in picked) * 100), sum(c for _a, c in picked)
+
+    return _period_rows(totals, periods)
+
+
+def income_stats(params: dict) -> dict:
+    """
+    Aggregate income_record over a date range; `params` must be normalized. With `granularity`, group_by=day
+    returns one row per calendar period and dept/doctor rows carry a `periods` breakdown.
+    Served from the revenue prefix-sum index when REVENUE_INDEX_ENABLED, otherwise with GROUP BY queries.
+    """
+    start = date.fromisoformat(params["start_date"])
+    end = date.fromisoformat(params["end_date"])
+    group_by = params["group_by"]
+    granularity = params.get("granularity")
+    result = {
+        "group_by": group_by,
+        "granularity": granularity,
+        "start_date": params["start_date"],
+        "end_date": params["end_date"],
+    }
+    if current_app.config.get("REVENUE_INDEX_ENABLED", True):
+        return {**result, "data": _income_stats_indexed(params)}
+
+    IR = archive.source(IncomeRecord, params.get("include_archive", False))
+    q = db.session.query(IR).filter(IR.record_date >= start).filter(IR.record_date <= end)
+
+    if group_by == "day":
+        rows = (
+            q.with_entities(IR.record_date, func.sum(IR.amount), func.count(IR.record_id))
+            .group_by(IR.record_date)
+            .order_by(IR.record_date.asc())
+            .all()
+        )
+        if granularity is not None:
+            daily = {d: (float(total), int(cnt)) for d, total, cnt in rows}
+            data = [r for r in _bucketed(daily, buckets(start, end, granularity)) if r["records"]]
+        else:
+            data = [{"date": d.isoformat(), "amount": float(total), "records": int(cnt)} for d, total, cnt in rows]
+    elif group_by == "doctor":
+        rows = (
+            q.join(Employee, IR.doctor_id == Employee.emp_id, isouter=True)
+            .with_entities(IR.doctor_id, Employee.name, func.sum(IR.amount), func.count(IR.record_id))
+            .group_by(IR.doctor_id, Employee.name)
+            .all()
+        )
+        data = [
+            {"doctor_id": did, "doctor_name": name, "amount": float(total), "records": int(cnt)}
+            for did, name, total, cnt in rows
+        ]
+    else:
+        rows = (
+            q.join(Department, IR.dept_id == Department.dept_id)
+            .with_entities(IR.dept_id, Department.dept_name, func.sum(IR.amount), func.count(IR.record_id))
+            .group_by(IR.dept_id, Department.dept_name)
+            .all()
+        )
+        data = [
+            {"dept_id": dept_id, "dept_name": dept_name, "amount": float(total), "records": int(cnt)}
+            for dept_id, dept_name, total, cnt in rows
+        ]
+    if granularity is not None and group_by != "day":
+        key_col = IR.doctor_id if group_by == "doctor" else IR.dept_id
+        daily_by_key: dict = {}
+        for key_id, d, total, cnt in q.with_entities(
+            key_col, IR.record_date, func.sum(IR.amount), func.count(IR.record_id)
+        ).group_by(key_col, IR.record_date):
+            daily_by_key.setdefault(key_id, {})[d] = (float(total), int(cnt))
+        periods = buckets(start, end, granularity)
+        for row in data:
+            row["periods"] = _bucketed(daily_by_key.get(row[f"{group_by}_id"], {}), periods)
+
+    return {**result, "data": data}
+
+
+def visit_stats(params: dict) -> dict:
+    """Aggregate visits by check-in date range; `params` must be normalized."""
+    start_dt = datetime.combine(date.fromisoformat(params["start_date"]), time.min)
+    end_dt = datetime.combine(date.fromisoformat(params["end_date"]), time.max)
+    group_by = params["group_by"]
+    status = params.get("status")
+
+    V = archive.source(Visit, params.get("include_archive", False))
+    q = db.session.query(V).filter(V.check_in_time >= start_dt).filter(V.check_in_time <= end_dt)
+    if status:
+        q = q.filter(V.status == status)
+
+    if group_by == "day":
+        rows = (
+            q.with_entities(
+                func.date(V.check_in_time),
+                func.count(V.visit_id),
+                func.count(func.distinct(V.patient_id)),
+            )
+            .group_by(func.date(V.check_in_time))
+            .order_by(func.date(V.check_in_time).asc())
+            .all()
+        )
+        data = [{"date": str(day), "visits": int(cnt), "patients": int(pcnt)} for day, cnt, pcnt in rows]
+    elif group_by == "doctor":
+        rows = (
+            q.join(Employee, V.doctor_id == Employee.emp_id, isouter=True)
+            .with_entities(
+                V.doctor_id,
+                Employee.name,
+                func.count(V.visit_id),
+                func.count(func.distinct(V.patient_id)),
+            )
+            .group_by(V.doctor_id, Employee.name)
+            .all()
+        )
+        data = [
+            {"doctor_id": did, "doctor_name": name, "visits": int(cnt), "patients": int(pcnt)}
+            for did, name, cnt, pcnt in rows
+        ]
+    else:
+        rows = (
+            q.join(Room, V.room_id == Room.room_id)
+            .join(Department, Room.dept_id == Department.dept_id)
+            .with_entities(
+                Room.dept_id,
+                Department.dept_name,
+                func.count(V.visit_id),
+                func.count(func.distinct(V.patient_id)),
+            )
+            .group_by(Room.dept_id, Department.dept_name)
+            .all()
+        )
+        data = [
+            {"dept_id": dept_id, "dept_name": dept_name, "visits": int(cnt), "patients": int(pcnt)}
+            for dept_id, dept_name, cnt, pcnt in rows
+        ]
+
+    return {
+        "group_by": group_by,
+        "start_date": params["start_date"],
+        "end_date": params["end_date"],
+        "status": status,
+        "data": data,
+    }
+
+
+# Longest window the utilization matrix accepts (a quarter, plus slack for month boundaries).
+UTILIZATION_MAX_DAYS = 93
+
+
+def normalize_utilization_params(params: dict) -> dict:
+    start_date = _text(params, "start_date")
+    end_date = _text(params, "end_date")
+    start = parse_date(start_date) if start_date else date.today()
+    end = parse_date(end_date) if end_date else start + timedelta(days=6)
+    if end < start:
+        raise APIError("end_date must not be before start_date", code="validation_error", status=400)
+    if (end - start).days + 1 > UTILIZATION_MAX_DAYS:
+        raise APIError(
+            "Date range too long",
+            code="validation_error",
+            status=400,
+            details={"max_days": UTILIZATION_MAX_DAYS},
+        )
+    dept_id = params.get("dept_id")
+    try:
+        dept_id = int(dept_id) if dept_id not in (None, "") else None
+    except (TypeError, ValueError) as e:
+        raise APIError("Invalid dept_id", code="validation_error", status=400) from e
+    return {
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "dept_id": dept_id,
+        "include_archive": _wants_archive(params, start),
+    }
+
+
+def _ratio(booked: int, capacity: int) -> float | None:
+    return round(booked / capacity, 4) if capacity else None
+
+
+def _cell(max_patients: int = 0, booked: int = 0, visits: int = 0) -> dict:
+    return {"max_patients": max_patients, "booked": booked, "visits": visits}
+
+
+def _add(into: dict, max_patients: int, booked: int, visits: int) -> None:
+    into["max_patients"] += max_patients
+    into["booked"] += booked
+    into["visits"] += visits
+
+
+def _finish(cell: dict) -> dict:
+    cell["utilization"] = _ratio(cell["booked"], cell["max_patients"])
+    return cell
+
+
+def utilization_stats(params: dict) -> dict:
+    """
+    Booked vs. max_patients per doctor x date x slot, plus department totals; `params` must be normalized.
+    One grouped statement: schedules joined to room/department/doctor, with visits (checked in at the
+    schedule's room, date and half-day) and counter-shard reservations pre-aggregated in subqueries.
+    Visits do not record their schedule: each one counts for the room's schedule of its half-day, or for the
+    room's 全天 schedule only when that half-day has none of its own, so no visit is counted twice.
+    """
+    start = date.fromisoformat(params["start_date"])
+    end = date.fromisoformat(params["end_date"])
+    dept_id = params.get("dept_id")
+
+    V = archive.source(Visit, params.get("include_archive", False))
+    # Same rule as detect_time_slot(): before 12:00 is 上午.
+    half_day = case((extract("hour", V.check_in_time) < 12, "上午"), else_="下午")
+    visits = (
+        select(
+            V.room_id.label("room_id"),
+            func.date(V.check_in_time).label("day"),
+            half_day.label("slot"),
+            func.count(V.visit_id).label("visits"),
+        )
+        .where(V.check_in_time >= datetime.combine(start, time.min))
+        .where(V.check_in_time <= datetime.combine(end, time.max))
+        .group_by(V.room_id, func.date(V.check_in_time), half_day)
+        .subquery("v")
+    )
+    half_day_schedule = aliased(Schedule)
+    has_half_day_schedule = exists().where(
+        half_day_schedule.room_id == visits.c.room_id,
+        half_day_schedule.work_date == visits.c.day,
+        half_day_schedule.time_slot == visits.c.slot,
+    )
+    shards = (
+        select(ScheduleCounterShard.schedule_id, func.sum(ScheduleCounterShard.used).label("used"))
+        .group_by(ScheduleCounterShard.schedule_id)
+        .subquery("sh")
+    )
+
+    q = (
+        db.session.query(
+            Schedule.schedule_id,
+            Schedule.work_date,
+            Schedule.time_slot,
+            Schedule.room_id,
+            Schedule.doctor_id,
+            Employee.name,
+            Room.dept_id,
+            Department.dept_name,
+            Schedule.max_patients,
+            (Schedule.current_patients + func.coalesce(shards.c.used, 0)).label("booked"),
+            func.coalesce(func.sum(visits.c.visits), 0).label("visits"),
+        )
+        .select_from(Schedule)
+        .join(Room, Schedule.room_id == Room.room_id)
+        .join(Department, Room.dept_id == Department.dept_id)
+        .join(Employee, Schedule.doctor_id == Employee.emp_id)
+        .outerjoin(shards, shards.c.schedule_id == Schedule.schedule_id)
+        .outerjoin(
+            visits,
+            (visits.c.room_id == Schedule.room_id)
+            & (visits.c.day == Schedule.work_date)
+            & or_(
+                visits.c.slot == Schedule.time_slot,
+                and_(Schedule.time_slot == "全天", ~has_half_day_schedule),
+            ),
+        )
+        .filter(Schedule.work_date >= start)
+        .filter(Schedule.work_date <= end)
+    )
+    if dept_id is not None:
+        q = q.filter(Room.dept_id == dept_id)
+    rows = (
+        q.group_by(
+            Schedule.schedule_id,
+            Schedule.work_date,
+            Schedule.time_slot,
+            Schedule.room_id,
+            Schedule.doctor_id,
+            Employee.name,
+            Room.dept_id,
+            Department.dept_name,
+            Schedule.max_patients,
+            Schedule.current_patients,
+            shards.c.used,
+        )
+        .order_by(Schedule.doctor_id.asc(), Schedule.work_date.asc(), Schedule.time_slot.asc())
+        .all()
+    )
+
+    doctors: dict[str, dict] = {}
+    departments: dict[int, dict] = {}
+    totals = _cell()
+    for _sid, work_date, slot, room_id, doctor_id, doctor_name, d_id, dept_name, max_p, booked, n_visits in rows:
+        max_p, booked, n_visits = int(max_p), int(booked), int(n_visits)
+        doc = doctors.get(doctor_id)
+        if doc is None:
+            doc = doctors[doctor_id] = {
+                "doctor_id": doctor_id,
+                "doctor_name": doctor_name,
+                "dept_id": d_id,
+                **_cell(),
+                "days": {},
+            }
+        cell = doc["days"].setdefault(work_date.isoformat(), {}).setdefault(slot, {"room_ids": [], **_cell()})
+        cell["room_ids"].append(room_id)
+        _add(cell, max_p, booked, n_visits)
+        _add(doc, max_p, booked, n_visits)
+        dept = departments.get(d_id)
+        if dept is None:
+            dept = departments[d_id] = {"dept_id": d_id, "dept_name": dept_name, "schedules": 0, **_cell()}
+        dept["schedules"] += 1
+        _add(dept, max_p, booked, n_visits)
+        _add(totals, max_p, booked, n_visits)
+
+    for doc in doctors.values():
+        _finish(doc)
+        for slots in doc["days"].values():
+            for cell in slots.values():
+                _finish(cell)
+
+    return {
+        "start_date": params["start_date"],
+        "end_date": params["end_date"],
+        "dept_id": dept_id,
+        "generated_at": datetime.now().isoformat(sep=" ", timespec="seconds"),
+        "doctors": list(doctors.values()),
+        "departments": [_finish(d) for d in sorted(departments.values(), key=lambda d: d["dept_id"])],
+        "totals": {"schedules": len(rows), **_finish(totals)},
+    }
+
+
+# kind -> (normalize, compute)
+REPORT_KINDS = {
+    "income": (normalize_income_params, income_stats),
+    "visits": (normalize_visit_params, visit_stats),
+    "utilization": (normalize_utilization_params, utilization_stats),
+}
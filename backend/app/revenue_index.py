@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from flask import Flask, current_app
+from sqlalchemy import func, or_, select, union_all
+
+from .extensions import db
+from .tenancy import PerTenant
+from .models import IncomeRecord, IncomeRecordArchive
+from .utils import metrics
+
+# Cumulative sums of income per day, per department / per doctor / overall (key ("all", None)):
+#   cum[key][i] = total of record_date <= base + i days, so any range total is cum[end] - cum[start - 1].
+# Built once from income_record + income_record_archive, then extended from income_record rows with a record_id
+# above the last one applied (one indexed query per read). Concurrent payments commit out of id order, so ids
+# below the highest applied one that were not there yet (gaps) are remembered and re-checked on every read, until
+# they show up or GAP_TIMEOUT seconds pass (rolled-back inserts and skipped auto-increment values never do).
+GAP_SCAN = 1000  # trailing ids inspected for gaps at build time
+GAP_TIMEOUT = 600
+MAX_GAPS = 10_000
+GRANULARITIES = ("day", "week", "month", "quarter")
+
+
+def _cents(amount) -> int:
+    return int((Decimal(amount) * 100).to_integral_value())
+
+
+class RevenueIndex:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.base: date | None = None
+        self.amounts: dict[tuple, list[int]] = {}
+        self.counts: dict[tuple, list[int]] = {}
+        self.max_id = 0
+        self._gaps: dict[int, float] = {}  # missing record_id -> monotonic time first noticed
+        self.built = False
+
+    # -- maintenance -------------------------------------------------------------------------------------------
+
+    def build(self) -> None:
+        """
+        Full rebuild: one grouped pass over hot + archived income records. The statements need not share a
+        snapshot: the trailing ids are listed first and only those are summed, everything else there is a gap.
+        """
+        max_id = db.session.execute(select(func.max(IncomeRecord.record_id))).scalar() or 0
+        floor = max(max_id - GAP_SCAN, 0)
+        present = set(
+            db.session.execute(
+                select(IncomeRecord.record_id).where(IncomeRecord.record_id > floor, IncomeRecord.record_id <= max_id)
+            ).scalars()
+        )
+
+        def grouped(model, *where):
+            return (
+                select(model.record_date, model.dept_id, model.doctor_id, func.sum(model.amount), func.count())
+                .where(*where)
+                .group_by(model.record_date, model.dept_id, model.doctor_id)
+            )
+
+        hot = grouped(IncomeRecord, or_(IncomeRecord.record_id <= floor, IncomeRecord.record_id.in_(present)))
+        rows = db.session.execute(union_all(hot, grouped(IncomeRecordArchive))).all()
+        now = time.monotonic()
+        with self._lock:
+            self.base = min((r[0] for r in rows), default=date.today())
+            self.amounts, self.counts = {}, {}
+            for record_date, dept_id, doctor_id, total, count in sorted(rows, key=lambda r: r[0]):
+                self._add(record_date, dept_id, doctor_id, _cents(total), int(count))
+            self.max_id = max_id
+            self._gaps = {i: now for i in range(floor + 1, max_id + 1) if i not in present}
+            self.built = True
+        metrics.incr("revenue_index.builds")
+
+    def _series(self, store: dict, key: tuple, length: int) -> list[int]:
+        series = store.setdefault(key, [])
+        if len(series) < length:
+            series.extend([series[-1] if series else 0] * (length - len(series)))
+        return series
+
+    def _add(self, record_date: date, dept_id, doctor_id, cents: int, count: int) -> None:
+        offset = (record_date - self.base).days
+        for key in (("all", None), ("dept", dept_id), ("doctor", doctor_id)):
+            amounts = self._series(self.amounts, key, offset + 1)
+            counts = self._series(self.counts, key, offset + 1)
+            # Payments land on the last day, so this loop is usually a single element.
+            for i in range(offset, len(amounts)):
+                amounts[i] += cents
+                counts[i] += count
+
+    def catch_up(self) -> int:
+        """Apply income_record rows committed since the last read; returns how many were new."""
+        if not self.built:
+            self.build()
+            return 0
+        rows = db.session.execute(
+            select(
+                IncomeRecord.record_id,
+                IncomeRecord.record_date,
+                IncomeRecord.dept_id,
+                IncomeRecord.doctor_id,
+                IncomeRecord.amount,
+            )
+            .where(or_(IncomeRecord.record_id > self.max_id, IncomeRecord.record_id.in_(list(self._gaps))))
+            .order_by(IncomeRecord.record_id.asc())
+        ).all()
+        applied = 0
+        now = time.monotonic()
+        with self._lock:
+            for record_id, record_date, dept_id, doctor_id, amount in rows:
+                if record_id <= self.max_id and self._gaps.pop(record_id, None) is None:
+                    continue  # applied by a concurrent catch_up
+                if record_date < self.base:
+                    self.built = False  # backdated before the first indexed day: rebuild instead
+                    break
+                if record_id > self.max_id:
+                    for missing in range(max(self.max_id + 1, record_id - MAX_GAPS), record_id):
+                        self._gaps[missing] = now
+                    self.max_id = record_id
+                self._add(record_date, dept_id, doctor_id, _cents(amount), 1)
+                applied += 1
+            for i in [i for i, seen in self._gaps.items() if now - seen > GAP_TIMEOUT]:
+                del self._gaps[i]
+            for i in sorted(self._gaps)[: len(self._gaps) - MAX_GAPS]:
+                del self._gaps[i]
+        if not self.built:
+            self.build()
+        elif applied:
+            metrics.incr("revenue_index.applied", applied)
+        return applied
+
+    # -- queries -----------------------------------------------------------------------------------------------
+
+    def _at(self, series: list[int], day: date) -> int:
+        offset = (day - self.base).days
+        if offset < 0 or not series:
+            return 0
+        return series[min(offset, len(series) - 1)]
+
+    def total(self, key: tuple, start: date, end: date) -> tuple[int, int]:
+        """(amount in cents, record count) for start..end inclusive, as a prefix difference."""
+        with self._lock:
+            amounts = self.amounts.get(key, [])
+            counts = self.counts.get(key, [])
+            before = start - timedelta(days=1)
+            return (
+                self._at(amounts, end) - self._at(amounts, before),
+                self._at(counts, end) - self._at(counts, before),
+            )
+
+    def keys(self, kind: str) -> list:
+        with self._lock:
+            return [k[1] for k in self.amounts if k[0] == kind]
+
+
+def buckets(start: date, end: date, granularity: str) -> list[tuple[date, date]]:
+    """Calendar periods (weeks start on Monday) covering start..end, clipped to the range."""
+    out = []
+    cursor = start
+    while cursor <= end:
+        if granularity == "day":
+            period_end = cursor
+        elif granularity == "week":
+            period_end = cursor + timedelta(days=6 - cursor.weekday())
+        else:
+            months = 1 if granularity == "month" else 3
+            first_month = cursor.month if months == 1 else (cursor.month - 1) // 3 * 3 + 1
+            year, month = divmod(first_month - 1 + months, 12)
+            period_end = date(cursor.year + year, month + 1, 1) - timedelta(days=1)
+        period_end = min(period_end, end)
+        out.append((cursor, period_end))
+        cursor = period_end + timedelta(days=1)
+    return out
+
+
+def revenue_index() -> RevenueIndex:
+    """The process-wide index of the current tenant, brought up to date with committed payments."""
+    index = current_app.extensions["revenue_index"].get()
+    index.catch_up()
+    return index
+
+
+def init_revenue_index(app: Flask) -> None:
+    app.extensions["revenue_index"] = PerTenant(RevenueIndex)
@@ -239,6 +239,9 @@ def ensure_seed_data() -> bool:
     Create tables and seed demo data (idempotent).
     Returns True if executed.
     """
+    from .fulltext import ensure_fulltext_index
+
     db.create_all()
     seed_demo_data()
+    ensure_fulltext_index()
     return True
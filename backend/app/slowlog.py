@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import queue
+import re
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import Flask, current_app, has_request_context, request
+from sqlalchemy import delete, event, select
+
+from .extensions import db
+from .models import SlowQuery
+from .tenancy import current_tenant, engine_for, registry
+from .utils import metrics
+
+# Engine-level slow query log. Every cursor execution is timed; statements slower than SLOW_QUERY_MS are handed
+# (never blocking) to a background thread that folds them into slow_query, one row per normalized statement shape
+# and endpoint, and runs EXPLAIN the first time a SELECT shape is seen. Parameter values are only kept in memory
+# until that EXPLAIN has run; the table stores their shape (types, list lengths).
+# Start times live on the execution context (one per statement): a failed statement never reaches
+# after_cursor_execute, and anything kept on the connection would outlive it.
+_START_ATTR = "_slowlog_start"
+# The writer's own statements (and EXPLAINs) are not timed.
+_local = threading.local()
+
+_WS = re.compile(r"\s+")
+# Expanded IN lists / multi-row VALUES: "(?, ?, ?)" -> "(?...)", so list length does not create new shapes.
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+_PARAM_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)")
+_VALUES_ROWS = re.compile(r"(\(\?\.\.\.\))(?:\s*,\s*\(\?\.\.\.\))+")
+_EXPLAIN_PREFIX = {"sqlite": "EXPLAIN QUERY PLAN ", "mysql": "EXPLAIN ", "mariadb": "EXPLAIN ", "postgresql": "EXPLAIN "}
+
+
+def normalize_sql(statement: str) -> str:
+    sql = _WS.sub(" ", statement).strip()
+    sql = _PARAM_LIST.sub("(?...)", sql)
+    return _VALUES_ROWS.sub(r"\1, ...", sql)
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def _type_name(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float, Decimal)):
+        return "num"
+    if isinstance(value, (datetime, date)):
+        return "date"
+    if isinstance(value, (bytes, bytearray)):
+        return "bytes"
+    return "str"
+
+
+def param_shape(parameters, executemany: bool) -> str:
+    """e.g. "str,num×25,date" (runs of one type collapsed), or "12 rows of [...]" for executemany."""
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)} rows of [{param_shape(rows[0], False) if rows else ''}]"
+    values = parameters.values() if isinstance(parameters, dict) else (parameters or ())
+    runs: list[list] = []
+    for name in map(_type_name, values):
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return ",".join(name if n == 1 else f"{name}×{n}" for name, n in runs)[:255]
+
+
+def _endpoint() -> str:
+    if has_request_context():
+        return (request.endpoint or request.path)[:100]
+    return f"thread:{threading.current_thread().name}"[:100]
+
+
+class SlowQueryLog:
+    def __init__(self, app: Flask, *, threshold_ms: float, max_rows: int, explain: bool, queue_size: int = 1000):
+        self.app = app
+        self.threshold = threshold_ms / 1000
+        self.max_rows = max_rows
+        self.explain = explain
+        self._queue_size = queue_size
+        self._lock = threading.Lock()
+        # Fingerprints whose plan is already stored (or cannot be explained): parameters are no longer captured.
+        self._explained: set[str] = set()
+        self._reset()
+
+    def _reset(self) -> None:
+        # Also called after fork: the thread and queued entries belong to the parent.
+        self._pid = os.getpid()
+        self._queue: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        self._thread: threading.Thread | None = None
+
+    # -- engine events -----------------------------------------------------------------------------------------
+
+    def before_cursor_execute(self, _conn, _cursor, _statement, _parameters, context, _executemany) -> None:
+        if context is not None:
+            setattr(context, _START_ATTR, time.perf_counter())
+
+    def after_cursor_execute(self, _conn, _cursor, statement, parameters, context, executemany) -> None:
+        started = getattr(context, _START_ATTR, None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if elapsed < self.threshold or getattr(_local, "suppress", False):
+            return
+        normalized = normalize_sql(statement)
+        key = fingerprint(normalized)
+        wants_plan = self.explain and key not in self._explained
+        entry = {
+            "fingerprint": key,
+            "endpoint": _endpoint(),
+            "statement": normalized,
+            "param_shape": param_shape(parameters, executemany),
+            "ms": elapsed * 1000,
+            "at": datetime.now(),
+            "tenant": current_tenant(),
+            # Raw statement + parameters only until the shape has a plan.
+            "raw": (statement, parameters[0] if executemany and parameters else parameters) if wants_plan else None,
+        }
+        metrics.incr("slow_query.seen")
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            metrics.incr("slow_query.dropped")
+
+    # -- writer ------------------------------------------------------------------------------------------------
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="slow-query-log", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        _local.suppress = True
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 200:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+            except Exception:
+                self.app.logger.exception("Slow query log write failed; dropping %d entries", len(batch))
+                metrics.incr("slow_query.write_errors")
+
+    def flush(self) -> int:
+        """Synchronously write everything queued so far (tests, CLI)."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            suppress = getattr(_local, "suppress", False)
+            _local.suppress = True
+            try:
+                self.write(batch)
+            finally:
+                _local.suppress = suppress
+        return len(batch)
+
+    def _plan(self, tenant: str | None, statement: str, parameters) -> str | None:
+        engine = engine_for(tenant)
+        prefix = _EXPLAIN_PREFIX.get(engine.dialect.name)
+        if prefix is None or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return None
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql(prefix + statement, parameters or ()).all()
+        return "\n".join(" | ".join("" if v is None else str(v) for v in row) for row in rows)
+
+    def write(self, batch: list[dict]) -> None:
+        with self.app.app_context():
+            try:
+                self._write(batch)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+
+    def _write(self, batch: list[dict]) -> None:
+        grouped: dict[tuple[str, str], list[dict]] = {}
+        for entry in batch:
+            grouped.setdefault((entry["fingerprint"], entry["endpoint"]), []).append(entry)
+        keys = {fp for fp, _endpoint in grouped}
+        existing = {
+            (row.fingerprint, row.endpoint): row
+            for row in db.session.scalars(select(SlowQuery).where(SlowQuery.fingerprint.in_(keys)))
+        }
+        planned = {fp: row.plan for (fp, _e), row in existing.items() if row.plan}
+        self._explained.update(planned)
+
+        for (fp, endpoint), entries in grouped.items():
+            row = existing.get((fp, endpoint))
+            if row is None:
+                first = entries[0]
+                row = SlowQuery(
+                    fingerprint=fp,
+                    endpoint=endpoint,
+                    statement=first["statement"],
+                    calls=0,
+                    total_ms=0.0,
+                    max_ms=0.0,
+                    first_seen=first["at"],
+                )
+                db.session.add(row)
+            for entry in entries:
+                row.calls += 1
+                row.total_ms += entry["ms"]
+                row.max_ms = max(row.max_ms, entry["ms"])
+                row.last_ms = entry["ms"]
+                row.last_seen = entry["at"]
+                row.param_shape = entry["param_shape"]
+            if row.plan is None:
+                row.plan = planned.get(fp)
+            if row.plan is None and fp not in self._explained:
+                entry = next((e for e in entries if e["raw"] is not None), None)
+                if entry is not None:
+                    row.plan = self._safe_plan(fp, entry["tenant"], *entry["raw"])
+                    planned[fp] = row.plan
+        db.session.flush()
+
+        count = db.session.scalar(select(db.func.count(SlowQuery.query_id)))
+        if count > self.max_rows:
+            stale = select(SlowQuery.query_id).order_by(SlowQuery.last_seen.asc()).limit(count - self.max_rows)
+            db.session.execute(
+                delete(SlowQuery)
+                .where(SlowQuery.query_id.in_(list(db.session.scalars(stale))))
+                .execution_options(synchronize_session=False)
+            )
+        metrics.incr("slow_query.logged", len(batch))
+
+    def _safe_plan(self, fp: str, tenant: str | None, statement: str, parameters) -> str | None:
+        self._explained.add(fp)  # one attempt per shape, whatever the outcome
+        try:
+            return self._plan(tenant, statement, parameters)
+        except Exception as e:
+            return f"EXPLAIN failed: {e.__class__.__name__}"
+
+
+def slow_query_log() -> SlowQueryLog | None:
+    return current_app.extensions.get("slow_query_log")
+
+
+def init_slow_query_log(app: Flask) -> SlowQueryLog | None:
+    threshold = app.config.get("SLOW_QUERY_MS", 200)
+    if not threshold or threshold <= 0:
+        return None
+    log = SlowQueryLog(
+        app,
+        threshold_ms=threshold,
+        max_rows=app.config.get("SLOW_QUERY_MAX_ROWS", 1000),
+        explain=app.config.get("SLOW_QUERY_EXPLAIN", True),
+    )
+    app.extensions["slow_query_log"] = log
+
+    def listen(engine) -> None:
+        event.listen(engine, "before_cursor_execute", log.before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", log.after_cursor_execute)
+
+    with app.app_context():
+        listen(db.engine)
+    registry(app).engine_hooks.append(listen)  # clinic databases, as their engines are created
+    return log
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import os
+import threading
+import time as _time
+from datetime import datetime, time, timedelta
+
+from flask import Flask
+
+from .extensions import db
+from .models import Appointment
+from .tenancy import registry, use_tenant
+from .utils import metrics
+
+try:  # POSIX only; elsewhere every process sweeps (the UPDATE is idempotent, just repeated)
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+OPEN_APPOINTMENT_STATUSES = ("待确认", "已确认")
+# 过期预约并入“已取消”终态，避免新增枚举值导致已有 MySQL 库需要迁移。
+EXPIRED_STATUS = "已取消"
+
+
+def expire_stale_appointments(
+    *,
+    now: datetime | None = None,
+    grace_days: int = 0,
+    chunk_size: int = 500,
+    max_chunks: int | None = 100,
+) -> int:
+    """
+    Close open appointments whose expected_time is before today (minus grace_days).
+    Works in bounded chunks (one short transaction each); returns the number of rows expired.
+    """
+    now = now or datetime.now()
+    cutoff = datetime.combine(now.date(), time.min) - timedelta(days=grace_days)
+
+    expired = 0
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        chunks += 1
+        ids = [
+            appt_id
+            for (appt_id,) in db.session.query(Appointment.appt_id)
+            .filter(Appointment.status.in_(OPEN_APPOINTMENT_STATUSES))
+            .filter(Appointment.expected_time < cutoff)
+            .order_by(Appointment.expected_time.asc())
+            .limit(chunk_size)
+            .all()
+        ]
+        if not ids:
+            break
+        updated = (
+            Appointment.query.filter(Appointment.appt_id.in_(ids))
+            .filter(Appointment.status.in_(OPEN_APPOINTMENT_STATUSES))
+            .update({Appointment.status: EXPIRED_STATUS}, synchronize_session=False)
+        )
+        db.session.commit()
+        expired += updated
+        if len(ids) < chunk_size:
+            break
+
+    metrics.incr("appointment_sweeper.runs")
+    metrics.incr("appointment_sweeper.expired", expired)
+    metrics.gauge("appointment_sweeper.last_run", _time.time())
+    metrics.gauge("appointment_sweeper.last_expired", expired)
+    return expired
+
+
+class _SweeperLock:
+    """
+    One sweeping process per host: every worker's sweeper tries a non-blocking flock on a file in the instance
+    folder before each run and only the holder sweeps. The lock dies with its process, so another worker takes
+    over on the next interval after the holder exits.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fd: int | None = None
+
+    def acquire(self) -> bool:
+        if fcntl is None or self._fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+
+def start_appointment_sweeper(app: Flask) -> threading.Thread | None:
+    """Run expire_stale_appointments every APPOINTMENT_SWEEP_INTERVAL seconds (for every clinic) in a daemon thread."""
+    interval = app.config.get("APPOINTMENT_SWEEP_INTERVAL", 0)
+    if interval <= 0 or app.extensions.get("appointment_sweeper") is not None:
+        return None
+
+    def _tenants() -> list[str | None]:
+        if not app.config.get("TENANCY_ENABLED", False):
+            return [None]
+        tenants = registry(app)
+        return [None] + [code for code in tenants.codes() if code != tenants.default]
+
+    lock = _SweeperLock(os.path.join(app.instance_path, "appointment-sweeper.lock"))
+
+    def _loop():
+        while True:
+            if not lock.acquire():
+                _time.sleep(interval)
+                continue
+            for tenant in _tenants():
+                try:
+                    with use_tenant(tenant), app.app_context():
+                        expire_stale_appointments(
+                            grace_days=app.config.get("APPOINTMENT_EXPIRE_GRACE_DAYS", 0),
+                            chunk_size=app.config.get("APPOINTMENT_SWEEP_CHUNK", 500),
+                        )
+                except Exception:
+                    metrics.incr("appointment_sweeper.errors")
+                    app.logger.exception("Appointment sweeper failed (tenant %s)", tenant)
+            _time.sleep(interval)
+
+    thread = threading.Thread(target=_loop, name="appointment-sweeper", daemon=True)
+    app.extensions["appointment_sweeper"] = thread
+    thread.start()
+    return thread
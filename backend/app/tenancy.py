@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import json
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Generic, TypeVar
+
+import sqlalchemy as sa
+from flask import Flask, current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session as _FlaskSession
+from sqlalchemy.sql.util import find_tables
+
+from .utils.errors import APIError
+
+# Multi-clinic operation: every clinic (tenant) has its own database with the full schema, one deployment serves
+# all of them. The tenant of a request comes from the `tenant` claim of its JWT (issued by /api/auth/login) or, for
+# unauthenticated calls such as login itself, from the TENANT_HEADER header; the ORM session then routes every
+# statement to that tenant's engine (TenantSession.get_bind). No tenant means the default database
+# (SQLALCHEMY_DATABASE_URI), which also holds the control-plane tables in SHARED_TABLES.
+# Tenants come from TENANT_DATABASES and from the `tenant` table (`flask provision-tenant`), so a clinic is added
+# without a restart; engines are created on first use.
+SHARED_TABLES = frozenset({"tenant", "revoked_token", "slow_query"})
+_CODE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,31}$")
+
+_current: ContextVar[str | None] = ContextVar("tenant", default=None)
+
+
+def current_tenant() -> str | None:
+    """Tenant code of the running request/job; None = default database."""
+    return _current.get()
+
+
+@contextmanager
+def use_tenant(code: str | None):
+    """Run a block (CLI command, background job) against one tenant's database."""
+    token = _current.set(code)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def valid_code(code: str) -> bool:
+    return bool(_CODE.match(code or ""))
+
+
+def _parse_databases(raw: str) -> dict[str, str]:
+    # JSON object, or "code=url;code=url"
+    raw = (raw or "").strip()
+    if not raw:
+        return {}
+    if raw.startswith("{"):
+        return {str(k): str(v) for k, v in json.loads(raw).items()}
+    pairs = (item.split("=", 1) for item in raw.split(";") if item.strip())
+    return {code.strip(): url.strip() for code, url in pairs}
+
+
+class TenantRegistry:
+    def __init__(self, app: Flask) -> None:
+        self.app = app
+        self.default = app.config.get("TENANT_DEFAULT", "default")
+        self.template = app.config.get("TENANT_DATABASE_URL_TEMPLATE") or ""
+        self._static = _parse_databases(app.config.get("TENANT_DATABASES", ""))
+        self._urls: dict[str, str] = dict(self._static)
+        self._engines: dict[str, sa.Engine] = {}
+        self._lock = threading.Lock()
+        # Called with every tenant engine created (slow query log listeners, ...).
+        self.engine_hooks: list[Callable[[sa.Engine], None]] = []
+
+    def _load(self) -> None:
+        from .extensions import db
+        from .models import Tenant
+
+        with db.engines[None].connect() as conn:
+            rows = conn.execute(
+                sa.select(Tenant.code, Tenant.database_url).where(Tenant.status == "active")
+            ).all()
+        urls = dict(self._static)
+        for code, url in rows:
+            urls.setdefault(code, url or self.template.format(tenant=code))
+        self._urls = urls
+
+    def url(self, code: str) -> str | None:
+        if code not in self._urls:
+            try:
+                self._load()
+            except sa.exc.SQLAlchemyError:
+                return None  # no control table yet
+        return self._urls.get(code)
+
+    def codes(self) -> list[str]:
+        try:
+            self._load()
+        except sa.exc.SQLAlchemyError:
+            pass
+        return sorted(self._urls)
+
+    def engine(self, code: str) -> sa.Engine:
+        engine = self._engines.get(code)
+        if engine is not None:
+            return engine
+        url = self.url(code)
+        if url is None:
+            raise LookupError(f"Unknown tenant: {code}")
+        with self._lock:
+            engine = self._engines.get(code)
+            if engine is None:
+                engine = sa.create_engine(url, **self.app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+                for hook in self.engine_hooks:
+                    hook(engine)
+                self._engines[code] = engine
+        return engine
+
+    def forget(self, code: str) -> None:
+        with self._lock:
+            engine = self._engines.pop(code, None)
+            self._urls.pop(code, None)
+        if engine is not None:
+            engine.dispose()
+
+    def dispose(self) -> None:
+        """Drop pooled connections (before a preforking server forks)."""
+        for engine in list(self._engines.values()):
+            engine.dispose()
+
+
+def registry(app: Flask | None = None) -> TenantRegistry:
+    return (app or current_app).extensions["tenants"]
+
+
+def engine_for(code: str | None = None):
+    """Engine of a tenant (default: the current one); the default database when no tenant is active."""
+    from .extensions import db
+
+    code = current_tenant() if code is None else code
+    if code is None or code == registry().default:
+        return db.engine
+    return registry().engine(code)
+
+
+def _is_shared(mapper, clause) -> bool:
+    if mapper is not None:
+        return sa.inspect(mapper).local_table.name in SHARED_TABLES
+    if clause is not None:
+        tables = find_tables(clause, include_crud=True)
+        return bool(tables) and all(t.name in SHARED_TABLES for t in tables)
+    return False
+
+
+class TenantSession(_FlaskSession):
+    """db.session: statements go to the current tenant's engine, control-plane tables stay on the default one."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        code = current_tenant()
+        if code is None or not has_app_context() or _is_shared(mapper, clause):
+            return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        tenants = registry()
+        if code == tenants.default:
+            return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        return tenants.engine(code)
+
+
+T = TypeVar("T")
+
+
+class PerTenant(Generic[T]):
+    """One lazily created instance per tenant (caches, indexes) — replaces a single app.extensions[...] object."""
+
+    def __init__(self, factory: Callable[[], T]) -> None:
+        self._factory = factory
+        self._items: dict[str | None, T] = {}
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        code = current_tenant()
+        item = self._items.get(code)
+        if item is None:
+            with self._lock:
+                item = self._items.setdefault(code, self._factory())
+        return item
+
+    def peek(self) -> T | None:
+        return self._items.get(current_tenant())
+
+    def values(self) -> list[T]:
+        return list(self._items.values())
+
+
+def _token_tenant() -> tuple[bool, str | None]:
+    """(has a valid token, its tenant claim). Invalid tokens are left for the view's own JWT check to reject."""
+    from flask_jwt_extended import decode_token
+
+    auth = request.headers.get("Authorization", "")
+    if not auth.startswith("Bearer "):
+        return False, None
+    try:
+        claims = decode_token(auth[len("Bearer ") :])
+    except Exception:
+        return False, None
+    return True, claims.get("tenant")
+
+
+def _resolve_tenant() -> str | None:
+    tenants = registry()
+    header = (request.headers.get(current_app.config.get("TENANT_HEADER", "X-Tenant")) or "").strip().lower() or None
+    has_token, claimed = _token_tenant()
+    if has_token:
+        claimed = claimed or tenants.default
+        if header is not None and header != claimed:
+            raise APIError("Token belongs to another clinic", code="tenant_mismatch", status=403)
+        code = claimed
+    else:
+        code = header or tenants.default
+    if code != tenants.default and (not valid_code(code) or tenants.url(code) is None):
+        raise APIError("Unknown clinic", code="unknown_tenant", status=404)
+    return code
+
+
+def init_tenancy(app: Flask) -> TenantRegistry:
+    tenants = TenantRegistry(app)
+    app.extensions["tenants"] = tenants
+    if not app.config.get("TENANCY_ENABLED", False):
+        return tenants
+
+    @app.before_request
+    def _select_tenant():
+        code = _resolve_tenant()
+        g._tenant_token = _current.set(None if code == tenants.default else code)
+
+    @app.teardown_request
+    def _reset_tenant(_exc):
+        token = g.pop("_tenant_token", None)
+        if token is not None:
+            _current.reset(token)
+
+    return tenants
+
+
+def token_claims() -> dict:
+    """Extra JWT claims binding a token to the clinic it was issued for (empty without tenancy)."""
+    if not current_app.config.get("TENANCY_ENABLED", False):
+        return {}
+    return {"tenant": current_tenant() or registry().default}
+
+
+def provision_tenant(code: str, *, name: str | None = None, database_url: str | None = None, seed: bool = True) -> str:
+    """
+    Register a clinic in the control table, create its schema (all tables except SHARED_TABLES) and, optionally,
+    load the seed data. Returns the database URL used. Safe to re-run for an existing tenant.
+    """
+    from .extensions import db
+    from .fulltext import ensure_fulltext_index
+    from .models import Tenant
+
+    if not valid_code(code):
+        raise ValueError("tenant code must be 1-32 lowercase letters, digits, '-' or '_'")
+    tenants = registry()
+    if code == tenants.default:
+        raise ValueError("the default tenant is the main database; use init-db / seed")
+    url = database_url or tenants._static.get(code) or tenants.template.format(tenant=code)
+    if not url:
+        raise ValueError("no database URL: pass one or set TENANT_DATABASE_URL_TEMPLATE")
+
+    Tenant.__table__.create(db.engines[None], checkfirst=True)
+    tenant = db.session.get(Tenant, code)
+    if tenant is None:
+        tenant = Tenant(code=code)
+        db.session.add(tenant)
+    tenant.name = name or tenant.name or code
+    tenant.database_url = database_url or tenant.database_url
+    tenant.status = "active"
+    db.session.commit()
+    tenants.forget(code)  # pick up a changed URL
+
+    engine = tenants.engine(code)
+    db.metadata.create_all(engine, tables=[t for t in db.metadata.sorted_tables if t.name not in SHARED_TABLES])
+    with use_tenant(code):
+        ensure_fulltext_index()
+        if seed:
+            from .seed import ensure_seed_data
+
+            ensure_seed_data()
+        db.session.remove()
+    return url
@@ -1,17 +1,51 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from functools import wraps
+from typing import Any
 
+from flask import g, request
 from flask_jwt_extended import current_user, verify_jwt_in_request
 
+from ..extensions import db
 from .errors import APIError
 
+# Sub-requests dispatched by POST /api/batch carry the already-verified principal in their WSGI environ.
+PRINCIPAL_ENVIRON_KEY = "hospital.principal"
+
+
+@dataclass
+class Principal:
+    jwt_data: dict
+    jwt_header: dict
+    user: Any
+
+    def install(self) -> None:
+        # Same g attributes flask_jwt_extended fills in verify_jwt_in_request, so current_user/get_jwt keep working.
+        # The user belongs to the outer request's session; every sub-request gets its own copy in its own session
+        # (sessions are not thread-safe, and a sub-request's commit must not expire the shared instance).
+        user = self.user
+        if user is not None:
+            user = db.session.merge(user, load=False)
+        g._jwt_extended_jwt = self.jwt_data
+        g._jwt_extended_jwt_header = self.jwt_header
+        g._jwt_extended_jwt_user = {"loaded_user": user}
+        g._jwt_extended_jwt_location = "headers"
+
+
+def _verify_request() -> None:
+    principal = request.environ.get(PRINCIPAL_ENVIRON_KEY)
+    if principal is None:
+        verify_jwt_in_request()
+    else:
+        principal.install()
+
 
 def roles_required(*roles: str):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            verify_jwt_in_request()
+            _verify_request()
             if current_user is None:
                 raise APIError("Unauthorized", code="unauthorized", status=401)
             if current_user.status != "active":
@@ -0,0 +1,484 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable
+
+from flask import Flask, current_app
+
+from . import metrics
+
+try:  # 可选依赖：CACHE_BACKEND=redis 时使用
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+try:  # POSIX only; without it the mmap backend is only safe within one process
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+# Cache shared by all workers of a deployment (CACHE_BACKEND):
+#   memory - per process, like the caches before it; also the offline stand-in (several SharedCache objects on one
+#            MemoryBackend behave like workers sharing a server)
+#   redis  - any Redis-protocol server (CACHE_URL)
+#   mmap   - a memory-mapped file (CACHE_MMAP_PATH) shared by the processes of one host
+# Keys are versioned per namespace: bump(namespace) increments the namespace version, which makes every older entry
+# unreachable at once, and broadcasts the namespace on the invalidation channel so that other processes can drop
+# their own derived state (see subscribe()). Values must be JSON-serializable.
+Listener = Callable[[str], None]
+
+
+class MemoryBackend:
+    """
+    Thread-safe dict with expiry; the least recently written entries are dropped beyond `maxsize`. Counters
+    (namespace versions) are kept apart and never evicted, so an old version cannot come back.
+    """
+
+    def __init__(self, *, maxsize: int = 4096) -> None:
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._counters: dict[str, int] = {}
+        self._listeners: list[Callable[[str, str], None]] = []
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] and entry[0] <= time.time():
+                del self._data[key]
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + ttl if ttl else 0.0, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._counters.pop(key, None)
+
+    def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def publish(self, channel: str, message: str) -> None:
+        for listener in list(self._listeners):
+            listener(channel, message)
+
+    def subscribe(self, listener: Callable[[str, str], None], _channel: str) -> None:
+        self._listeners.append(listener)
+
+
+class RedisBackend:
+    def __init__(self, url: str) -> None:
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the redis package")
+        self._client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self._listeners: list[Callable[[str, str], None]] = []
+        self._channels: set[str] = set()
+        self._thread = None
+        self._pid = os.getpid()
+
+    def _check_fork(self) -> None:
+        # Listener threads do not survive fork; each worker subscribes on its own (redis-py reconnects by itself).
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = None
+            if self._listeners:
+                self._listen()
+
+    def _listen(self) -> None:
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{ch: self._dispatch for ch in self._channels})
+        self._thread = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def get(self, key: str) -> bytes | None:
+        self._check_fork()
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        self._client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key: str) -> None:
+        self._client.delete(key)
+
+    def counter(self, key: str) -> int:
+        return int(self.get(key) or 0)
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(key))
+
+    def publish(self, channel: str, message: str) -> None:
+        self._client.publish(channel, message)
+
+    def subscribe(self, listener: Callable[[str, str], None], channel: str) -> None:
+        self._check_fork()
+        self._listeners.append(listener)
+        if channel not in self._channels:
+            self._channels.add(channel)
+            if self._thread is not None:
+                self._thread.stop()
+            self._listen()
+
+    def _dispatch(self, message: dict) -> None:
+        channel = message["channel"].decode() if isinstance(message["channel"], bytes) else message["channel"]
+        data = message["data"].decode() if isinstance(message["data"], bytes) else str(message["data"])
+        for listener in list(self._listeners):
+            listener(channel, data)
+
+
+class MmapBackend:
+    """
+    Fixed-size hash table in a shared file: `slots` slots of `slot_size` bytes, 4-way set associative (a full set
+    evicts the entry closest to expiry). Writers serialize on flock(); readers are lock-free and retry when a slot's
+    sequence number shows a concurrent write. Entries larger than a slot are simply not cached.
+    The header holds a ring of the last 64 broadcast messages, polled by subscribed processes, and a separate table
+    of counters (namespace versions) that cache entries can never evict.
+    """
+
+    _MAGIC = b"HSC2"
+    _RING = 64
+    _RING_ENTRY = 256
+    _RING_OFFSET = 64
+    _COUNTERS = 1024
+    _COUNTER = struct.Struct("<QQ")  # key hash (0 = free), value
+    _COUNTER_OFFSET = _RING_OFFSET + _RING * _RING_ENTRY
+    _HEADER = 36864  # > _COUNTER_OFFSET + _COUNTERS * _COUNTER.size, page aligned
+    _SLOT_HEAD = struct.Struct("<IIId")  # seq, key length, value length, expires_at (0 = never)
+    _WAYS = 4
+
+    def __init__(self, path: str, *, size_mb: int = 64, slot_size: int = 4096, poll_interval: float = 0.2) -> None:
+        self.slot_size = slot_size
+        self.slots = max((size_mb * 1024 * 1024 - self._HEADER) // slot_size, self._WAYS)
+        self.poll_interval = poll_interval
+        size = self._HEADER + self.slots * slot_size
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._pid = os.getpid()
+        layout = self._MAGIC + struct.pack("<II", self.slots, slot_size)
+        with self._locked():
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size)
+            if self._map[:12] != layout:
+                self._map[:size] = bytes(size)
+                self._map[:12] = layout
+        self._thread_lock = threading.Lock()
+        self._listeners: list[Callable[[str, str], None]] = []
+        self._poller: threading.Thread | None = None
+
+    # -- locking / layout --------------------------------------------------------------------------------------
+
+    def _check_fork(self) -> None:
+        if self._pid == os.getpid():
+            return
+        # flock() belongs to the open file description, which a forked child shares with its parent; the mapping
+        # itself is MAP_SHARED and stays valid. The poller thread stayed behind in the parent.
+        self._pid = os.getpid()
+        self._fd = os.open(self.path, os.O_RDWR)
+        self._thread_lock = threading.Lock()
+        self._poller = None
+        if self._listeners:
+            self._start_poller()
+
+    @contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _hash(key: bytes) -> int:
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+    def _set_of(self, key: bytes) -> list[int]:
+        h = self._hash(key)
+        first = (h % (self.slots // self._WAYS)) * self._WAYS
+        return [self._HEADER + (first + i) * self.slot_size for i in range(self._WAYS)]
+
+    def _read_slot(self, offset: int) -> tuple[bytes, bytes, float] | None:
+        head = self._SLOT_HEAD.size
+        for _attempt in range(3):
+            seq, key_len, value_len, expires = self._SLOT_HEAD.unpack_from(self._map, offset)
+            if seq % 2:
+                continue
+            data = self._map[offset + head : offset + head + key_len + value_len]
+            if self._SLOT_HEAD.unpack_from(self._map, offset)[0] == seq:
+                return data[:key_len], data[key_len:], expires
+        return None
+
+    def _write_slot(self, offset: int, key: bytes, value: bytes, expires: float) -> None:
+        seq = self._SLOT_HEAD.unpack_from(self._map, offset)[0]
+        struct.pack_into("<I", self._map, offset, seq + 1)  # odd: readers retry
+        head = self._SLOT_HEAD.size
+        self._map[offset + head : offset + head + len(key) + len(value)] = key + value
+        self._SLOT_HEAD.pack_into(self._map, offset, seq + 1, len(key), len(value), expires)
+        struct.pack_into("<I", self._map, offset, seq + 2)  # published only once lengths and data are in place
+
+    # -- cache operations --------------------------------------------------------------------------------------
+
+    def get(self, key: str) -> bytes | None:
+        self._check_fork()
+        raw = key.encode()
+        now = time.time()
+        for offset in self._set_of(raw):
+            slot = self._read_slot(offset)
+            if slot is not None and slot[0] == raw:
+                return slot[1] if not slot[2] or slot[2] > now else None
+        return None
+
+    def _store(self, raw: bytes, value: bytes, expires: float) -> None:
+        now = time.time()
+        victim, victim_rank = None, None
+        for offset in self._set_of(raw):
+            slot = self._read_slot(offset)
+            if slot is None or slot[0] == raw or not slot[0] or 0 < slot[2] <= now:
+                victim = offset
+                break
+            rank = (slot[2] == 0, slot[2])
+            if victim_rank is None or rank < victim_rank:
+                victim, victim_rank = offset, rank
+        self._write_slot(victim, raw, value, expires)
+
+    def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        raw = key.encode()
+        if len(raw) + len(value) > self.slot_size - self._SLOT_HEAD.size:
+            metrics.incr("shared_cache.too_large")
+            return
+        self._check_fork()
+        with self._thread_lock, self._locked():
+            self._store(raw, value, time.time() + ttl if ttl else 0.0)
+
+    def delete(self, key: str) -> None:
+        raw = key.encode()
+        self._check_fork()
+        with self._thread_lock, self._locked():
+            for offset in self._set_of(raw):
+                slot = self._read_slot(offset)
+                if slot is not None and slot[0] == raw:
+                    self._write_slot(offset, b"", b"", 0.0)
+
+    def _counter_slot(self, key: str, *, create: bool) -> int | None:
+        # Open addressing with linear probing; entries are never removed, so a free slot ends the probe.
+        h = self._hash(key.encode())
+        for i in range(self._COUNTERS):
+            offset = self._COUNTER_OFFSET + ((h + i) % self._COUNTERS) * self._COUNTER.size
+            slot_hash = self._COUNTER.unpack_from(self._map, offset)[0]
+            if slot_hash == h:
+                return offset
+            if slot_hash == 0:
+                if not create:
+                    return None
+                self._COUNTER.pack_into(self._map, offset, h, 0)
+                return offset
+        if create:
+            raise RuntimeError("shared cache counter table is full")
+        return None
+
+    def counter(self, key: str) -> int:
+        self._check_fork()
+        with self._thread_lock, self._locked():
+            offset = self._counter_slot(key, create=False)
+            return self._COUNTER.unpack_from(self._map, offset)[1] if offset is not None else 0
+
+    def incr(self, key: str) -> int:
+        self._check_fork()
+        with self._thread_lock, self._locked():
+            offset = self._counter_slot(key, create=True)
+            h, value = self._COUNTER.unpack_from(self._map, offset)
+            self._COUNTER.pack_into(self._map, offset, h, value + 1)
+            return value + 1
+
+    # -- broadcast ---------------------------------------------------------------------------------------------
+
+    def _message_seq(self) -> int:
+        return struct.unpack_from("<Q", self._map, 16)[0]
+
+    def publish(self, channel: str, message: str) -> None:
+        payload = f"{channel}\0{message}".encode()
+        if len(payload) > self._RING_ENTRY - 10:
+            payload = f"{channel}\0*".encode()  # a cut name would invalidate the wrong thing: drop everything
+        self._check_fork()
+        with self._thread_lock, self._locked():
+            seq = self._message_seq() + 1
+            offset = self._RING_OFFSET + (seq % self._RING) * self._RING_ENTRY
+            self._map[offset : offset + self._RING_ENTRY] = struct.pack("<QH", seq, len(payload)) + payload.ljust(
+                self._RING_ENTRY - 10, b"\0"
+            )
+            struct.pack_into("<Q", self._map, 16, seq)
+
+    def subscribe(self, listener: Callable[[str, str], None], _channel: str) -> None:
+        self._check_fork()
+        self._listeners.append(listener)
+        if self._poller is None:
+            self._start_poller()
+
+    def _start_poller(self) -> None:
+        self._poller = threading.Thread(target=self._poll, name="shared-cache-poller", daemon=True)
+        self._poller.start()
+
+    def _poll(self) -> None:
+        seen = self._message_seq()
+        while True:
+            time.sleep(self.poll_interval)
+            latest = self._message_seq()
+            if latest - seen > self._RING:
+                self._deliver("*", "")  # missed messages: listeners drop everything
+                seen = latest
+            for seq in range(seen + 1, latest + 1):
+                offset = self._RING_OFFSET + (seq % self._RING) * self._RING_ENTRY
+                entry_seq, length = struct.unpack_from("<QH", self._map, offset)
+                if entry_seq != seq:
+                    continue
+                channel, _, message = bytes(self._map[offset + 10 : offset + 10 + length]).decode().partition("\0")
+                self._deliver(channel, message)
+            seen = latest
+
+    def _deliver(self, channel: str, message: str) -> None:
+        for listener in list(self._listeners):
+            listener(channel, message)
+
+
+class SharedCache:
+    def __init__(self, backend, *, prefix: str = "hospital", version_check: float = 5.0) -> None:
+        self.backend = backend
+        self.prefix = prefix
+        self.channel = f"{prefix}:invalidate"
+        # Namespace versions are remembered locally, refreshed on broadcasts and at least every `version_check` s.
+        self.version_check = version_check
+        self._versions: dict[str, tuple[float, int]] = {}
+        self._listeners: list[Listener] = []
+        self._lock = threading.Lock()
+        self._subscribed = False
+
+    def _version(self, namespace: str) -> int:
+        entry = self._versions.get(namespace)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        version = self.backend.counter(f"{self.prefix}:v:{namespace}")
+        self._versions[namespace] = (time.monotonic() + self.version_check, version)
+        return version
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{self._version(namespace)}:{key}"
+
+    def get(self, namespace: str, key: str, default=None):
+        try:
+            raw = self.backend.get(self._key(namespace, key))
+            return json.loads(raw) if raw is not None else default
+        except Exception:  # backend down, or a value torn by a concurrent writer: a miss either way
+            metrics.incr("shared_cache.errors")
+            return default
+
+    def set(self, namespace: str, key: str, value, ttl: float | None = None) -> None:
+        try:
+            self.backend.set(self._key(namespace, key), json.dumps(value, ensure_ascii=False).encode(), ttl)
+        except Exception:
+            metrics.incr("shared_cache.errors")
+
+    def get_or_set(self, namespace: str, key: str, compute: Callable[[], object], ttl: float | None = None):
+        missing = object()
+        value = self.get(namespace, key, missing)
+        if value is not missing:
+            metrics.incr(f"cache.{namespace}.hit")
+            return value
+        metrics.incr(f"cache.{namespace}.miss")
+        value = compute()
+        if ttl is None or ttl > 0:
+            self.set(namespace, key, value, ttl)
+        return value
+
+    def bump(self, namespace: str) -> None:
+        """Invalidate every entry of a namespace in all processes; subscribers (this one included) are notified."""
+        try:
+            version = self.backend.incr(f"{self.prefix}:v:{namespace}")
+            self._versions[namespace] = (time.monotonic() + self.version_check, version)
+            self.backend.publish(self.channel, namespace)
+        except Exception:
+            metrics.incr("shared_cache.errors")
+            self._versions.pop(namespace, None)
+
+    def subscribe(self, listener: Listener) -> None:
+        """`listener(namespace)` runs when any process bumps a namespace ("*": unknown, drop everything)."""
+        self._listeners.append(listener)
+        with self._lock:
+            if self._subscribed:
+                return
+            self._subscribed = True
+        try:
+            self.backend.subscribe(self._on_message, self.channel)
+        except Exception:
+            metrics.incr("shared_cache.errors")
+
+    def _on_message(self, channel: str, namespace: str) -> None:
+        if channel == "*":
+            namespace = "*"
+        elif channel != self.channel:
+            return
+        if namespace == "*":
+            self._versions.clear()
+        else:
+            self._versions.pop(namespace, None)
+        self._notify(namespace)
+
+    def _notify(self, namespace: str) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(namespace)
+            except Exception:
+                metrics.incr("shared_cache.listener_errors")
+
+
+def make_backend(kind: str, *, url: str = "", path: str = "", size_mb: int = 64):
+    if kind == "redis":
+        return RedisBackend(url)
+    if kind == "mmap":
+        return MmapBackend(path, size_mb=size_mb)
+    if kind != "memory":
+        raise ValueError(f"Unknown CACHE_BACKEND: {kind}")
+    return MemoryBackend()
+
+
+def shared_cache() -> SharedCache:
+    return current_app.extensions["shared_cache"]
+
+
+def init_shared_cache(app: Flask) -> SharedCache:
+    kind = (app.config.get("CACHE_BACKEND") or "memory").lower()
+    try:
+        backend = make_backend(
+            kind,
+            url=app.config.get("CACHE_URL", ""),
+            path=app.config.get("CACHE_MMAP_PATH") or os.path.join(app.instance_path, "shared-cache.mmap"),
+            size_mb=app.config.get("CACHE_MMAP_SIZE_MB", 64),
+        )
+    except (RuntimeError, OSError):
+        app.logger.warning("CACHE_BACKEND=%s unavailable; falling back to the per-process cache", kind, exc_info=True)
+        backend = MemoryBackend()
+    cache = SharedCache(backend, prefix=app.config.get("CACHE_PREFIX", "hospital"))
+    app.extensions["shared_cache"] = cache
+    return cache
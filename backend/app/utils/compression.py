@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import gzip
+import zlib
+from collections.abc import Iterable, Iterator
+
+from flask import Flask, Response, request
+
+try:  # 可选依赖：安装 brotli 后优先协商 br
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+_COMPRESSIBLE = ("application/json", "text/")
+
+
+def _negotiate() -> str | None:
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(offered)
+
+
+def _gzip_stream(chunks: Iterable[bytes], level: int) -> Iterator[bytes]:
+    # wbits=31 -> gzip container
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _brotli_stream(chunks: Iterable[bytes], quality: int) -> Iterator[bytes]:
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def _should_compress(response: Response) -> bool:
+    if response.status_code < 200 or response.status_code in (204, 304):
+        return False
+    if request.method == "HEAD" or "Content-Encoding" in response.headers:
+        return False
+    mimetype = response.mimetype or ""
+    return mimetype.startswith(_COMPRESSIBLE)
+
+
+def init_compression(app: Flask) -> None:
+    """Register an after_request hook that gzip/brotli-encodes large JSON/text responses."""
+
+    @app.after_request
+    def _compress(response: Response):
+        if not app.config.get("COMPRESS_ENABLED", True) or not _should_compress(response):
+            return response
+
+        encoding = _negotiate()
+        if encoding is None:
+            return response
+        response.vary.add("Accept-Encoding")
+
+        gzip_level = app.config.get("COMPRESS_LEVEL", 6)
+        br_quality = app.config.get("COMPRESS_BR_LEVEL", 5)
+
+        if response.is_streamed:
+            # 导出类流式响应：边生成边压缩，不缓冲整个响应体
+            chunks = response.iter_encoded()
+            response.direct_passthrough = False
+            if encoding == "br":
+                response.response = _brotli_stream(chunks, br_quality)
+            else:
+                response.response = _gzip_stream(chunks, gzip_level)
+            response.headers.pop("Content-Length", None)
+            response.headers["Content-Encoding"] = encoding
+            return response
+
+        data = response.get_data()
+        if len(data) < app.config.get("COMPRESS_MIN_SIZE", 1024):
+            return response
+        if encoding == "br":
+            body = brotli.compress(data, quality=br_quality)
+        else:
+            body = gzip.compress(data, compresslevel=gzip_level, mtime=0)
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -6,6 +6,23 @@ from flask import Flask
 
 from .responses import error
 
+# MySQL 1213 = deadlock, 1205 = lock wait timeout; SQLite reports "database is locked".
+_RETRYABLE_MYSQL_CODES = {1213: "deadlock", 1205: "lock_timeout"}
+
+
+def retryable_db_error(err: Exception) -> str | None:
+    """Reason string if `err` is a transient lock conflict that the client may simply retry."""
+    from sqlalchemy.exc import OperationalError
+
+    if not isinstance(err, OperationalError):
+        return None
+    args = getattr(err.orig, "args", ())
+    if args and isinstance(args[0], int) and args[0] in _RETRYABLE_MYSQL_CODES:
+        return _RETRYABLE_MYSQL_CODES[args[0]]
+    if "database is locked" in str(err.orig):
+        return "locked"
+    return None
+
 
 @dataclass
 class APIError(Exception):
@@ -36,6 +53,13 @@ def register_error_handlers(app: Flask) -> None:
         if isinstance(err, DataError):
             db.session.rollback()
             return error("Invalid data", code="data_error", status=400)
+        reason = retryable_db_error(err)
+        if reason is not None:
+            from . import metrics
+
+            db.session.rollback()
+            metrics.incr(f"db.retryable.{reason}")
+            return error("Database busy, please retry", code="db_busy", status=503, details={"reason": reason})
 
         app.logger.exception("Unhandled error: %s", err)
         return error("Internal server error", code="internal_error", status=500)
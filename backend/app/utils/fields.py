@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import re
+from typing import Any, Callable
+
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import joinedload, load_only, noload
+
+from .errors import APIError
+
+# A field tree maps output keys to sub-trees; an empty dict means "the whole value".
+#   "visit_id,status,patient.name"  ->  {"visit_id": {}, "status": {}, "patient": {"name": {}}}
+FieldTree = dict
+
+_FIELD_PATH = re.compile(r"^[a-z_]+(\.[a-z_]+)*$")
+
+
+def parse_fields(raw: str | None) -> FieldTree | None:
+    raw = (raw or "").strip()
+    if not raw:
+        return None
+    tree: FieldTree = {}
+    for part in raw.split(","):
+        path = part.strip()
+        if not path:
+            continue
+        if not _FIELD_PATH.match(path):
+            raise APIError("Invalid fields", code="validation_error", status=400, details={"field": path})
+        node = tree
+        keys = path.split(".")
+        for i, key in enumerate(keys):
+            if key in node and not node[key] and i < len(keys) - 1:
+                break  # 已请求整个子对象，无需再细分
+            node = node.setdefault(key, {})
+            if i == len(keys) - 1:
+                node.clear()
+    return tree or None
+
+
+def subtree(tree: FieldTree | None, key: str) -> FieldTree | None:
+    """Sub-tree for `key`: None means "everything" (no pruning)."""
+    if tree is None:
+        return None
+    return tree.get(key) or None
+
+
+def prune(data: Any, tree: FieldTree | None) -> Any:
+    if tree is None:
+        return data
+    if isinstance(data, list):
+        return [prune(item, tree) for item in data]
+    if isinstance(data, dict):
+        return {key: prune(data[key], sub or None) for key, sub in tree.items() if key in data}
+    return data
+
+
+def select_fields(tree: FieldTree | None, getters: dict[str, Callable[[], Any]]) -> dict:
+    """Build a dict from per-key getters, evaluating only the requested keys (used by field-aware to_dict)."""
+    if tree is None:
+        return {key: get() for key, get in getters.items()}
+    return {key: prune(getters[key](), sub or None) for key, sub in tree.items() if key in getters}
+
+
+def _merge(a: FieldTree | None, b: FieldTree | None) -> FieldTree | None:
+    # None (= everything) absorbs anything
+    if a is None or b is None:
+        return None
+    merged = dict(a)
+    for key, sub in b.items():
+        merged[key] = _merge(merged[key], sub) if key in merged else sub
+    return merged
+
+
+def _relationship_tree(model, tree: FieldTree) -> dict[str, FieldTree | None]:
+    """
+    Translate requested output keys into the relationships that must be loaded.
+    Output keys that are derived from a relationship are declared in the model's `__field_deps__` as a
+    relationship tree; keys served from the reference-data cache (`__refdata_fields__`) need no relationship.
+    """
+    mapper = sa_inspect(model).mapper
+    deps: dict = getattr(mapper.class_, "__field_deps__", {})
+    cached: dict = getattr(mapper.class_, "__refdata_fields__", {})
+    needed: dict[str, FieldTree | None] = {}
+    for key, sub in tree.items():
+        if key in mapper.relationships and key not in cached:
+            target = mapper.relationships[key].mapper.class_
+            rel_sub = _relationship_tree(target, sub) if sub else None
+            needed[key] = _merge(needed[key], rel_sub) if key in needed else rel_sub
+        for rel_key, rel_sub in deps.get(key, {}).items():
+            rel_sub = rel_sub or {}
+            needed[rel_key] = _merge(needed[rel_key], rel_sub) if rel_key in needed else rel_sub
+    return needed
+
+
+def _loader_options(entity, rel_tree: dict[str, FieldTree | None]) -> list:
+    mapper = sa_inspect(entity).mapper
+    options = []
+    for rel in mapper.relationships:
+        attr = getattr(entity, rel.key)
+        if rel.key not in rel_tree:
+            options.append(noload(attr))
+            continue
+        sub = rel_tree[rel.key]
+        loader = joinedload(attr)
+        if sub is not None:
+            nested = _loader_options(rel.mapper.class_, sub)
+            if nested:
+                loader = loader.options(*nested)
+        options.append(loader)
+    return options
+
+
+def field_options(entity, tree: FieldTree | None) -> list:
+    """
+    ORM loader options for `entity` (model or aliased model) matching a field tree:
+    relationships that are not needed are not joined at all (noload); if the model's to_dict is
+    field-aware (`__sparse_columns__ = True`), the column projection is narrowed with load_only too.
+    """
+    if tree is None:
+        return []
+    insp = sa_inspect(entity)
+    mapper = insp.mapper
+    rel_tree = _relationship_tree(entity, tree)
+    options = _loader_options(entity, rel_tree)
+
+    if getattr(mapper.class_, "__sparse_columns__", False):
+        keep = {key for key in tree if key in mapper.columns}
+        keep.update(col.key for col in mapper.primary_key)
+        keep.update(column for key, column in getattr(mapper.class_, "__refdata_fields__", {}).items() if key in tree)
+        for rel_key in rel_tree:
+            keep.update(col.key for col in mapper.relationships[rel_key].local_columns)
+        options.append(load_only(*[getattr(entity, key) for key in sorted(keep)]))
+    return options
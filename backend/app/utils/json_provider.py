@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import dataclasses
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:  # 可选依赖：未安装 orjson 时回退到标准库 json
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _default(o: Any) -> Any:
+    # 与各模型 to_dict 的既有格式保持一致：金额转 float，时间为 "YYYY-MM-DD HH:MM:SS"。
+    if isinstance(o, Decimal):
+        return float(o)
+    if isinstance(o, datetime):
+        return o.isoformat(sep=" ", timespec="seconds")
+    if isinstance(o, date):
+        return o.isoformat()
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson when available (stdlib json otherwise).
+    Decimal, date/datetime and dataclasses are encoded directly, so views may return raw column values.
+    """
+
+    default = staticmethod(_default)
+    ensure_ascii = False
+    use_orjson = orjson is not None
+
+    def _orjson_option(self, *, indent: bool = False) -> int:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        # Extra kwargs (cls=, indent=, ...) are stdlib-specific; honour them via the stdlib path.
+        if not self.use_orjson or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_option()).decode("utf-8")
+
+    def response(self, *args: Any, **kwargs: Any):
+        if not self.use_orjson:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_option(indent=indent))
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
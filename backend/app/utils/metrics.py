@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import threading
+
+# Process-local counters/gauges; exposed through GET /api/admin/metrics.
+_lock = threading.Lock()
+_counters: dict[str, float] = {}
+_gauges: dict[str, float] = {}
+
+
+def incr(name: str, value: float = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {"counters": dict(_counters), "gauges": dict(_gauges)}
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import threading
+import time
+import zlib
+from array import array
+
+from flask import Flask, current_app, request
+
+from . import metrics
+from ..tenancy import current_tenant
+from .errors import APIError
+
+
+class RateLimiter:
+    """
+    Token buckets plus a sliding-window failure counter, stored in fixed-size arrays.
+    Keys are hashed into `slots` cells, so memory is bounded regardless of how many
+    distinct IPs/usernames are seen (colliding keys share a cell, which only errs on the strict side).
+    """
+
+    def __init__(
+        self,
+        *,
+        slots: int = 8192,
+        rate_per_minute: float = 30,
+        burst: int = 20,
+        failure_window: int = 300,
+        failure_buckets: int = 6,
+    ) -> None:
+        self.slots = slots
+        self.rate = rate_per_minute / 60.0
+        self.burst = float(burst)
+        self.bucket_seconds = max(failure_window / failure_buckets, 1.0)
+        self.failure_buckets = failure_buckets
+
+        self._tokens = array("d", [self.burst]) * slots
+        self._updated = array("d", [0.0]) * slots
+        # failure_buckets consecutive sub-windows per slot: (epoch, count)
+        self._fail_epoch = array("q", [0]) * (slots * failure_buckets)
+        self._fail_count = array("L", [0]) * (slots * failure_buckets)
+        self._lock = threading.Lock()
+
+    def _slot(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % self.slots
+
+    def acquire(self, key: str, *, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        i = self._slot(key)
+        with self._lock:
+            last = self._updated[i]
+            tokens = self._tokens[i]
+            if last:
+                tokens = min(self.burst, tokens + (now - last) * self.rate)
+            self._updated[i] = now
+            if tokens < 1.0:
+                self._tokens[i] = tokens
+                return False
+            self._tokens[i] = tokens - 1.0
+            return True
+
+    def record_failure(self, key: str, *, now: float | None = None) -> None:
+        now = time.monotonic() if now is None else now
+        epoch = int(now // self.bucket_seconds)
+        j = self._slot(key) * self.failure_buckets + epoch % self.failure_buckets
+        with self._lock:
+            if self._fail_epoch[j] != epoch:
+                self._fail_epoch[j] = epoch
+                self._fail_count[j] = 0
+            self._fail_count[j] += 1
+
+    def failures(self, key: str, *, now: float | None = None) -> int:
+        now = time.monotonic() if now is None else now
+        epoch = int(now // self.bucket_seconds)
+        base = self._slot(key) * self.failure_buckets
+        total = 0
+        with self._lock:
+            for j in range(base, base + self.failure_buckets):
+                if epoch - self._fail_epoch[j] < self.failure_buckets:
+                    total += self._fail_count[j]
+        return total
+
+
+def init_rate_limiter(app: Flask) -> None:
+    app.extensions["auth_rate_limiter"] = RateLimiter(
+        slots=app.config.get("AUTH_RATE_SLOTS", 8192),
+        rate_per_minute=app.config.get("AUTH_RATE_PER_MINUTE", 30),
+        burst=app.config.get("AUTH_RATE_BURST", 20),
+        failure_window=app.config.get("AUTH_FAILURE_WINDOW", 300),
+    )
+
+
+def _auth_keys(username: str | None) -> list[str]:
+    keys = [f"ip:{request.remote_addr or '-'}"]
+    if username:
+        # Same username in two clinics = two accounts.
+        tenant = current_tenant()
+        keys.append(f"user:{tenant}:{username.lower()}" if tenant else f"user:{username.lower()}")
+    return keys
+
+
+def check_auth_rate_limit(username: str | None = None) -> None:
+    """Reject with 429 before any password hashing or DB work when the caller is over its budget."""
+    if not current_app.config.get("AUTH_RATE_LIMIT_ENABLED", True):
+        return
+    limiter: RateLimiter = current_app.extensions["auth_rate_limiter"]
+    keys = _auth_keys(username)
+
+    # 同一诊所多台终端常共用一个出口 IP，因此 IP 的失败阈值单独放宽。
+    limits = {
+        "ip": current_app.config.get("AUTH_IP_FAILURE_LIMIT", 50),
+        "user": current_app.config.get("AUTH_FAILURE_LIMIT", 10),
+    }
+    if any(limiter.failures(key) >= limits[key.split(":", 1)[0]] for key in keys):
+        metrics.incr("auth.rate_limited.failures")
+        raise APIError("Too many failed attempts, try again later", code="rate_limited", status=429)
+    if not all([limiter.acquire(key) for key in keys]):
+        metrics.incr("auth.rate_limited.requests")
+        raise APIError("Too many requests, try again later", code="rate_limited", status=429)
+
+
+def record_auth_failure(username: str | None = None) -> None:
+    if not current_app.config.get("AUTH_RATE_LIMIT_ENABLED", True):
+        return
+    limiter: RateLimiter = current_app.extensions["auth_rate_limiter"]
+    for key in _auth_keys(username):
+        limiter.record_failure(key)
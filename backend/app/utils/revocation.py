@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask, current_app
+
+from ..extensions import db
+from . import metrics
+from .cache import shared_cache
+
+_NAMESPACE = "revoked_tokens"
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 64)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class RevocationStore:
+    """
+    In-memory view of the revoked_token table: a Bloom filter answers "definitely not revoked"
+    for almost every request, and an exact jti -> expiry dict confirms the rare positives.
+    Other workers' revocations are picked up by a periodic incremental sync (not per request), brought forward
+    when a revocation is broadcast on the shared cache's invalidation channel;
+    expired entries are pruned from memory and from the table during that sync.
+    revoked_at is stamped by the revoking worker before its commit (and by its clock), so each incremental sync
+    re-reads `overlap_seconds` before its watermark, and a full reload every `full_sync_seconds` catches anything
+    later still.
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity: int = 100_000,
+        error_rate: float = 0.001,
+        sync_seconds: float = 5.0,
+        overlap_seconds: float = 120.0,
+        full_sync_seconds: float = 300.0,
+    ) -> None:
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_seconds = sync_seconds
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.full_sync_seconds = full_sync_seconds
+        self._full_synced_at = 0.0
+        self._exact: dict[str, datetime] = {}
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._synced_at = 0.0
+        self._synced_until: datetime | None = None
+
+    def _rebuild_bloom(self) -> None:
+        bloom = BloomFilter(max(self.capacity, len(self._exact) * 2), self.error_rate)
+        for jti in self._exact:
+            bloom.add(jti)
+        self._bloom = bloom
+
+    def _sync(self) -> None:
+        from ..models import RevokedToken
+
+        now = datetime.utcnow()
+        initial = not self._loaded
+        full = initial or time.monotonic() - self._full_synced_at >= self.full_sync_seconds
+        q = RevokedToken.query.filter(RevokedToken.expires_at > now)
+        if not full and self._synced_until is not None:
+            q = q.filter(RevokedToken.revoked_at >= self._synced_until - self.overlap)
+        rows = q.with_entities(RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at).all()
+
+        pruned = False
+        with self._lock:
+            for jti, expires_at, revoked_at in rows:
+                self._exact[jti] = expires_at
+                self._bloom.add(jti)
+                if self._synced_until is None or revoked_at > self._synced_until:
+                    self._synced_until = revoked_at
+            expired = [jti for jti, exp in self._exact.items() if exp <= now]
+            if expired:
+                for jti in expired:
+                    del self._exact[jti]
+                self._rebuild_bloom()
+                pruned = True
+            if self._synced_until is None:
+                self._synced_until = now
+            self._loaded = True
+            self._synced_at = time.monotonic()
+            if full:
+                self._full_synced_at = self._synced_at
+
+        if pruned or initial:
+            RevokedToken.query.filter(RevokedToken.expires_at <= now).delete(synchronize_session=False)
+            db.session.commit()
+
+    def _maybe_sync(self) -> None:
+        if not self._loaded or time.monotonic() - self._synced_at >= self.sync_seconds:
+            try:
+                self._sync()
+            except Exception:
+                db.session.rollback()
+                self._synced_at = time.monotonic()
+                current_app.logger.exception("Token revocation sync failed")
+
+    def is_revoked(self, jti: str | None) -> bool:
+        if not jti:
+            return False
+        self._maybe_sync()
+        if jti not in self._bloom:
+            return False
+        metrics.incr("auth.revocation.bloom_positive")
+        exp = self._exact.get(jti)
+        return exp is not None and exp > datetime.utcnow()
+
+    def revoke(self, *, jti: str, user_id: int | None, expires_at: datetime) -> None:
+        from ..models import RevokedToken
+
+        if db.session.get(RevokedToken, jti) is None:
+            db.session.add(RevokedToken(jti=jti, user_id=user_id, expires_at=expires_at, revoked_at=datetime.utcnow()))
+            db.session.commit()
+        with self._lock:
+            self._exact[jti] = expires_at
+            self._bloom.add(jti)
+        shared_cache().bump(_NAMESPACE)
+
+    def sync_soon(self) -> None:
+        """Sync on the next check instead of waiting for sync_seconds."""
+        self._synced_at = 0.0
+
+
+def init_revocation(app: Flask) -> RevocationStore:
+    store = RevocationStore(
+        capacity=app.config.get("TOKEN_REVOCATION_CAPACITY", 100_000),
+        sync_seconds=app.config.get("TOKEN_REVOCATION_SYNC_SECONDS", 5),
+        overlap_seconds=app.config.get("TOKEN_REVOCATION_SYNC_OVERLAP_SECONDS", 120),
+        full_sync_seconds=app.config.get("TOKEN_REVOCATION_FULL_SYNC_SECONDS", 300),
+    )
+    app.extensions["token_revocations"] = store
+    app.extensions["shared_cache"].subscribe(
+        lambda namespace: store.sync_soon() if namespace in (_NAMESPACE, "*") else None
+    )
+    return store
+
+
+def revocation_store() -> RevocationStore:
+    return current_app.extensions["token_revocations"]
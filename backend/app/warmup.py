@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import time
+
+from flask import Flask
+from flask_jwt_extended import create_access_token
+from sqlalchemy.orm import configure_mappers
+
+from .extensions import db
+from .tenancy import registry
+
+# Read-only endpoints hit once before fork: fills the engine's compiled-SQL cache and lazily built state
+# (token revocation set, URL map) so workers do not pay for them on their first real request.
+WARM_PATHS: dict[str | None, tuple[str, ...]] = {
+    None: ("/api/health", "/api/patient/departments"),
+    "admin": (
+        "/api/admin/rooms",
+        "/api/admin/schedules",
+        "/api/admin/employees",
+        "/api/admin/visits/search?limit=20",
+        "/api/admin/statistics/income",
+        "/api/admin/statistics/visits",
+    ),
+    "receptionist": (
+        "/api/receptionist/appointments",
+        "/api/receptionist/visits",
+        "/api/receptionist/bills",
+    ),
+}
+
+
+def warm_up(app: Flask) -> dict[str, float]:
+    """
+    Do the one-off startup work in the current (pre-fork) process; returns timings in ms.
+    Ends by disposing the connection pool so forked workers open their own connections.
+    """
+    from .models import SysUser
+
+    timings: dict[str, float] = {}
+    started = time.perf_counter()
+    configure_mappers()
+    timings["mappers"] = (time.perf_counter() - started) * 1e3
+
+    started = time.perf_counter()
+    client = app.test_client()
+    with app.app_context():
+        for role, paths in WARM_PATHS.items():
+            headers = {}
+            if role is not None:
+                user = SysUser.query.filter_by(role=role, status="active").order_by(SysUser.user_id.asc()).first()
+                if user is None:
+                    continue
+                token = create_access_token(identity=str(user.user_id), additional_claims={"role": role})
+                headers = {"Authorization": f"Bearer {token}"}
+            for path in paths:
+                resp = client.get(path, headers=headers)
+                if resp.status_code >= 500:
+                    app.logger.warning("Warm-up request %s failed with %s", path, resp.status_code)
+        db.session.remove()
+        db.engine.dispose()
+        registry(app).dispose()
+    timings["requests"] = (time.perf_counter() - started) * 1e3
+    return timings
@@ -0,0 +1,99 @@
+"""
+Micro-benchmark: encode a typical 200-row `search_visits` payload with Flask's default provider
+vs. FastJSONProvider (orjson when installed).
+
+    cd backend
+    python benchmarks/bench_json.py [--rows 200] [--repeat 200]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from app.utils.json_provider import FastJSONProvider, orjson  # noqa: E402
+
+
+def _visit_row(i: int) -> dict:
+    """Same shape as Visit.to_dict() (patient / room / doctor nested)."""
+    t = datetime(2025, 1, 1, 8, 0) + timedelta(minutes=7 * i)
+    return {
+        "visit_id": 100000 + i,
+        "patient": {
+            "patient_id": 5000 + i,
+            "name": "张三" if i % 2 else "李四",
+            "gender": "男" if i % 2 else "女",
+            "id_card": f"44010119900101{i:04d}",
+            "phone": f"139{i:08d}",
+        },
+        "room": {"room_id": i % 10 + 1, "room_number": f"{i % 10 + 1}01", "dept_id": i % 9 + 1, "dept_name": "内科", "status": "启用"},
+        "doctor": {
+            "emp_id": f"D00{i % 9 + 1}",
+            "name": "李医生",
+            "gender": "男",
+            "phone": "13800000001",
+            "position": "医生",
+            "title": "主任医师",
+            "dept_id": i % 9 + 1,
+            "dept_name": "内科",
+            "status": "在职",
+        },
+        "appt_id": None if i % 3 else i,
+        "status": "已离院",
+        "check_in_time": t.isoformat(sep=" ", timespec="seconds"),
+        "checkout_time": (t + timedelta(minutes=30)).isoformat(sep=" ", timespec="seconds"),
+    }
+
+
+def _raw_row(i: int) -> dict:
+    """Variant that leaves Decimal/datetime values to the provider instead of pre-converting in to_dict."""
+    row = _visit_row(i)
+    row["check_in_time"] = datetime(2025, 1, 1, 8, 0) + timedelta(minutes=7 * i)
+    row["checkout_time"] = row["check_in_time"] + timedelta(minutes=30)
+    row["amount"] = Decimal("150.00")
+    return row
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    stdlib = DefaultJSONProvider(app)
+    stdlib.ensure_ascii = False
+    fast = FastJSONProvider(app)
+
+    def payload(make_row):
+        items = [make_row(i) for i in range(args.rows)]
+        return {"ok": True, "data": {"total": 12345, "limit": args.rows, "offset": 0, "items": items}}
+
+    rows = payload(_visit_row)
+    # Flask's default provider renders datetimes as RFC 822 and rejects Decimal, so raw values are fast-path only.
+    raw = payload(_raw_row)
+
+    def best(fn) -> float:
+        return min(timeit.repeat(fn, number=args.repeat, repeat=3)) / args.repeat
+
+    print(f"orjson: {'yes (' + orjson.__version__ + ')' if orjson else 'no (stdlib fallback)'}")
+    with app.app_context():
+        size = len(fast.response(rows).get_data())
+        t_std = best(lambda: stdlib.response(rows))
+        t_fast = best(lambda: fast.response(rows))
+        t_raw = best(lambda: fast.response(raw))
+    print(f"payload        {size / 1024:.1f} KiB ({args.rows} rows)")
+    print(f"default json   {t_std * 1e3:.3f} ms")
+    print(f"fast provider  {t_fast * 1e3:.3f} ms  (x{t_std / t_fast:.1f})")
+    print(f"fast, raw vals {t_raw * 1e3:.3f} ms")
+
+if __name__ == "__main__":
+    main()
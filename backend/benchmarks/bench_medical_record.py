@@ -0,0 +1,91 @@
+"""
+Medical record storage / memory: stored bytes per codec (MEDICAL_RECORD_COMPRESSION) and memory held by
+loading rows with the text columns deferred (default) vs. undeferred.
+
+    cd backend
+    python benchmarks/bench_medical_record.py [--rows 2000]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import func, text  # noqa: E402
+from sqlalchemy.orm import undefer_group  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import MedicalRecord, Visit  # noqa: E402
+
+_NOTE = "患者主诉头痛三天，伴恶心，无发热。既往高血压病史五年，规律服药。查体：血压150/95mmHg，神经系统检查未见异常。"
+
+
+def _app(codec: str):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + str(Path(tempfile.mkdtemp()) / "bench.db")
+        AUTO_SEED = True
+        AUDIT_ENABLED = False
+        MEDICAL_RECORD_COMPRESSION = codec
+
+    return create_app(BenchConfig, start_background=False)
+
+
+def _fill(rows: int) -> None:
+    visits = [Visit(patient_id=1, room_id=1, doctor_id="D001", status="已离院") for _ in range(rows)]
+    db.session.add_all(visits)
+    db.session.flush()
+    db.session.add_all(
+        MedicalRecord(
+            visit_id=v.visit_id,
+            diagnosis="原发性高血压",
+            treatment=("低盐饮食，规律监测血压，" * 12),
+            prescription=("苯磺酸氨氯地平片 5mg 每日一次；" * 8),
+            note=_NOTE * (4 + i % 5),
+        )
+        for i, v in enumerate(visits)
+    )
+    db.session.commit()
+
+
+def _loaded_kib(*options) -> float:
+    db.session.expunge_all()
+    tracemalloc.start()
+    records = MedicalRecord.query.options(*options).all()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return current / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    for codec in ("none", "zlib", "zstd"):
+        app = _app(codec)
+        with app.app_context():
+            _fill(args.rows)
+            stored = db.session.execute(
+                text(
+                    "SELECT SUM(LENGTH(CAST(treatment AS BLOB)) + LENGTH(CAST(prescription AS BLOB))"
+                    " + LENGTH(CAST(note AS BLOB))) FROM medical_record"
+                )
+            ).scalar()
+            count = db.session.query(func.count(MedicalRecord.record_id)).scalar()
+            line = f"{codec:<5} stored text {stored / count:>7.0f} B/row"
+            if codec == "none":
+                deferred = _loaded_kib()
+                full = _loaded_kib(undefer_group("text"))
+                line += f"   loaded: deferred {deferred / count * 1024:>6.0f} B/row, undeferred {full / count * 1024:>6.0f} B/row"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Startup profile for the production entry point (Linux/macOS: uses fork).
+
+    cd backend
+    python benchmarks/startup_profile.py [--top 15] [--forks 5]
+
+1. `python -X importtime -c "import wsgi"` in a fresh interpreter: the slowest imports by cumulative time.
+2. In-process: import / create_app / warm-up timings, as logged by wsgi.py.
+3. Worker spawn cost: fork the warm process (as gunicorn does with preload_app) and time until the child
+   has reset its pool and served a first DB-backed request.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND))
+
+
+def import_profile(top: int) -> None:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import wsgi"],
+        cwd=BACKEND,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "APPOINTMENT_SWEEP_INTERVAL": "0"},
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name[1:].rstrip()))
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        raise SystemExit("import wsgi failed")
+
+    top_level = sum(cum for cum, _self, name in rows if not name.startswith(" "))
+    print(f"import wsgi: {len(rows)} modules, {top_level / 1e3:.1f} ms (top-level cumulative)")
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for cum, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cum / 1e3:>14.1f}{self_us / 1e3:>10.1f}  {name.strip()}")
+
+
+def fork_profile(app, forks: int) -> None:
+    from app.extensions import db
+
+    spawn_ms = []
+    for _ in range(forks):
+        started = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            # Same work as gunicorn.conf.py post_fork, then a first request.
+            with app.app_context():
+                db.engine.dispose(close=False)
+            status = app.test_client().get("/api/patient/departments").status_code
+            os._exit(0 if status == 200 else 1)
+        _pid, status = os.waitpid(pid, 0)
+        spawn_ms.append((time.perf_counter() - started) * 1e3)
+        if status != 0:
+            raise SystemExit("forked worker failed its first request")
+    spawn_ms.sort()
+    print(f"worker fork + first request: median {spawn_ms[len(spawn_ms) // 2]:.1f} ms, max {spawn_ms[-1]:.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--forks", type=int, default=5)
+    args = parser.parse_args()
+
+    import_profile(args.top)
+    print()
+
+    os.environ.setdefault("APPOINTMENT_SWEEP_INTERVAL", "0")
+    import wsgi
+
+    for key, value in wsgi.startup_timings.items():
+        print(f"{key:<20}{value:>10.1f}")
+    print()
+    if hasattr(os, "fork"):
+        fork_profile(wsgi.app, args.forks)
+
+
+if __name__ == "__main__":
+    main()
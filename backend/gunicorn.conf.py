@@ -0,0 +1,44 @@
+"""
+gunicorn settings; every value can be overridden with the matching GUNICORN_* environment variable.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+worker_class = "gthread" if threads > 1 else "sync"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers periodically; with preload a replacement is just a fork of the warm master.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+
+# Build the app (imports, AUTO_SEED, warm-up) once in the master instead of in every worker.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1").lower() not in ("0", "false", "no", "off")
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-")
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+
+def when_ready(server):
+    # Move everything allocated so far out of the GC's reach: collections in workers would otherwise
+    # touch (and un-share) the master's pages.
+    gc.freeze()
+    server.log.info("Master ready; %d objects frozen for copy-on-write", gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    from app import start_background_tasks
+    from app.extensions import db
+
+    app = worker.app.wsgi()
+    with app.app_context():
+        # Never reuse a connection opened before the fork.
+        db.engine.dispose(close=False)
+    start_background_tasks(app)
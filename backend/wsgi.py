@@ -0,0 +1,26 @@
+"""
+Production entry point (Linux):
+
+    cd backend
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app the app is built and warmed up once in the gunicorn master; workers are forked from it
+and share that memory copy-on-write. `python run.py` remains the development server.
+"""
+import time
+
+_started = time.perf_counter()
+
+from app import create_app  # noqa: E402
+from app.warmup import warm_up  # noqa: E402
+
+_imported = time.perf_counter()
+app = create_app(start_background=False)
+_created = time.perf_counter()
+
+startup_timings = {
+    "import_ms": (_imported - _started) * 1e3,
+    "create_app_ms": (_created - _imported) * 1e3,
+}
+startup_timings.update({f"warm_{k}_ms": v for k, v in warm_up(app).items()})
+app.logger.info("App ready: %s", ", ".join(f"{k}={v:.1f}" for k, v in startup_timings.items()))
@@ -101,7 +101,8 @@ CREATE TABLE IF NOT EXISTS appointment (
   CONSTRAINT fk_appt_dept FOREIGN KEY (dept_id) REFERENCES department(dept_id),
   CONSTRAINT fk_appt_patient FOREIGN KEY (patient_id) REFERENCES patient(patient_id),
   INDEX idx_appt_phone (phone),
-  INDEX idx_appt_expected_time (expected_time)
+  INDEX idx_appt_expected_time (expected_time),
+  INDEX idx_appt_status_expected_time (status, expected_time)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- 8. 就诊记录表
@@ -152,7 +153,7 @@ CREATE TABLE IF NOT EXISTS income_record (
   INDEX idx_income_record_date (record_date)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
--- 11. 病历表（每次就诊对应一份病历，可由管理员维护）
+-- 11. 病历表（每次就诊对应一份病历，可由管理员维护；ngram 全文索引用于病历检索，已有库可执行 flask rebuild-fulltext 补建）
 CREATE TABLE IF NOT EXISTS medical_record (
   record_id INT PRIMARY KEY AUTO_INCREMENT,
   visit_id INT NOT NULL UNIQUE,
@@ -162,5 +163,162 @@ CREATE TABLE IF NOT EXISTS medical_record (
   note TEXT,
   created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-  CONSTRAINT fk_medical_record_visit FOREIGN KEY (visit_id) REFERENCES visit(visit_id)
+  CONSTRAINT fk_medical_record_visit FOREIGN KEY (visit_id) REFERENCES visit(visit_id),
+  FULLTEXT INDEX ft_medical_record (diagnosis, treatment, prescription, note) WITH PARSER ngram
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 12. 报表任务表（后台统计任务 + 结果缓存，按规范化参数哈希复用）
+CREATE TABLE IF NOT EXISTS report_job (
+  job_id CHAR(32) PRIMARY KEY,
+  kind VARCHAR(30) NOT NULL,
+  params TEXT NOT NULL,
+  params_key CHAR(64) NOT NULL,
+  status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+  result LONGTEXT,
+  error VARCHAR(255),
+  created_by INT,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  started_at TIMESTAMP NULL,
+  finished_at TIMESTAMP NULL,
+  CONSTRAINT fk_report_job_user FOREIGN KEY (created_by) REFERENCES sys_user(user_id),
+  INDEX idx_report_job_kind_key (kind, params_key)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 13~16. 冷数据归档表（列与热表一致 + archived_at；由 flask archive-records 分批迁移，不建外键）
+CREATE TABLE IF NOT EXISTS visit_archive (
+  visit_id INT PRIMARY KEY,
+  patient_id INT NOT NULL,
+  room_id INT NOT NULL,
+  doctor_id VARCHAR(20),
+  appt_id INT,
+  status ENUM('候诊中', '就诊中', '待缴费', '已离院') NOT NULL,
+  check_in_time DATETIME NOT NULL,
+  checkout_time DATETIME NULL,
+  archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  INDEX idx_visit_archive_patient (patient_id),
+  INDEX idx_visit_archive_check_in_time (check_in_time)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS bill_archive (
+  bill_id INT PRIMARY KEY,
+  visit_id INT NOT NULL UNIQUE,
+  total_amount DECIMAL(10,2) NOT NULL,
+  insurance_amount DECIMAL(10,2) NOT NULL,
+  self_pay_amount DECIMAL(10,2) NOT NULL,
+  pay_status ENUM('未支付', '已支付') NOT NULL,
+  pay_time TIMESTAMP NULL,
+  created_at TIMESTAMP NOT NULL,
+  archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  INDEX idx_bill_archive_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS income_record_archive (
+  record_id INT PRIMARY KEY,
+  bill_id INT NOT NULL,
+  dept_id INT NOT NULL,
+  doctor_id VARCHAR(20),
+  amount DECIMAL(10,2) NOT NULL,
+  record_date DATE NOT NULL,
+  created_at TIMESTAMP NOT NULL,
+  archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  INDEX idx_income_archive_record_date (record_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS medical_record_archive (
+  record_id INT PRIMARY KEY,
+  visit_id INT NOT NULL UNIQUE,
+  diagnosis TEXT,
+  treatment TEXT,
+  prescription TEXT,
+  note TEXT,
+  created_at TIMESTAMP NOT NULL,
+  updated_at TIMESTAMP NOT NULL,
+  archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 17. 已吊销令牌表（登出时写入 JWT jti；过期后由后端自动清理）
+CREATE TABLE IF NOT EXISTS revoked_token (
+  jti VARCHAR(36) PRIMARY KEY,
+  user_id INT,
+  expires_at DATETIME NOT NULL,
+  revoked_at DATETIME NOT NULL,
+  CONSTRAINT fk_revoked_token_user FOREIGN KEY (user_id) REFERENCES sys_user(user_id) ON DELETE CASCADE,
+  INDEX ix_revoked_token_expires_at (expires_at),
+  INDEX ix_revoked_token_revoked_at (revoked_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 18. 排班号源分片计数表（可选，SCHEDULE_COUNTER_SHARDS>1 时使用；已约人数 = schedule.current_patients + SUM(used)）
+CREATE TABLE IF NOT EXISTS schedule_counter_shard (
+  schedule_id INT NOT NULL,
+  shard_no INT NOT NULL,
+  capacity INT NOT NULL,
+  used INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (schedule_id, shard_no),
+  CONSTRAINT fk_shard_schedule FOREIGN KEY (schedule_id) REFERENCES schedule(schedule_id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 19. 审计日志表（写后异步批量插入；user_id 不建外键，账号删除后仍保留记录）
+CREATE TABLE IF NOT EXISTS audit_log (
+  log_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+  occurred_at DATETIME NOT NULL,
+  user_id INT,
+  role VARCHAR(20),
+  action ENUM('create', 'update', 'delete') NOT NULL,
+  entity VARCHAR(50) NOT NULL,
+  entity_id VARCHAR(64),
+  changes TEXT,
+  request_path VARCHAR(255),
+  INDEX ix_audit_log_occurred_at (occurred_at),
+  INDEX idx_audit_entity (entity, entity_id, occurred_at),
+  INDEX idx_audit_user_time (user_id, occurred_at),
+  INDEX idx_audit_action_time (action, occurred_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 20. 重复患者候选表（flask find-duplicate-patients 生成，管理员审核后合并；不建外键，合并后保留记录）
+CREATE TABLE IF NOT EXISTS patient_duplicate (
+  pair_id INT PRIMARY KEY AUTO_INCREMENT,
+  patient_id INT NOT NULL,
+  duplicate_id INT NOT NULL,
+  score DECIMAL(4,3) NOT NULL,
+  reasons VARCHAR(100) NOT NULL,
+  status ENUM('待审核', '已合并', '已忽略') NOT NULL DEFAULT '待审核',
+  snapshot TEXT,
+  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  reviewed_at DATETIME,
+  UNIQUE KEY uniq_patient_duplicate_pair (patient_id, duplicate_id),
+  INDEX ix_patient_duplicate_duplicate_id (duplicate_id),
+  INDEX idx_patient_duplicate_status_score (status, score)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 21. 基础数据版本表（科室/诊室/员工变更时递增，各后端进程据此刷新内存缓存）
+CREATE TABLE IF NOT EXISTS refdata_version (
+  name VARCHAR(50) PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 22. 慢查询日志（超过 SLOW_QUERY_MS 的语句按规范化形态 + 接口聚合，首次出现时记录 EXPLAIN；行数上限 SLOW_QUERY_MAX_ROWS）
+CREATE TABLE IF NOT EXISTS slow_query (
+  query_id INT PRIMARY KEY AUTO_INCREMENT,
+  fingerprint VARCHAR(40) NOT NULL,
+  endpoint VARCHAR(100) NOT NULL,
+  statement TEXT NOT NULL,
+  param_shape VARCHAR(255),
+  calls INT NOT NULL DEFAULT 0,
+  total_ms DOUBLE NOT NULL DEFAULT 0,
+  max_ms DOUBLE NOT NULL DEFAULT 0,
+  last_ms DOUBLE NOT NULL DEFAULT 0,
+  plan TEXT,
+  first_seen DATETIME NOT NULL,
+  last_seen DATETIME NOT NULL,
+  UNIQUE KEY uniq_slow_query_shape (fingerprint, endpoint),
+  INDEX idx_slow_query_last_seen (last_seen)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 23. 诊所（租户）表（仅在主库；每个诊所使用独立数据库，database_url 为空时按 TENANT_DATABASE_URL_TEMPLATE 生成）
+CREATE TABLE IF NOT EXISTS tenant (
+  code VARCHAR(32) PRIMARY KEY,
+  name VARCHAR(100) NOT NULL,
+  database_url VARCHAR(255),
+  status ENUM('active', 'disabled') NOT NULL DEFAULT 'active',
+  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
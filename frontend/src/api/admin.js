@@ -65,14 +65,36 @@ export async function searchVisits(params = {}) {
 }
 
 // Statistics
+// Wide ranges are answered with 202 + a report job; wait for it so callers always get the statistics.
+// Gives up after the server's default REPORT_JOB_TIMEOUT (600 s): a job left running by a dead worker never ends.
+const REPORT_WAIT_MS = 600 * 1000
+
+async function awaitReport(resp) {
+  const data = unwrap(resp)
+  if (resp.status !== 202) return data
+  const jobId = data.job.job_id
+  const deadline = Date.now() + REPORT_WAIT_MS
+  for (;;) {
+    if (Date.now() >= deadline) {
+      const e = new Error('统计任务超时，请稍后重试')
+      e.code = 'report_timeout'
+      throw e
+    }
+    await new Promise((resolve) => setTimeout(resolve, 1000))
+    const job = unwrap(await http.get(`/api/admin/reports/jobs/${jobId}`))
+    if (job.status === 'done' || job.status === 'failed') break
+  }
+  return unwrap(await http.get(`/api/admin/reports/jobs/${jobId}/result`)).result
+}
+
 export async function statsIncome(params = {}) {
   const resp = await http.get('/api/admin/statistics/income', { params })
-  return unwrap(resp)
+  return awaitReport(resp)
 }
 
 export async function statsVisits(params = {}) {
   const resp = await http.get('/api/admin/statistics/visits', { params })
-  return unwrap(resp)
+  return awaitReport(resp)
 }
 
 // Bills & income records